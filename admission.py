@@ -0,0 +1,224 @@
+"""
+AppFab - Admission Control
+Sağlayıcı çağrıları için global eşzamanlılık sınırı, kullanıcı başına
+token bucket ve Pro kullanıcıları öne alan öncelik kuyruğu
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+QUEUE_DEPTH = metrics.REGISTRY.gauge(
+    "appfab_admission_queue_depth", "Sağlayıcı sırası bekleyen istek sayısı")
+ACTIVE_CALLS = metrics.REGISTRY.gauge(
+    "appfab_admission_active", "Devam eden sağlayıcı çağrısı sayısı")
+WAIT_SECONDS = metrics.REGISTRY.histogram(
+    "appfab_admission_wait_seconds", "Sırada bekleme süresi", ("tier",))
+REJECTED_TOTAL = metrics.REGISTRY.counter(
+    "appfab_admission_rejected_total", "Reddedilen istekler", ("reason",))
+
+class AdmissionRejected(Exception):
+    """İstek kabul edilmedi (hız sınırı veya sıra zaman aşımı)"""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """rate token/sn ile dolan, en fazla capacity token tutan kova"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, amount: float = 1.0) -> Tuple[bool, float]:
+        """(alındı_mı, tekrar denemek için beklenecek sn)"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True, 0.0
+        return False, (amount - self.tokens) / self.rate
+
+    def is_full(self) -> bool:
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.capacity
+
+class Lease:
+    """acquire/slot ile alınan çağrı hakları; parça parça bırakılabilir (best-of-N adayları)"""
+
+    __slots__ = ("_controller", "weight", "held")
+
+    def __init__(self, controller: "AdmissionController", weight: int):
+        self._controller = controller
+        self.weight = weight
+        self.held = weight
+
+    def release(self, amount: Optional[int] = None):
+        """amount hak bırak (None: kalanların hepsi); fazlası yok sayılır"""
+        self._controller._release(self, amount)
+
+class AdmissionController:
+    """Süreç genelinde sağlayıcı çağrısı kapı bekçisi"""
+
+    def __init__(self, max_concurrent: int = 8, queue_timeout: float = 120.0,
+                 user_rate_per_min: float = 6, user_burst: float = 3,
+                 pro_rate_per_min: float = 20, pro_burst: float = 10,
+                 poll_interval: float = 0.5):
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.poll_interval = poll_interval
+        self._limits = {
+            False: (user_rate_per_min / 60.0, user_burst),
+            True: (pro_rate_per_min / 60.0, pro_burst),
+        }
+        self._buckets: Dict[Tuple[str, bool], TokenBucket] = {}
+        self._queue: List[Tuple[int, int]] = []
+        self._owners: Dict[Tuple[int, int], str] = {}
+        self._seq = itertools.count()
+        self._active = 0
+        self._cond = threading.Condition()
+
+    # -------------------------------------------------------------------------
+    # Rate limit
+    # -------------------------------------------------------------------------
+
+    def check_rate(self, user_id: str, is_pro: bool = False):
+        """Kullanıcının kovasından bir token al; yoksa AdmissionRejected"""
+        with self._cond:
+            bucket = self._buckets.get((user_id, is_pro))
+            if bucket is None:
+                if len(self._buckets) > 10000:
+                    # Dolu kovalar varsayılanla aynı; bellekte tutmaya gerek yok
+                    for key in [k for k, b in self._buckets.items() if b.is_full()]:
+                        del self._buckets[key]
+                bucket = self._buckets[(user_id, is_pro)] = TokenBucket(*self._limits[is_pro])
+            ok, retry_after = bucket.take()
+        if not ok:
+            REJECTED_TOTAL.inc(reason="rate_limit")
+            raise AdmissionRejected(
+                f"Cok fazla istek. {int(retry_after) + 1} sn sonra tekrar deneyin", retry_after)
+
+    # -------------------------------------------------------------------------
+    # Concurrency
+    # -------------------------------------------------------------------------
+
+    def _position(self, ticket: Tuple[int, int]) -> int:
+        return sum(1 for t in self._queue if t < ticket) + 1
+
+    def _drop(self, ticket: Tuple[int, int]):
+        self._queue.remove(ticket)
+        heapq.heapify(self._queue)
+        self._owners.pop(ticket, None)
+        QUEUE_DEPTH.set(len(self._queue))
+        self._cond.notify_all()
+
+    def acquire(self, user_id: str, is_pro: bool = False,
+                on_wait: Optional[Callable[[int], None]] = None, weight: int = 1) -> Lease:
+        """
+        Global sınır içinde weight çağrı hakkı al (best-of-N: N paralel çağrı);
+        sırada beklerken on_wait(sıra) çağrılır. Haklar lease.release ile bırakılır.
+        """
+        tier = "pro" if is_pro else "free"
+        # max_concurrent'tan büyük istek hiç sığmazdı
+        weight = max(1, min(weight, self.max_concurrent))
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        with self._cond:
+            ticket = (0 if is_pro else 1, next(self._seq))
+            heapq.heappush(self._queue, ticket)
+            self._owners[ticket] = user_id
+            QUEUE_DEPTH.set(len(self._queue))
+
+        last_position = None
+        while True:
+            with self._cond:
+                if self._queue[0] == ticket and self._active + weight <= self.max_concurrent:
+                    heapq.heappop(self._queue)
+                    self._owners.pop(ticket, None)
+                    self._active += weight
+                    QUEUE_DEPTH.set(len(self._queue))
+                    ACTIVE_CALLS.set(self._active)
+                    # Sıradaki de boş slot bulabilir
+                    self._cond.notify_all()
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._drop(ticket)
+                    REJECTED_TOTAL.inc(reason="queue_timeout")
+                    raise AdmissionRejected("Sunucu cok yogun, lutfen biraz sonra tekrar deneyin")
+                position = self._position(ticket)
+                self._cond.wait(min(remaining, self.poll_interval))
+            # UI geri çağrısı kilit dışında
+            if on_wait is not None and position != last_position:
+                last_position = position
+                try:
+                    on_wait(position)
+                except BaseException:
+                    with self._cond:
+                        self._drop(ticket)
+                    raise
+
+        WAIT_SECONDS.observe(time.monotonic() - started, tier=tier)
+        return Lease(self, weight)
+
+    def _release(self, lease: Lease, amount: Optional[int] = None):
+        with self._cond:
+            amount = lease.held if amount is None else max(0, min(amount, lease.held))
+            if not amount:
+                return
+            lease.held -= amount
+            self._active -= amount
+            ACTIVE_CALLS.set(self._active)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, user_id: str, is_pro: bool = False,
+             on_wait: Optional[Callable[[int], None]] = None, weight: int = 1):
+        """acquire + blok bitince kalan hakları bırak"""
+        lease = self.acquire(user_id, is_pro, on_wait, weight)
+        try:
+            yield lease
+        finally:
+            lease.release()
+
+    @contextmanager
+    def admit(self, user_id: str, is_pro: bool = False,
+              on_wait: Optional[Callable[[int], None]] = None):
+        """Hız sınırı + eşzamanlılık sınırı"""
+        self.check_rate(user_id, is_pro)
+        with self.slot(user_id, is_pro, on_wait):
+            yield
+
+    def position(self, user_id: str) -> Optional[int]:
+        """Kullanıcının sıradaki yeri (1 = sıradaki); sırada değilse None"""
+        with self._cond:
+            tickets = [t for t, owner in self._owners.items() if owner == user_id]
+            if not tickets:
+                return None
+            return self._position(min(tickets))
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {"active": self._active, "queued": len(self._queue),
+                    "max_concurrent": self.max_concurrent}
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+def get_controller(config: Optional[Dict] = None) -> AdmissionController:
+    """Süreç genelindeki controller (tüm oturumlar aynı sınırı paylaşır)"""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController(**(config or {}))
+        return _controller
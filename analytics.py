@@ -0,0 +1,241 @@
+"""
+AppFab - Analytics
+Olay kaydı (üretim, düzeltme, önizleme, beğeni, giriş, sağlayıcı çağrısı): bellekte
+tamponlanır, toplu transaction'larla yazılır; saatlik/günlük özet tablolarını rollup işi günceller
+"""
+
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import metrics
+
+EVENTS_TOTAL = metrics.REGISTRY.counter(
+    "appfab_analytics_events_total", "Analitik olayları", ("kind",))
+DROPPED_TOTAL = metrics.REGISTRY.counter(
+    "appfab_analytics_dropped_total", "Tampon dolduğu için atılan olaylar")
+BUFFERED = metrics.REGISTRY.gauge(
+    "appfab_analytics_buffered", "Yazılmayı bekleyen olaylar")
+
+ANALYTICS_TABLES_SQL = [
+    # Sadece ekleme; id sırası = yazılma sırası (rollup filigranı)
+    '''CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts REAL NOT NULL,
+        kind TEXT NOT NULL,
+        user_id TEXT,
+        app_id TEXT,
+        provider TEXT DEFAULT '',
+        model TEXT DEFAULT '',
+        ok INTEGER DEFAULT 1,
+        latency_ms INTEGER,
+        data TEXT
+    )''',
+    "CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts)",
+    '''CREATE TABLE IF NOT EXISTS event_rollups (
+        period TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        provider TEXT NOT NULL,
+        events INTEGER DEFAULT 0,
+        ok INTEGER DEFAULT 0,
+        latency_sum_ms INTEGER DEFAULT 0,
+        latency_count INTEGER DEFAULT 0,
+        latency_max_ms INTEGER DEFAULT 0,
+        PRIMARY KEY (period, bucket, kind, provider)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS rollup_state (
+        name TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL
+    )''',
+]
+
+# period -> bucket biçimi (UTC)
+PERIODS = {"hour": "%Y-%m-%dT%H:00", "day": "%Y-%m-%d"}
+
+ROLLUP_SQL = '''
+    INSERT INTO event_rollups (period, bucket, kind, provider, events, ok,
+                               latency_sum_ms, latency_count, latency_max_ms)
+    SELECT ?, strftime(?, ts, 'unixepoch'), kind, COALESCE(provider, ''), COUNT(*), SUM(ok),
+           COALESCE(SUM(latency_ms), 0), COUNT(latency_ms), COALESCE(MAX(latency_ms), 0)
+    FROM events WHERE id > ? AND id <= ?
+    GROUP BY 2, kind, provider
+    ON CONFLICT (period, bucket, kind, provider) DO UPDATE SET
+        events = events + excluded.events,
+        ok = ok + excluded.ok,
+        latency_sum_ms = latency_sum_ms + excluded.latency_sum_ms,
+        latency_count = latency_count + excluded.latency_count,
+        latency_max_ms = MAX(latency_max_ms, excluded.latency_max_ms)
+'''
+
+class EventRecorder:
+    """
+    record() sadece tampona ekler (istek yolunda DB yok); arka plan thread'i batch_size
+    olayda veya flush_interval sn'de bir tek transaction ile yazar ve rollup'ı çalıştırır.
+    """
+
+    def __init__(self, enabled: bool = True, db_path: str = "analytics.db", batch_size: int = 200,
+                 flush_interval: float = 2.0, max_buffer: int = 10000, rollup_interval: float = 60.0,
+                 retention_days: float = 30.0):
+        self.enabled = enabled
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rollup_interval = rollup_interval
+        self.retention = retention_days * 86400
+        self._buffer: "deque[tuple]" = deque(maxlen=max_buffer)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_rollup = time.monotonic()
+        if enabled:
+            conn = self._connect()
+            for sql in ANALYTICS_TABLES_SQL:
+                conn.execute(sql)
+            conn.commit()
+            conn.close()
+            atexit.register(self.flush)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def record(self, kind: str, user_id: Optional[str] = None, app_id: Optional[str] = None,
+               provider: str = "", model: str = "", ok: bool = True, latency_ms: Optional[float] = None,
+               **data: Any):
+        """Olayı tampona ekle"""
+        if not self.enabled:
+            return
+        event = (time.time(), kind, user_id, app_id, provider or "", model or "", int(bool(ok)),
+                 None if latency_ms is None else int(latency_ms),
+                 json.dumps(data, ensure_ascii=False, default=str) if data else None)
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                DROPPED_TOTAL.inc()  # deque en eskiyi atar
+            self._buffer.append(event)
+            size = len(self._buffer)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="appfab-analytics", daemon=True)
+                self._thread.start()
+        EVENTS_TOTAL.inc(kind=kind)
+        BUFFERED.set(size)
+        if size >= self.batch_size:
+            self._wake.set()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.monotonic() - self._last_rollup >= self.rollup_interval:
+                    self.rollup()
+            except sqlite3.Error:
+                pass  # olaylar tamponda kalır (flush başarısızsa geri konur), sonraki turda tekrar
+
+    def flush(self) -> int:
+        """Tampondaki olayları tek transaction'da yaz; yazılan sayı"""
+        with self._lock:
+            batch = list(self._buffer)
+            self._buffer.clear()
+        BUFFERED.set(0)
+        if not batch:
+            return 0
+        with self._write_lock, metrics.timed("analytics.flush"):
+            conn = self._connect()
+            try:
+                conn.executemany('''
+                    INSERT INTO events (ts, kind, user_id, app_id, provider, model, ok, latency_ms, data)
+                    VALUES (?,?,?,?,?,?,?,?,?)
+                ''', batch)
+                conn.commit()
+            except sqlite3.Error:
+                with self._lock:
+                    self._buffer.extendleft(reversed(batch))
+                raise
+            finally:
+                conn.close()
+        return len(batch)
+
+    def rollup(self) -> int:
+        """Filigrandan sonraki olayları saatlik/günlük özetlere ekle; eski ham olayları sil"""
+        with self._write_lock, metrics.timed("analytics.rollup"):
+            self._last_rollup = time.monotonic()
+            conn = self._connect()
+            try:
+                # Filigran yazma kilidi altında okunur: başka bir süreç aynı aralığı
+                # aynı anda özetleyemez; özetler ve filigran aynı transaction'da
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT last_id FROM rollup_state WHERE name = 'events'").fetchone()
+                last_id = row[0] if row else 0
+                max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+                if max_id > last_id:
+                    for period, fmt in PERIODS.items():
+                        conn.execute(ROLLUP_SQL, (period, fmt, last_id, max_id))
+                    conn.execute("INSERT OR REPLACE INTO rollup_state VALUES ('events', ?)", (max_id,))
+                conn.execute("DELETE FROM events WHERE ts < ? AND id <= ?", (time.time() - self.retention, max_id))
+                conn.commit()
+                return max_id - last_id
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+    def rollups(self, period: str = "hour", since: Optional[float] = None, kind: Optional[str] = None) -> List[Dict]:
+        """Özet satırları (+ başarı oranı, ortalama gecikme); since: unix zamanı"""
+        since = time.time() - (86400 if period == "hour" else 30 * 86400) if since is None else since
+        bucket_from = time.strftime(PERIODS[period], time.gmtime(since))
+        conn = self._connect()
+        rows = conn.execute('''
+            SELECT * FROM event_rollups
+            WHERE period = ? AND bucket >= ? AND (? IS NULL OR kind = ?)
+            ORDER BY bucket, kind, provider
+        ''', (period, bucket_from, kind, kind)).fetchall()
+        conn.close()
+        return [_with_rates(dict(row)) for row in rows]
+
+    def provider_health(self, hours: int = 24) -> List[Dict]:
+        """Sağlayıcı/olay türü bazında toplam, başarı oranı ve gecikme (saatlik özetlerden)"""
+        totals: Dict[tuple, Dict[str, Any]] = {}
+        for row in self.rollups("hour", time.time() - hours * 3600):
+            total = totals.setdefault((row["kind"], row["provider"]), {
+                "kind": row["kind"], "provider": row["provider"], "events": 0, "ok": 0,
+                "latency_sum_ms": 0, "latency_count": 0, "latency_max_ms": 0})
+            for field in ("events", "ok", "latency_sum_ms", "latency_count"):
+                total[field] += row[field]
+            total["latency_max_ms"] = max(total["latency_max_ms"], row["latency_max_ms"])
+        return [_with_rates(t) for t in totals.values()]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"enabled": self.enabled, "buffered": len(self._buffer)}
+
+def _with_rates(row: Dict[str, Any]) -> Dict[str, Any]:
+    row["success_rate"] = row["ok"] / row["events"] if row["events"] else 0.0
+    row["avg_latency_ms"] = int(row["latency_sum_ms"] / row["latency_count"]) if row["latency_count"] else None
+    return row
+
+_recorder: Optional[EventRecorder] = None
+_recorder_lock = threading.Lock()
+
+def get_recorder(config: Optional[Dict] = None) -> EventRecorder:
+    """Süreç genelindeki kaydedici"""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            if config is None:
+                from config import ANALYTICS_CONFIG, FEATURES
+                config = dict(ANALYTICS_CONFIG, enabled=FEATURES["enable_analytics"])
+            _recorder = EventRecorder(**config)
+        return _recorder
+
+def record(kind: str, **fields: Any):
+    """Kısayol: get_recorder().record(...)"""
+    get_recorder().record(kind, **fields)
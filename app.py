@@ -5,117 +5,120 @@ Coklu AI destegi + Otomatik hata duzeltme
 
 import streamlit as st
 import requests
-import sqlite3
-import hashlib
 import secrets
+import tempfile
 import traceback
-from datetime import datetime
+import time
+import functools
+import memory
+import metrics
+import profiler
+import usage
+from config import APP_CONFIG, METRICS_CONFIG, PROFILER_CONFIG, MEMORY_CONFIG, MODEL_CONFIG, BREAKER_CONFIG, ADMISSION_CONFIG, FIX_CONTEXT_CONFIG, AUTOTEST_CONFIG, BEST_OF_N_CONFIG, TEMPLATE_CONFIG, PAYLOAD_CONFIG, MEMOIZE_CONFIG, MAINTENANCE_CONFIG, STORAGE_CONFIG
+# API key'leri: ortam degiskeni, secrets dosyasi, st.secrets sirasiyla (batch.py ile ayni)
+from config import OPENAI_API_KEY, GEMINI_API_KEY
+import analytics
+import autotest
+from database import LocalAuth, LocalDatabase
+from admission import get_controller, AdmissionRejected
+from circuit_breaker import get_breaker
+from single_flight import get_group, normalize_prompt
+from fix_context import build_fix_context, splice_window
+from fix_cache import get_fix_cache, error_signature, is_repeating
+from model_router import get_router, prompt_complexity, fix_complexity, is_valid_code
+from candidates import best_of_n, validate_candidate
+from templates import get_library
+from payload_store import get_store
+from maintenance import get_scheduler
+from memoize import DECORATOR_NAME, compile_preview, memoize_source, preview_decorator
+
+_script_started = time.perf_counter()
 
 st.set_page_config(page_title="KodUret Pro", page_icon="🚀", layout="wide")
+metrics.start_exporters(METRICS_CONFIG)
+# Admin ?profile=1 ile bu calistirmayi (preview exec ve saglayici cagrilari dahil) ornekler;
+# kapaliyken sadece parametre kontrolu
+_profile = profiler.maybe_start(PROFILER_CONFIG, st.query_params.get("profile"),
+                                st.session_state.get("user"), st.session_state.get("page", "home"))
 
-# API Keys
-OPENAI_API_KEY = st.secrets.get("OPENAI_API_KEY", "")
-GEMINI_API_KEY = st.secrets.get("GEMINI_API_KEY", "")
+# Model secimi surec genelinde paylasilir (app.py her rerun'da yeniden calisir)
+router = get_router(MODEL_CONFIG)
+admission = get_controller(ADMISSION_CONFIG)
+test_runner = autotest.get_runner(AUTOTEST_CONFIG["runner"])
+template_library = get_library(TEMPLATE_CONFIG)
+payloads = get_store(PAYLOAD_CONFIG)
+# RSS butcesi arka planda izlenir: asilinca bosta oturumlarin payload'lari ve preview
+# namespace'leri birakilir; sert asimda preview'lardaki memoize cache'leri (DataFrame'ler vb.,
+# en buyuk tuketici) de temizlenir
+memory_monitor = memory.get_monitor(MEMORY_CONFIG, payloads, on_hard=st.cache_data.clear)
+# Yedek/vacuum/checkpoint arka planda; surec basina bir kez baslar
+maintenance = get_scheduler(MAINTENANCE_CONFIG, STORAGE_CONFIG)
 
 # =============================================================================
 # DATABASE
 # =============================================================================
 
-def get_db():
-    conn = sqlite3.connect("appfab.db", check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_db():
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-        user_id TEXT PRIMARY KEY, email TEXT UNIQUE, username TEXT,
-        password_hash TEXT, credits INTEGER DEFAULT 10, is_pro INTEGER DEFAULT 0
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS apps (
-        app_id TEXT PRIMARY KEY, user_id TEXT, name TEXT, description TEXT,
-        prompt TEXT, code TEXT, is_public INTEGER DEFAULT 0, likes INTEGER DEFAULT 0,
-        created_at TEXT DEFAULT CURRENT_TIMESTAMP
-    )''')
-    conn.commit()
-    conn.close()
-
-init_db()
-
-# =============================================================================
-# AUTH
-# =============================================================================
+# Kullanici/app verisi database.py uzerinden: STORAGE_CONFIG'teki backend (tek dosya veya
+# shard'lar); sema modul ilk import edildiginde surec basina bir kez kurulur, eski app'lerin
+# facet'leri arka plan thread'inde (appfab-facet-backfill) kalmayana kadar doldurulur.
+# LocalDatabase/LocalAuth metotlari db.* olarak olculur.
 
 def create_user(email, password, username):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT * FROM users WHERE email=?", (email,))
-    if c.fetchone():
-        return False, "Email kayitli"
-    user_id = f"user_{secrets.token_hex(8)}"
-    pwd_hash = hashlib.sha256(password.encode()).hexdigest()
-    c.execute("INSERT INTO users VALUES (?,?,?,?,10,0)", (user_id, email, username, pwd_hash))
-    conn.commit()
-    conn.close()
-    return True, "Kayit basarili! 10 kredi hediye"
+    ok, msg, _ = LocalAuth.create_user(email, password, username)
+    return (True, "Kayit basarili! 10 kredi hediye") if ok else (False, msg)
 
 def login_user(email, password):
-    conn = get_db()
-    c = conn.cursor()
-    pwd_hash = hashlib.sha256(password.encode()).hexdigest()
-    c.execute("SELECT * FROM users WHERE email=? AND password_hash=?", (email, pwd_hash))
-    user = c.fetchone()
-    conn.close()
-    return (True, dict(user)) if user else (False, None)
+    ok, _, data = LocalAuth.login(email, password)
+    return (True, get_user(data["localId"])) if ok else (False, None)
 
 def get_user(user_id):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT * FROM users WHERE user_id=?", (user_id,))
-    user = c.fetchone()
-    conn.close()
-    return dict(user) if user else None
+    return LocalDatabase.get_user_profile(user_id)
 
 def deduct_credit(user_id):
-    user = get_user(user_id)
-    if user["is_pro"] or user["credits"] > 0:
-        if not user["is_pro"]:
-            conn = get_db()
-            c = conn.cursor()
-            c.execute("UPDATE users SET credits = credits - 1 WHERE user_id=?", (user_id,))
-            conn.commit()
-            conn.close()
-        return True
-    return False
+    return LocalDatabase.deduct_credit(user_id)
+
+def refund_credit(user_id):
+    """Saglayiciya hic gidilmeyen istegin kredisini geri ver"""
+    LocalDatabase.refund_credit(user_id)
 
 def save_app(user_id, name, description, prompt, code, is_public):
-    conn = get_db()
-    c = conn.cursor()
-    app_id = f"app_{int(datetime.now().timestamp())}"
-    c.execute("INSERT INTO apps VALUES (?,?,?,?,?,?,?,0,?)", 
-              (app_id, user_id, name, description, prompt, code, int(is_public), datetime.now().isoformat()))
-    conn.commit()
-    conn.close()
-    return app_id
+    # Ayni saniyede arka arkaya kayit (duzeltme denemeleri) PK cakismasi vermez
+    return LocalDatabase.create_app(user_id, name, description, prompt, code, bool(is_public))
 
 def get_user_apps(user_id):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT * FROM apps WHERE user_id=? ORDER BY created_at DESC", (user_id,))
-    apps = [dict(row) for row in c.fetchall()]
-    conn.close()
-    return apps
+    return LocalDatabase.get_user_apps(user_id)
+
+def save_test_result(app_id, result, code=None):
+    """Otomatik test sonucunu (ve onarilmis kodu) app satirina yaz"""
+    LocalDatabase.save_test_result(app_id, result, code)
+
+def get_app_test(app_id):
+    return LocalDatabase.get_app_test(app_id)
+
+def save_usage(user_id, app_id, calls):
+    """Token/gecikme kayitlarini kullanici ve app'e yaz"""
+    LocalDatabase.record_usage(user_id, app_id, calls)
 
 # =============================================================================
 # AI - GELISMIS
 # =============================================================================
 
-def generate_with_openai(prompt, system_msg=None):
+@metrics.instrument("llm.generate", "openai", metrics.returns_error)
+def generate_with_openai(prompt, system_msg=None, model=None, purpose="generate"):
     """OpenAI ile kod uret"""
     if not OPENAI_API_KEY:
         return None, "OpenAI API Key eksik"
     
+    # Model allow()'dan once: yari acik devrenin tek deneme hakki sonucsuz tuketilmesin
+    model = model or next(iter(router.plan(0.5, ["openai"])), None)
+    if not model:
+        return None, "OpenAI modeli tanimli degil"
+    
+    breaker = get_breaker("openai", BREAKER_CONFIG)
+    if not breaker.allow():
+        return None, "OpenAI gecici olarak devre disi (cok fazla hata)"
+    
+    started = time.perf_counter()
     try:
         headers = {"Authorization": f"Bearer {OPENAI_API_KEY}", "Content-Type": "application/json"}
         
@@ -133,36 +136,55 @@ def generate_with_openai(prompt, system_msg=None):
             7. Resim isleme, API cagriları, hesaplama, oyun - her seyi yapabilirsin
             8. Kodun basina hangi kutuphaneler gerekiyorsa yorum olarak yaz (ornek: # pip install requests)
             9. TURKCE karakterleri dogru kullan (ş, ç, ö, ğ, ü, ı)
+            10. Veri yukleme ve agir hesaplamalari fonksiyona al, @st.cache_data ile isaretle
+                (model/baglanti icin @st.cache_resource); widget'lar fonksiyon disinda kalsin,
+                fonksiyonlar global degisken degil parametre kullansin
             
             CIKTIDA SADECE KOD OLACAK, aciklama yok!"""
         
         payload = {
-            "model": "gpt-4o",
+            "model": model,
             "messages": [
                 {"role": "system", "content": system_msg},
                 {"role": "user", "content": f"Bu uygulamayi olustur (mukemmel ve calisan olsun): {prompt}"}
             ],
             "temperature": 0.7,
-            "max_tokens": 4000
+            "max_tokens": MODEL_CONFIG["models"].get(model, {}).get("max_tokens", 4000)
         }
         
         response = requests.post("https://api.openai.com/v1/chat/completions", 
-                                headers=headers, json=payload, timeout=120)
+                                headers=headers, json=payload, timeout=breaker.timeout())
         response.raise_for_status()
-        code = response.json()["choices"][0]["message"]["content"]
+        data = response.json()
+        code = data["choices"][0]["message"]["content"]
+        breaker.record_success(time.perf_counter() - started)
+        usage.record_call("openai", model, purpose, time.perf_counter() - started, True,
+                          **usage.parse_openai_usage(data))
         
         return clean_code(code), None
         
     except Exception as e:
+        breaker.record_failure()
+        usage.record_call("openai", model, purpose, time.perf_counter() - started, False, error=str(e))
         return None, str(e)
 
-def generate_with_gemini(prompt):
+@metrics.instrument("llm.generate", "gemini", metrics.returns_error)
+def generate_with_gemini(prompt, model=None, purpose="generate"):
     """Gemini ile kod uret (yedek)"""
     if not GEMINI_API_KEY:
         return None, "Gemini API Key eksik"
     
+    model = model or next(iter(router.plan(0.5, ["gemini"])), None)
+    if not model:
+        return None, "Gemini modeli tanimli degil"
+    
+    breaker = get_breaker("gemini", BREAKER_CONFIG)
+    if not breaker.allow():
+        return None, "Gemini gecici olarak devre disi (cok fazla hata)"
+    
+    started = time.perf_counter()
     try:
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent?key={GEMINI_API_KEY}"
+        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={GEMINI_API_KEY}"
         
         data = {
             "contents": [{
@@ -172,18 +194,32 @@ def generate_with_gemini(prompt):
             }]
         }
         
-        response = requests.post(url, json=data, timeout=60)
+        response = requests.post(url, json=data, timeout=breaker.timeout())
         response.raise_for_status()
         result = response.json()
         code = result["candidates"][0]["content"]["parts"][0]["text"]
+        breaker.record_success(time.perf_counter() - started)
+        usage.record_call("gemini", model, purpose, time.perf_counter() - started, True,
+                          **usage.parse_gemini_usage(result))
         
         return clean_code(code), None
         
     except Exception as e:
+        breaker.record_failure()
+        usage.record_call("gemini", model, purpose, time.perf_counter() - started, False, error=str(e))
         return None, str(e)
 
-def fix_code_with_ai(original_code, error_message, prompt):
-    """Hatali kodu AI ile duzelt - Eksik kutuphaneleri tespit et"""
+@metrics.instrument("llm.fix", "", metrics.returns_error)
+def fix_code_with_ai(original_code, error_message, prompt, attempt=0, user=None, on_wait=None):
+    """
+    Hatali kodu AI ile duzelt - Eksik kutuphaneleri tespit et.
+    Donus: (kod, hata, kaynak); kaynak: cache | rejected | provider (analytics icin)
+    """
+    
+    # Bilinen hata (kural) veya ayni kod+hata daha once duzeltildi: saglayiciya gitme
+    local_fix = get_fix_cache().lookup(original_code, error_message)
+    if local_fix:
+        return local_fix[0], None, "cache"
     
     # Eksik kutuphane tespiti
     missing_libs = []
@@ -219,28 +255,68 @@ def fix_code_with_ai(original_code, error_message, prompt):
     
     SADECE duzeltilmis kodu ver, aciklama yok!"""
     
-    fix_prompt = f"""ORIJINAL ISTEK: {prompt}
+    # Kucuk/yerel hata ucuz modele; onceki duzeltme tutmadiysa (attempt) bir ust modele
+    plan = router.plan(fix_complexity(original_code, error_message), available_providers())
+    plan = plan[min(attempt, len(plan) - 1):] if plan else []
+    
+    # Baglam, plandaki en kucuk modelin sinirlarina gore kesilir (context length hatasi olmaz)
+    limits = [MODEL_CONFIG["models"][m] for m in plan] or [{}]
+    max_output = min(m.get("max_tokens", 4000) for m in limits)
+    budget = min([FIX_CONTEXT_CONFIG["token_budget"]]
+                 + [m["context_tokens"] - m.get("max_tokens", 4000) for m in limits if "context_tokens" in m])
+    ctx = build_fix_context(
+        original_code, error_message,
+        window=FIX_CONTEXT_CONFIG["window"],
+        token_budget=budget,
+        max_output_tokens=max_output,
+        chars_per_token=FIX_CONTEXT_CONFIG["chars_per_token"],
+        max_traceback_lines=FIX_CONTEXT_CONFIG["max_traceback_lines"]
+    )
+    
+    excerpt_note = f"\n    HATALI SATIRLAR (>> ile isaretli):\n{ctx['excerpt']}\n" if ctx["excerpt"] else ""
+    transform = None
+    if ctx["mode"] == "full":
+        fix_prompt = f"""ORIJINAL ISTEK: {prompt}
     
     HATALI KOD:
-    {original_code}
+    {ctx['code']}
     
     HATA MESAJI:
-    {error_message}
-    {libs_note}
+    {ctx['traceback']}
+    {excerpt_note}{libs_note}
     
     Lutfen kodu duzelt ve calisir hale getir. Eger kutuphane eksikse, alternatif standart kutuphane kullan."""
+    else:
+        # Kod cok buyuk: sadece hatali blok gonderilir, donen blok yerine yerlestirilir
+        system_msg += """
     
-    # Once OpenAI dene
-    if OPENAI_API_KEY:
-        code, err = generate_with_openai(fix_prompt, system_msg)
-        if code:
-            return code, None
+    DIKKAT: Sana kodun tamami degil, sadece hatali BLOK verildi.
+    SADECE bu blogun duzeltilmis halini ver (blok girintisiz verildi, girintisiz geri ver)."""
+        if ctx.get("truncated"):
+            system_msg += """
+    '# <satir N kisaltildi>' ile biten satirlar kisaltildi; degistirmen gerekmiyorsa onlari AYNEN birak."""
+        fix_prompt = f"""ORIJINAL ISTEK: {prompt}
+    
+    HATALI BLOK (satir {ctx['start']}-{ctx['end']}):
+    {ctx['code']}
+    
+    HATA MESAJI:
+    {ctx['traceback']}
+    {excerpt_note}{libs_note}
     
-    # Olmezse Gemini dene
-    if GEMINI_API_KEY:
-        return generate_with_gemini(fix_prompt)
+    Sadece yukaridaki blogun duzeltilmis halini ver."""
+        transform = lambda block: splice_window(original_code, ctx["start"], ctx["end"], ctx["indent"], block)
     
-    return None, "Kod duzeltilemedi"
+    user_id, is_pro = _admission_identity(user)
+    try:
+        with admission.admit(user_id, is_pro, on_wait):
+            code, err = _run_plan(plan, fix_prompt, system_msg, "fix", transform=transform)
+    except AdmissionRejected as e:
+        return None, str(e), "rejected"
+    if code:
+        get_fix_cache().store(original_code, error_message, code)
+        return code, None, "provider"
+    return None, err or "Kod duzeltilemedi", "provider"
 
 def clean_code(code):
     """Kodu temizle"""
@@ -249,22 +325,127 @@ def clean_code(code):
     if code.endswith("```"): code = code[:-3]
     return code.strip()
 
-def generate_app(prompt, retry_on_error=True):
-    """Ana uretim fonksiyonu - Hata olursa otomatik duzelt"""
-    
-    # 1. OpenAI dene
-    if OPENAI_API_KEY:
-        code, error = generate_with_openai(prompt)
-        if code:
+def _admission_identity(user):
+    """Hiz siniri ve oncelik icin (user_id, is_pro)"""
+    if not user:
+        return "anonymous", False
+    return user["user_id"], bool(user.get("is_pro"))
+
+def available_providers():
+    """API key'i tanimli ve devresi acik olmayan saglayicilar"""
+    providers = []
+    if OPENAI_API_KEY: providers.append("openai")
+    if GEMINI_API_KEY: providers.append("gemini")
+    # Acik devreli saglayici timeout beklenmeden atlanir
+    return [p for p in providers if not get_breaker(p, BREAKER_CONFIG).is_open()]
+
+def call_model(model, prompt, system_msg=None, purpose="generate"):
+    """Modeli saglayicisina gore cagir"""
+    provider = MODEL_CONFIG["models"][model]["provider"]
+    if provider == "openai":
+        return generate_with_openai(prompt, system_msg, model=model, purpose=purpose)
+    if provider == "gemini":
+        # Gemini'ye system mesaji gonderilmiyor; duzeltme prompt'u kendi basina yeterli
+        return generate_with_gemini(prompt, model=model, purpose=purpose)
+    return None, f"Bilinmeyen saglayici: {provider}"
+
+def _run_plan(plan, prompt, system_msg=None, purpose="generate", escalate=True, transform=None):
+    """Plandaki modelleri sirayla dene; sadece dogrulama basarisizsa bir ust modele gec"""
+    fallback, error = None, None
+    for model in plan:
+        started = time.perf_counter()
+        code, error = call_model(model, prompt, system_msg, purpose)
+        if code and transform:
+            code = transform(code)
+        ok = is_valid_code(code)
+        router.record(model, time.perf_counter() - started, ok)
+        if ok:
             return code, None
+        fallback = code or fallback
+        if code and not escalate:
+            break
+    # Hicbiri dogrulanamadiysa elimizdeki en iyi kodu ver (kullanici duzeltebilir)
+    return fallback, None if fallback else error
+
+def _run_best_of_n(model, prompt, lease, user_id):
+    """
+    Ayni modelden lease.weight aday paralel; yerelde dogrulanan (parse, import, smoke-run)
+    ilki secilir. Her aday kabul hakkini kendi saglayici cagrisi bitince birakir: secim
+    dondukten sonra suren cagrilar da global sinirdan sayilir, kullanimlari ayrica yazilir.
+    """
+    code, error, _ = best_of_n(
+        lambda i: call_model(model, prompt, purpose="generate"),
+        lease.weight,
+        lambda candidate: validate_candidate(candidate, BEST_OF_N_CONFIG["smoke_test"],
+                                             BEST_OF_N_CONFIG["smoke_timeout"]),
+        on_result=lambda i, candidate, ok, elapsed: router.record(model, elapsed, ok),
+        on_finished=lambda i: lease.release(1),
+        on_late_usage=lambda calls: save_usage(user_id, None, calls)
+    )
+    return code, error
+
+def generate_app(prompt, retry_on_error=True, user=None, on_wait=None, candidates=None):
+    """
+    Ana uretim fonksiyonu - Basit istek ucuz modele, dogrulama basarisizsa yukselt.
+    Donus: (kod, hata, kaynak); kaynak: template | rejected | coalesced (ayni istegi yapan
+    baska oturumun sonucu) | provider. Kabul reddinde (hiz siniri, sira zaman asimi) hata
+    AdmissionRejected nesnesidir: saglayici cagrilmadi, cagiran krediyi iade eder.
+    """
+    # Sik istenen uygulamalar (VKI, doviz, Excel grafik...) saglayiciya gitmeden sablondan
+    hit = template_library.serve(prompt)
+    if hit:
+        return hit["code"], None, "template"
     
-    # 2. Gemini dene (yedek)
-    if GEMINI_API_KEY:
-        code, error = generate_with_gemini(prompt)
-        if code:
-            return code, None
+    user_id, is_pro = _admission_identity(user)
+    try:
+        admission.check_rate(user_id, is_pro)
+    except AdmissionRejected as e:
+        return None, e, "rejected"
+    
+    plan = router.plan(prompt_complexity(prompt), available_providers())
+    if candidates is None:
+        candidates = BEST_OF_N_CONFIG["pro_candidates" if is_pro else "candidates"]
     
-    return None, "Tum AI modelleri basarisiz oldu"
+    def run():
+        # Sadece gercek saglayici cagrisini yapan (leader) global sirada yer tutar;
+        # best-of-N'de her aday ayri bir saglayici cagrisi sayilir
+        if candidates > 1 and plan:
+            # Haklari adaylar birakir (slot degil): secilen aday donunce digerleri surebilir
+            lease = admission.acquire(user_id, is_pro, on_wait, weight=candidates)
+            code, error = _run_best_of_n(plan[0], prompt, lease, user_id)
+            if code or not retry_on_error or len(plan) == 1:
+                return code, error
+            with admission.slot(user_id, is_pro, on_wait):
+                return _run_plan(plan[1:], prompt)
+        with admission.slot(user_id, is_pro, on_wait):
+            return _run_plan(plan, prompt, escalate=retry_on_error)
+    
+    # Ayni prompt + model ile devam eden uretim varsa onu bekle (kredi/kayit cagiran tarafta)
+    key = (normalize_prompt(prompt), plan[0] if plan else None, retry_on_error, candidates)
+    try:
+        (code, error), shared = get_group("generate").do(key, run)
+    except AdmissionRejected as e:
+        return None, e, "rejected"
+    source = "coalesced" if shared else "provider"
+    if code:
+        return code, None, source
+    return None, "Tum AI modelleri basarisiz oldu", source
+
+def schedule_app_test(app_id, code, prompt, user):
+    """Kaydedilen app'i arka planda AppTest ile calistir; hata varsa onarmayi dene"""
+    if not AUTOTEST_CONFIG["enabled"] or not app_id:
+        return
+    save_test_result(app_id, {"status": autotest.PENDING})
+    
+    def repair(broken_code, error):
+        # Arka plan thread'i: st.* kullanilmaz, kullanim app'e yazilir; kabul kontrolu
+        # sistem kimligiyle (kullanicinin sonraki tiklamasi hiz sinirina takilmasin)
+        with usage.usage_scope() as calls:
+            fixed, err, _ = fix_code_with_ai(broken_code, error, prompt, user=autotest.SYSTEM_USER)
+        save_usage(user["user_id"], app_id, calls)
+        return fixed, err
+    
+    test_runner.submit(app_id, code, save_test_result, repair)
 
 # =============================================================================
 # SESSION
@@ -272,19 +453,57 @@ def generate_app(prompt, retry_on_error=True):
 
 if "user" not in st.session_state: st.session_state.user = None
 if "page" not in st.session_state: st.session_state.page = "home"
-if "generated_code" not in st.session_state: st.session_state.generated_code = None
+if "sid" not in st.session_state: st.session_state.sid = secrets.token_hex(8)
+# Buyuk veriler (kod, traceback, prompt) payload deposunda; session_state sadece ID tutar
+if "generated_code_id" not in st.session_state: st.session_state.generated_code_id = None
+if "last_error_id" not in st.session_state: st.session_state.last_error_id = None
+if "last_prompt_id" not in st.session_state: st.session_state.last_prompt_id = None
 if "show_preview" not in st.session_state: st.session_state.show_preview = False
 if "fix_attempt" not in st.session_state: st.session_state.fix_attempt = 0
+if "fix_signatures" not in st.session_state: st.session_state.fix_signatures = []
+if "current_app_id" not in st.session_state: st.session_state.current_app_id = None
+payloads.touch(st.session_state.sid)
+memory_monitor.touch(st.session_state.sid)
+
+def session_payload(name, default=None):
+    """Oturum verisini depodan oku"""
+    value = payloads.get(st.session_state.get(f"{name}_id"))
+    return default if value is None else value
+
+def set_session_payload(name, value):
+    """Oturum verisini depoya yaz, session_state'te sadece ID kalsin"""
+    st.session_state[f"{name}_id"] = payloads.put(st.session_state.sid, name, value)
 
 # =============================================================================
-# UI
+# FRAGMENTS
 # =============================================================================
 
-st.title("🚀 KodUret Pro")
-st.caption("Dunyadaki her seyi yapabilen AI")
+def downloadable_code(code):
+    """Indirilen koda st.cache_data / st.cache_resource decorator'lari ekle"""
+    if not MEMOIZE_CONFIG["enabled"]:
+        return code, []
+    return memoize_source(code, MEMOIZE_CONFIG["network_ttl"])
 
-with st.sidebar:
-    st.header("Menu")
+def timed_fragment(name, **fragment_kwargs):
+    """st.fragment + calisma suresi metrigi (fragment.<name>; tam calistirma: script.run)"""
+    def decorator(func):
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            started = time.perf_counter()
+            ok = True
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                ok = False
+                raise
+            finally:
+                metrics.record(f"fragment.{name}", "", time.perf_counter() - started, ok)
+        return st.fragment(run, **fragment_kwargs)
+    return decorator
+
+@timed_fragment("sidebar")
+def sidebar_account():
+    """Hesap paneli ve menu"""
     if st.session_state.user:
         user = get_user(st.session_state.user["user_id"])
         st.write(f"👤 {user['username']}")
@@ -303,6 +522,8 @@ with st.sidebar:
             st.rerun()
         if st.button("🚪 Cikis", use_container_width=True): 
             st.session_state.user = None
+            memory_monitor.release(st.session_state.sid)
+            st.session_state.generated_code_id = st.session_state.last_error_id = st.session_state.last_prompt_id = None
             st.session_state.show_preview = False
             st.rerun()
     else:
@@ -313,6 +534,295 @@ with st.sidebar:
             st.session_state.page = "auth"
             st.rerun()
 
+def is_admin(user):
+    return bool(user) and user.get("email") in APP_CONFIG["admins"]
+
+def _format_mb(value):
+    return f"{value / memory.MB:.1f} MB"
+
+def memory_panel():
+    """Admin: RSS, oturum basina bellek, tracemalloc snapshot/fark, rapor"""
+    with st.expander("🧠 Bellek"):
+        report = memory_monitor.report(limit=10)
+        budget = " / ".join(_format_mb(b) for b in (report["soft_budget"], report["hard_budget"]) if b)
+        st.metric("RSS", _format_mb(report["rss"]), help=f"Butce: {budget or 'kapali'}")
+        if report["sessions"]:
+            st.dataframe(report["sessions"], use_container_width=True, hide_index=True)
+        col1, col2 = st.columns(2)
+        if col1.button("📸 Snapshot", use_container_width=True):
+            memory_monitor.snapshot()
+            st.rerun()
+        if col2.button("🧹 Bostakileri birak", use_container_width=True):
+            st.toast(f"{memory_monitor.evict_idle(MEMORY_CONFIG['soft_idle'])} oturum birakildi")
+        if report["diff"]:
+            st.caption("Son iki snapshot farki (tahsis yeri)")
+            st.dataframe(report["diff"], use_container_width=True, hide_index=True)
+        elif report["top"]:
+            st.caption("En cok bellek tutan tahsis yerleri")
+            st.dataframe(report["top"], use_container_width=True, hide_index=True)
+        if st.button("💾 Raporu diske yaz", use_container_width=True):
+            st.toast(memory_monitor.write_report())
+
+def _event_user():
+    user = st.session_state.get("user")
+    return user["user_id"] if user else None
+
+def _call_provider(calls, source):
+    """
+    Olayin saglayicisi: son basarili cagri. Cagri yoksa kaynak (template, cache, coalesced,
+    rejected); saglayiciya gidilecekken hic cagri yapilmadiysa bos
+    """
+    ok_calls = [c for c in calls if c["success"]]
+    if not calls:
+        return {"provider": "" if source == "provider" else source}
+    last = (ok_calls or calls)[-1]
+    return {"provider": last["provider"], "model": last["model"]}
+
+def render_preview(code_to_run):
+    """Uretilen app'i calistir; hata olursa AI ile duzeltme sun"""
+    # Calistirma alani
+    error_occurred = False
+    error_full = ""
+    
+    with st.container(border=True):
+        try:
+            # Satir numaralari korunur; traceback'te GENERATED_FILENAME olarak gorunur
+            compiled, memoized = template_library.compiled(code_to_run), ()
+            if compiled is None:
+                # Saf veri/hesaplama fonksiyonlari cache'e sarilir (her etkilesimde yeniden calismaz)
+                compiled, memoized = compile_preview(code_to_run, MEMOIZE_CONFIG["enabled"])
+            if memoized:
+                st.caption("⚡ Onbellege alinan fonksiyonlar: " + ", ".join(name for name, _ in memoized))
+            namespace = {
+                "__name__": "__main__",
+                DECORATOR_NAME: functools.partial(preview_decorator, max_entries=MEMOIZE_CONFIG["max_entries"],
+                                                  network_ttl=MEMOIZE_CONFIG["network_ttl"]),
+            }
+            memory_monitor.track_namespace(st.session_state.sid, namespace)
+            started = time.perf_counter()
+            with metrics.timed("preview.exec"):
+                exec(compiled, namespace)
+            analytics.record("preview", user_id=_event_user(), app_id=st.session_state.get("current_app_id"),
+                             latency_ms=(time.perf_counter() - started) * 1000)
+        except Exception as e:
+            analytics.record("preview", user_id=_event_user(), app_id=st.session_state.get("current_app_id"),
+                             ok=False, error=type(e).__name__)
+            error_occurred = True
+            error_msg = str(e)
+            error_full = traceback.format_exc()
+            set_session_payload("last_error", error_full)  # Hatayi kaydet
+    
+            st.error(f"⚠️ Hata: {error_msg}")
+            with st.expander("Hata Detaylari (Teknik)"):
+                st.code(error_full)
+    
+            st.warning("👆 Yukaridaki '🔄 Tekrar Dene' butonuna tiklayin. AI hatayi analiz edip duzeltecek.")
+    
+    # Hata olduysa ve kullanici tekrar denemek isterse
+    if error_occurred:
+        st.divider()
+        last_error = session_payload("last_error", "Hata olustu")
+        last_prompt = session_payload("last_prompt", "")
+        signature = error_signature(last_error)
+        if is_repeating(st.session_state.fix_signatures, signature):
+            # Ayni hata duzeltmeden sonra geri geldi: dongude kredi/saglayici harcama
+            st.error("🔁 Ayni hata tekrar ediyor, otomatik duzeltme durduruldu. Isteginizi farkli ifade edip yeniden uretin.")
+        elif st.button("🔄 AI ile Hatayi Duzelt ve Tekrar Calistir", type="primary", use_container_width=True):
+            st.session_state.fix_signatures.append(signature)
+            queue_status = st.empty()
+            started = time.perf_counter()
+            with st.spinner("AI hata analizi yapip kodu duzeltiyor..."), usage.usage_scope() as calls:
+                fixed_code, err, source = fix_code_with_ai(
+                    code_to_run,
+                    last_error,
+                    last_prompt,
+                    attempt=st.session_state.fix_attempt,
+                    user=get_user(st.session_state.user["user_id"]),
+                    on_wait=lambda position: queue_status.info(f"⏳ Siradasiniz: #{position}")
+                )
+                queue_status.empty()
+                analytics.record("fix", user_id=_event_user(), app_id=st.session_state.get("current_app_id"),
+                                 ok=bool(fixed_code), latency_ms=(time.perf_counter() - started) * 1000,
+                                 **_call_provider(calls, source), attempt=st.session_state.fix_attempt)
+                if fixed_code:
+                    set_session_payload("generated_code", fixed_code)
+                    set_session_payload("last_error", None)
+                    st.session_state.fix_attempt += 1
+                    app_id = save_app(st.session_state.user["user_id"], f"Duzeltilmis_v{st.session_state.fix_attempt}", "AI ile otomatik duzeltme", last_prompt, fixed_code, False)
+                    save_usage(st.session_state.user["user_id"], app_id, calls)
+                    st.session_state.current_app_id = app_id
+                    schedule_app_test(app_id, fixed_code, last_prompt, get_user(st.session_state.user["user_id"]))
+                    st.success(f"✅ Kod duzeltildi! Deneme #{st.session_state.fix_attempt}")
+                    st.rerun()
+                else:
+                    save_usage(st.session_state.user["user_id"], None, calls)
+                    st.error(f"Duzeltme basarisiz: {err}")
+
+# Uretilen app'teki etkilesimler sadece onizlemeyi yeniden calistirir
+preview_fragment = timed_fragment("preview")(render_preview)
+
+@timed_fragment("generation")
+def generation_panel(user):
+    """Uretim formu + sonuc; form etkilesimleri sayfanin geri kalanini yeniden calistirmaz"""
+    prompt = st.text_area("Detayli anlatin:", 
+                         placeholder="Ne isterseniz yazin - imkansiz yok! Ornegin: 'Excel yukleyip grafik cizdiren app yap...'",
+                         height=120)
+    
+    col1, col2 = st.columns([3, 1])
+    app_name = col1.text_input("Uygulama Adi", "Benim Super App'im")
+    is_public = col2.checkbox("Herkese Acik")
+    
+    if st.button("🚀 KOD URET (AI Calisiyor...)", type="primary", use_container_width=True):
+        if prompt:
+            set_session_payload("last_prompt", prompt)
+            if deduct_credit(st.session_state.user["user_id"]):
+                queue_status = st.empty()
+                started = time.perf_counter()
+                with st.spinner("🤖 AI dusunuyor... (Bu biraz zaman alabilir)"), usage.usage_scope() as calls:
+                    code, error, source = generate_app(
+                        prompt, user=user,
+                        on_wait=lambda position: queue_status.info(f"⏳ Siradasiniz: #{position}"))
+                queue_status.empty()
+                # Saglayiciya gidilmedi (kabul reddi veya cevrimdisi sablon): kredi iade
+                if isinstance(error, AdmissionRejected) or source == "template":
+                    refund_credit(st.session_state.user["user_id"])
+    
+                app_id = None
+                if code:
+                    app_id = save_app(st.session_state.user["user_id"], app_name, prompt[:100], prompt, code, is_public)
+                analytics.record("generation", user_id=_event_user(), app_id=app_id, ok=bool(code),
+                                 latency_ms=(time.perf_counter() - started) * 1000, **_call_provider(calls, source))
+                save_usage(st.session_state.user["user_id"], app_id, calls)
+                if code:
+                    st.session_state.current_app_id = app_id
+                    schedule_app_test(app_id, code, prompt, user)
+                    set_session_payload("generated_code", code)
+                    st.session_state.show_preview = False
+                    st.session_state.fix_attempt = 0
+                    st.session_state.fix_signatures = []
+                    st.success(f"✅ Kod basariyla olusturuldu! (Deneme: {st.session_state.fix_attempt + 1})")
+                    st.rerun()
+                else:
+                    st.error(f"Hata: {error}")
+            else:
+                st.error("Krediniz bitti!")
+        else:
+            st.error("Lutfen bir seyler yazin")
+    
+    if st.session_state.generated_code_id:
+        st.divider()
+    
+        st.markdown("""
+        <div style="background: linear-gradient(90deg, #11998e 0%, #38ef7d 100%); 
+                    padding: 25px; border-radius: 15px; text-align: center; margin: 20px 0;">
+            <h2 style="color: white; margin: 0;">🎮 Hazir!</h2>
+            <p style="color: white; font-size: 18px; margin: 10px 0;">Uygulamanizi simdi calistirabilir veya kodu inceleyebilirsiniz</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+        test = get_app_test(st.session_state.current_app_id) if st.session_state.current_app_id else None
+        if test:
+            status = test["test_status"]
+            if status == autotest.PENDING:
+                st.info("🧪 Otomatik test calisiyor...")
+            elif status == autotest.PASSED:
+                st.success(f"🧪 Otomatik test gecti ({test['test_ms']} ms)")
+            elif status == autotest.REPAIRED:
+                st.success("🧪 Otomatik testte bulunan hata AI ile duzeltildi")
+            elif status == autotest.FAILED:
+                st.warning("🧪 Otomatik test hata buldu; calistirdiginizda AI ile duzeltebilirsiniz")
+                with st.expander("Test Hatasi"):
+                    st.code(test["test_error"] or "")
+    
+        col_run, col_show = st.columns(2)
+        with col_run:
+            if st.button("▶️ UYGULAMAYI CALISTIR", type="primary", use_container_width=True):
+                if st.session_state.current_app_id:
+                    # Arka plandaki test/onarim bitmek uzereyse onarilmis kodu kullan
+                    with st.spinner("🧪 Otomatik test bekleniyor..."):
+                        test_runner.wait(st.session_state.current_app_id, AUTOTEST_CONFIG["preview_wait"])
+                    test = get_app_test(st.session_state.current_app_id)
+                    if test and test["test_status"] == autotest.REPAIRED:
+                        set_session_payload("generated_code", test["code"])
+                st.session_state.show_preview = True
+                st.rerun()
+        with col_show:
+            with st.expander("📜 Kodu Goster"):
+                generated_code = session_payload("generated_code", "")
+                st.code(generated_code, language="python")
+                download, memoized = downloadable_code(generated_code)
+                if memoized:
+                    st.caption("⚡ Indirilen kodda onbellege alinan fonksiyonlar: "
+                               + ", ".join(f["name"] for f in memoized))
+                st.download_button("💾 Indir (.py)", download, file_name="app.py")
+
+@timed_fragment("archive")
+def archive_panel(user_id):
+    """Tum app'leri zip olarak indir / zip'ten ice aktar"""
+    with st.expander("📦 Toplu Disa / Ice Aktar"):
+        if st.button("📦 Tum uygulamalari zip olarak hazirla", use_container_width=True):
+            # Zip diske akar; app kodlari topluca bellege alinmaz
+            with tempfile.TemporaryFile() as f, st.spinner("Zip hazirlaniyor..."):
+                result = LocalDatabase.export_user_apps(user_id, f)
+                f.seek(0)
+                st.download_button(f"💾 Indir ({result['apps']} app)", f, file_name=f"appfab-{user_id}.zip",
+                                   mime="application/zip", use_container_width=True)
+        
+        uploaded = st.file_uploader("AppFab zip dosyasi", type="zip")
+        if uploaded and st.button("📥 Ice aktar", use_container_width=True):
+            result, err = LocalDatabase.import_user_apps(user_id, uploaded)
+            if err:
+                st.error(err)
+            else:
+                st.success(f"✅ {result['imported']} app eklendi, {result['skipped']} zaten vardi, "
+                           f"{result['invalid']} gecersiz")
+
+@timed_fragment("saved_apps")
+def saved_apps_list(user_id, per_page=10):
+    """Kayitli uygulamalar; arama ve sayfalama sadece listeyi yeniden calistirir"""
+    apps = get_user_apps(user_id)
+    if not apps:
+        st.info("Henuz kayitli uygulamaniz yok")
+        return
+    
+    query = st.text_input("🔍 Ara", placeholder="Uygulama adi veya istek")
+    if query:
+        q = query.lower()
+        apps = [a for a in apps if q in (a["name"] or "").lower() or q in (a["prompt"] or "").lower()]
+    pages = max(1, (len(apps) + per_page - 1) // per_page)
+    page = st.number_input("Sayfa", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+    
+    for i, app in enumerate(apps[(page - 1) * per_page:page * per_page]):
+        with st.expander(f"{'🌍' if app['is_public'] else '🔒'} {app['name']} - {(app['created_at'] or '')[:16]}"):
+            st.caption(app["description"] or "")
+            st.code(app["code"], language="python")
+            col1, col2 = st.columns(2)
+            if col1.button("▶️ Calistir", key=f"run_{i}_{app['app_id']}", use_container_width=True):
+                # Sayfa degisiyor: tam calistirma
+                set_session_payload("generated_code", app["code"])
+                set_session_payload("last_prompt", app["prompt"])
+                st.session_state.current_app_id = app["app_id"]
+                st.session_state.fix_attempt = 0
+                st.session_state.fix_signatures = []
+                st.session_state.page = "create"
+                st.session_state.show_preview = True
+                st.rerun()
+            col2.download_button("💾 Indir (.py)", downloadable_code(app["code"])[0], file_name=f"{app['app_id']}.py",
+                                 key=f"dl_{i}_{app['app_id']}", use_container_width=True)
+
+# =============================================================================
+# UI
+# =============================================================================
+
+st.title("🚀 KodUret Pro")
+st.caption("Dunyadaki her seyi yapabilen AI")
+
+with st.sidebar:
+    st.header("Menu")
+    sidebar_account()
+    if is_admin(st.session_state.user):
+        memory_panel()
+
 # =============================================================================
 # PAGES
 # =============================================================================
@@ -380,7 +890,7 @@ elif st.session_state.page == "create":
         st.stop()
     
     # PREVIEW MODU
-    if st.session_state.show_preview and st.session_state.generated_code:
+    if st.session_state.show_preview and st.session_state.generated_code_id:
         st.markdown("""
         <div style="background: linear-gradient(90deg, #667eea 0%, #764ba2 100%); 
                     padding: 20px; border-radius: 15px; margin-bottom: 20px;">
@@ -393,47 +903,12 @@ elif st.session_state.page == "create":
             st.session_state.show_preview = False
             st.rerun()
         
-        # Calistirma alani
-        error_occurred = False
-        error_full = ""
-        
-        with st.container(border=True):
-            try:
-                code_to_run = st.session_state.generated_code
-                lines = code_to_run.split('\n')
-                filtered_lines = [line for line in lines if 'set_page_config' not in line]
-                clean_code_exec = '\n'.join(filtered_lines)
-                exec(clean_code_exec)
-            except Exception as e:
-                error_occurred = True
-                error_msg = str(e)
-                error_full = traceback.format_exc()
-                st.session_state.last_error = error_full  # Hatayi kaydet
-                
-                st.error(f"⚠️ Hata: {error_msg}")
-                with st.expander("Hata Detaylari (Teknik)"):
-                    st.code(error_full)
-                
-                st.warning("👆 Yukaridaki '🔄 Tekrar Dene' butonuna tiklayin. AI hatayi analiz edip duzeltecek.")
-        
-        # Hata olduysa ve kullanici tekrar denemek isterse
-        if error_occurred:
-            st.divider()
-            if st.button("🔄 AI ile Hatayi Duzelt ve Tekrar Calistir", type="primary", use_container_width=True):
-                with st.spinner("AI hata analizi yapip kodu duzeltiyor..."):
-                    fixed_code, err = fix_code_with_ai(
-                        st.session_state.generated_code,
-                        st.session_state.get('last_error', 'Hata olustu'),
-                        st.session_state.last_prompt
-                    )
-                    if fixed_code:
-                        st.session_state.generated_code = fixed_code
-                        st.session_state.fix_attempt += 1
-                        save_app(st.session_state.user["user_id"], f"Duzeltilmis_v{st.session_state.fix_attempt}", "AI ile otomatik duzeltme", st.session_state.last_prompt, fixed_code, False)
-                        st.success(f"✅ Kod duzeltildi! Deneme #{st.session_state.fix_attempt}")
-                        st.rerun()
-                    else:
-                        st.error(f"Duzeltme basarisiz: {err}")
+        code_to_run = session_payload("generated_code", "")
+        # st.sidebar'a yazan app fragment icinde calisamaz (Streamlit izin vermez)
+        if "sidebar" in code_to_run:
+            render_preview(code_to_run)
+        else:
+            preview_fragment(code_to_run)
     
     # NORMAL MOD
     else:
@@ -441,6 +916,10 @@ elif st.session_state.page == "create":
         user = get_user(st.session_state.user["user_id"])
         st.write(f"💎 Krediniz: {user['credits']}")
         
+        position = admission.position(user["user_id"])
+        if position:
+            st.info(f"⏳ Onceki isteginiz sirada: #{position}")
+        
         st.info("""
         **Ornekler:**
         - "Excel dosyasi yukleyip satis analizi yapan app yap"
@@ -450,55 +929,7 @@ elif st.session_state.page == "create":
         - "Sudoku oyunu yap"
         """)
         
-        prompt = st.text_area("Detayli anlatin:", 
-                             placeholder="Ne isterseniz yazin - imkansiz yok! Ornegin: 'Excel yukleyip grafik cizdiren app yap...'",
-                             height=120)
-        
-        col1, col2 = st.columns([3, 1])
-        app_name = col1.text_input("Uygulama Adi", "Benim Super App'im")
-        is_public = col2.checkbox("Herkese Acik")
-        
-        if st.button("🚀 KOD URET (AI Calisiyor...)", type="primary", use_container_width=True):
-            if prompt:
-                st.session_state.last_prompt = prompt
-                if deduct_credit(st.session_state.user["user_id"]):
-                    with st.spinner("🤖 AI dusunuyor... (Bu biraz zaman alabilir)"):
-                        code, error = generate_app(prompt)
-                    
-                    if code:
-                        save_app(st.session_state.user["user_id"], app_name, prompt[:100], prompt, code, is_public)
-                        st.session_state.generated_code = code
-                        st.session_state.show_preview = False
-                        st.session_state.fix_attempt = 0
-                        st.success(f"✅ Kod basariyla olusturuldu! (Deneme: {st.session_state.fix_attempt + 1})")
-                        st.rerun()
-                    else:
-                        st.error(f"Hata: {error}")
-                else:
-                    st.error("Krediniz bitti!")
-            else:
-                st.error("Lutfen bir seyler yazin")
-        
-        if st.session_state.generated_code:
-            st.divider()
-            
-            st.markdown("""
-            <div style="background: linear-gradient(90deg, #11998e 0%, #38ef7d 100%); 
-                        padding: 25px; border-radius: 15px; text-align: center; margin: 20px 0;">
-                <h2 style="color: white; margin: 0;">🎮 Hazir!</h2>
-                <p style="color: white; font-size: 18px; margin: 10px 0;">Uygulamanizi simdi calistirabilir veya kodu inceleyebilirsiniz</p>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            col_run, col_show = st.columns(2)
-            with col_run:
-                if st.button("▶️ UYGULAMAYI CALISTIR", type="primary", use_container_width=True):
-                    st.session_state.show_preview = True
-                    st.rerun()
-            with col_show:
-                with st.expander("📜 Kodu Goster"):
-                    st.code(st.session_state.generated_code, language="python")
-                    st.download_button("💾 Indir (.py)", st.session_state.generated_code, file_name="app.py")
+        generation_panel(user)
 
 elif st.session_state.page == "myapps":
     if not st.session_state.user:
@@ -506,3 +937,12 @@ elif st.session_state.page == "myapps":
         st.stop()
     
     st.header("📂 Kayitli Uygulamalarim")
+    archive_panel(st.session_state.user["user_id"])
+    saved_apps_list(st.session_state.user["user_id"])
+
+# =============================================================================
+# METRICS
+# =============================================================================
+
+# st.rerun() / st.stop() ile biten calistirmalar buraya ulasmaz
+metrics.record("script.run", "", time.perf_counter() - _script_started)
@@ -1,19 +1,36 @@
 """
 AppFab - App Generator
-Streamlit app oluşturma ve kaydetme
+Streamlit app oluşturma ve kaydetme (Streamlit'siz çekirdek; hatalar değer olarak döner)
 """
 
-import streamlit as st
 import requests
-from config import OPENAI_API_KEY
+from config import OPENAI_API_KEY, MODEL_CONFIG, BREAKER_CONFIG, TEMPLATE_CONFIG
+from circuit_breaker import get_breaker
 from database import AppManager, LocalDatabase
-from typing import Dict, Optional
+from model_router import get_router, prompt_complexity, is_valid_code
+from templates import get_library
+import usage
+from typing import Dict, Optional, Tuple
 import time
 
-def generate_streamlit_app(prompt: str, name: str = "", description: str = "") -> Optional[Dict]:
+def generate_streamlit_app(prompt: str, name: str = "", description: str = "") -> Dict:
     """
     OpenAI ile Streamlit app kodu oluştur
+    Başarısızsa {"success": False, "error": ...} döner (UI gösterir)
     """
+    # Şablonla karşılanan istekler için sağlayıcı çağrısı yapılmaz
+    hit = get_library(TEMPLATE_CONFIG).serve(prompt)
+    if hit:
+        return {
+            "success": True,
+            "name": name or hit["title"],
+            "description": description or prompt[:100],
+            "code": hit["code"],
+            "app_id": None,
+            "template": hit["template"],
+            "usage": []
+        }
+    
     if not OPENAI_API_KEY or OPENAI_API_KEY == "sk-your-openai-api-key-here":
         demo_code = '''import streamlit as st
 import pandas as pd
@@ -74,6 +91,15 @@ with col3:
             "note": "Demo kodu (API key gerekli)"
         }
     
+    breaker = get_breaker("openai", BREAKER_CONFIG)
+    if not breaker.allow():
+        return {"success": False, "error": "OpenAI geçici olarak devre dışı, lütfen biraz sonra tekrar deneyin"}
+    
+    router = get_router(MODEL_CONFIG)
+    # Basit istek ucuz/hızlı modele gider; yükseltme app.py'deki gibi doğrulamaya bağlı
+    model = router.plan(prompt_complexity(prompt), ["openai"])[0]
+    started = time.time()
+    
     try:
         # OpenAI API kullanımı - requests ile doğrudan çağrı
         headers = {
@@ -82,7 +108,7 @@ with col3:
         }
         
         payload = {
-            "model": "gpt-4o-mini",
+            "model": model,
             "messages": [
                 {"role": "system", "content": """Sen uzman bir Streamlit geliştiricisisin. 
 Kullanıcının isteğine göre çalışan, modern ve profesyonel bir Streamlit uygulaması oluştur.
@@ -98,18 +124,21 @@ KURALLAR:
                 {"role": "user", "content": f"Bir Streamlit app oluştur: {prompt}"}
             ],
             "temperature": 0.7,
-            "max_tokens": 2000
+            "max_tokens": MODEL_CONFIG["models"].get(model, {}).get("max_tokens", 2000)
         }
         
         response = requests.post(
             "https://api.openai.com/v1/chat/completions",
             headers=headers,
             json=payload,
-            timeout=60
+            timeout=breaker.timeout()
         )
         response.raise_for_status()
         data = response.json()
         code = data["choices"][0]["message"]["content"]
+        breaker.record_success(time.time() - started)
+        call = usage.record_call("openai", model, "generate", time.time() - started, True,
+                                 **usage.parse_openai_usage(data))
         
         # Markdown kod bloğunu temizle
         if code.startswith("```python"):
@@ -119,24 +148,27 @@ KURALLAR:
         if code.endswith("```"):
             code = code[:-3]
         code = code.strip()
+        router.record(model, time.time() - started, is_valid_code(code))
         
         return {
             "success": True,
             "name": name or "AI Tarafından Oluşturuldu",
             "description": description or prompt[:100],
             "code": code,
-            "app_id": None
+            "app_id": None,
+            "model": model,
+            "usage": [call]
         }
         
     except Exception as e:
-        st.error(f"Üretim hatası: {str(e)}")
-        import traceback
-        st.error(traceback.format_exc())
-        return None
+        breaker.record_failure()
+        router.record(model, time.time() - started, False)
+        return {"success": False, "error": str(e), "model": model}
 
-def save_generated_app(user_id: str, prompt: str, generated_data: Dict, is_public: bool = False) -> Optional[str]:
+def save_generated_app(user_id: str, prompt: str, generated_data: Dict,
+                       is_public: bool = False) -> Tuple[Optional[str], Optional[str]]:
     """
-    Üretilen app'i veritabanına kaydet
+    Üretilen app'i veritabanına kaydet: (app_id, hata)
     """
     try:
         app_id = AppManager.create_app(
@@ -147,51 +179,7 @@ def save_generated_app(user_id: str, prompt: str, generated_data: Dict, is_publi
             code=generated_data.get("code", ""),
             is_public=is_public
         )
-        return app_id
+        LocalDatabase.record_usage(user_id, app_id, generated_data.get("usage", []))
+        return app_id, None
     except Exception as e:
-        st.error(f"Kayıt hatası: {str(e)}")
-        return None
-
-def preview_app(code: str, unique_key: str):
-    """
-    App önizlemesi (kod gösterimi)
-    """
-    st.subheader("📝 Oluşturulan Kod")
-    
-    # Copy button
-    col1, col2 = st.columns([1, 4])
-    with col1:
-        if st.button("📋 Kopyala", key=f"copy_{unique_key}"):
-            st.code(code, language="python")
-            st.success("Kod panoya kopyalandı!")
-            
-    with col2:
-        if st.button("💾 İndir", key=f"download_{unique_key}"):
-            st.download_button(
-                label="📥 app.py İndir",
-                data=code,
-                file_name="app.py",
-                mime="text/x-python",
-                key=f"dl_{unique_key}"
-            )
-    
-    st.code(code, language="python")
-
-def run_app_preview(code: str):
-    """
-    App çalıştırma talimatları
-    """
-    st.markdown("""
-    ### 🚀 App'i Çalıştırma
-    
-    **1. Yöntem: Doğrudan Çalıştırma**
-    ```bash
-    # app.py dosyası oluşturun
-    streamlit run app.py
-    ```
-    
-    **2. Yöntem: Mevcut Projeye Ekleme**
-    ```python
-    # Oluşturulan kodu mevcut projenize yapıştırın
-    ```
-    """)
+        return None, f"Kayıt hatası: {str(e)}"
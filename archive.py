@@ -0,0 +1,248 @@
+"""
+AppFab - Archive
+Kullanıcının app'lerini zip olarak dışa/içe aktarma: dışa aktarma SQLite cursor'ı üzerinde
+fetchmany ile ilerler ve zip'e akış halinde yazar (bellek app sayısından bağımsız);
+içe aktarma toplu transaction'larla ekler
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+import zipfile
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+import facets
+import metrics
+from ids import new_id
+
+EXPORTED_TOTAL = metrics.REGISTRY.counter(
+    "appfab_archive_exported_apps_total", "Dışa aktarılan app'ler")
+IMPORTED_TOTAL = metrics.REGISTRY.counter(
+    "appfab_archive_imported_apps_total", "İçe aktarılan app'ler", ("result",))
+
+ARCHIVE_FORMAT = "appfab-export"
+ARCHIVE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+# import adı -> pip paketi (aynı olanlar yazılmaz)
+PIP_NAMES = {
+    "cv2": "opencv-python",
+    "PIL": "Pillow",
+    "sklearn": "scikit-learn",
+    "skimage": "scikit-image",
+    "yaml": "PyYAML",
+    "bs4": "beautifulsoup4",
+    "docx": "python-docx",
+    "pptx": "python-pptx",
+    "fitz": "PyMuPDF",
+    "dateutil": "python-dateutil",
+    "dotenv": "python-dotenv",
+    "google": "google-generativeai",
+}
+
+_STDLIB = set(getattr(sys, "stdlib_module_names", ())) or {
+    "os", "sys", "re", "io", "json", "csv", "math", "random", "time", "datetime", "collections",
+    "itertools", "functools", "typing", "pathlib", "string", "statistics", "base64", "hashlib",
+    "uuid", "decimal", "fractions", "calendar", "textwrap", "zipfile", "tempfile", "sqlite3",
+    "urllib", "html", "copy", "dataclasses", "enum", "operator", "secrets", "struct", "logging",
+}
+
+def _pins(path: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "requirements.txt")) -> Dict[str, str]:
+    """Projenin requirements.txt'indeki sürüm kısıtları (paket adı küçük harf -> satır)"""
+    pins = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                match = re.match(r"[A-Za-z0-9_.\-]+", line)
+                if match:
+                    pins[match.group(0).lower()] = line
+    except OSError:
+        pass
+    return pins
+
+_PINS = _pins()
+
+def requirements_for(code: str) -> List[str]:
+    """Kodun import'larından requirements.txt satırları (streamlit her zaman)"""
+    packages = {"streamlit"}
+    for library in facets.analyze_code(code)["libraries"]:
+        if library in _STDLIB or library.startswith("_"):
+            continue
+        packages.add(PIP_NAMES.get(library, library))
+    return sorted((_PINS.get(p.lower(), p) for p in packages), key=str.lower)
+
+def _slug(name: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", name or "").strip("-").lower()
+    return slug[:40] or "app"
+
+def _iter_rows(conn: sqlite3.Connection, sql: str, params: Tuple, fetch_size: int) -> Iterator[sqlite3.Row]:
+    """Cursor'dan fetch_size'lık parçalarla oku (tüm sonuç listeye alınmaz)"""
+    cursor = conn.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            return
+        yield from rows
+
+# =============================================================================
+# EXPORT
+# =============================================================================
+
+def export_apps(conn: sqlite3.Connection, user_id: str, out: Union[str, IO[bytes]],
+                fetch_size: int = 50) -> Dict[str, Any]:
+    """
+    Kullanıcının app'lerini zip'e yaz: <klasör>/app.py, <klasör>/requirements.txt ve
+    en sonda manifest.json. out: dosya yolu veya (seek edilemeyen de olabilir) binary akış.
+    conn'un row_factory'si sqlite3.Row olmalı.
+    """
+    exported, started = 0, time.perf_counter()
+    # Manifest girdileri app'lerle birlikte büyümesin diye geçici dosyada biriktirilir
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as archive, \
+            tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode="w+", encoding="utf-8") as manifest:
+        rows = _iter_rows(conn, '''
+            SELECT app_id, name, description, prompt, code, is_public, likes, created_at
+            FROM apps WHERE user_id = ? ORDER BY created_at, app_id
+        ''', (user_id,), fetch_size)
+        for row in rows:
+            code = row["code"] or ""
+            folder = f"{_slug(row['name'])}-{row['app_id'][-6:].lower()}"
+            requirements = requirements_for(code)
+            archive.writestr(f"{folder}/app.py", code)
+            archive.writestr(f"{folder}/requirements.txt", "\n".join(requirements) + "\n")
+            entry = {
+                "app_id": row["app_id"], "path": folder, "name": row["name"],
+                "description": row["description"], "prompt": row["prompt"],
+                "is_public": bool(row["is_public"]), "likes": row["likes"], "created_at": row["created_at"],
+                "sha256": hashlib.sha256(code.encode("utf-8")).hexdigest(), "requirements": requirements,
+            }
+            manifest.write(("," if exported else "") + json.dumps(entry, ensure_ascii=False) + "\n")
+            exported += 1
+            EXPORTED_TOTAL.inc()
+        manifest.seek(0)
+        with archive.open(MANIFEST_NAME, "w") as f:
+            header = {"format": ARCHIVE_FORMAT, "version": ARCHIVE_VERSION, "user_id": user_id,
+                      "exported_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "count": exported}
+            f.write(json.dumps(header, ensure_ascii=False)[:-1].encode("utf-8") + b', "apps": [\n')
+            for line in manifest:
+                f.write(line.encode("utf-8"))
+            f.write(b"]}\n")
+    return {"apps": exported, "seconds": round(time.perf_counter() - started, 3)}
+
+# =============================================================================
+# IMPORT
+# =============================================================================
+
+def _existing_hashes(conn: sqlite3.Connection, user_id: str, fetch_size: int) -> Set[str]:
+    return {hashlib.sha256((row[0] or "").encode("utf-8")).hexdigest()
+            for row in _iter_rows(conn, "SELECT code FROM apps WHERE user_id = ?", (user_id,), fetch_size)}
+
+def import_apps(conn: sqlite3.Connection, user_id: str, source: Union[str, IO[bytes]],
+                batch_size: int = 100, max_app_bytes: int = 1024 * 1024, skip_duplicates: bool = True,
+                on_batch: Optional[Callable[[List[str]], None]] = None,
+                new_app_id: Callable[[], str] = lambda: new_id("app")) -> Tuple[Optional[Dict[str, int]], Optional[str]]:
+    """
+    export_apps zip'ini kullanıcıya ekle: batch_size app'te bir commit, app'ler gizli eklenir.
+    on_batch(app_ids): her commit'ten sonra (ör. eski ID'li app'lerin dizinine kayıt).
+    new_app_id: app ID üretici (sharded backend'de shard'ı taşıyan ID).
+    Dönüş: ({'imported', 'skipped', 'invalid'}, None) veya (None, hata)
+    """
+    try:
+        archive = zipfile.ZipFile(source)
+    except (zipfile.BadZipFile, OSError) as e:
+        return None, f"Zip okunamadı: {e}"
+    with archive:
+        try:
+            manifest = json.loads(archive.read(MANIFEST_NAME))
+        except (KeyError, ValueError) as e:
+            return None, f"Geçersiz manifest: {e}"
+        if manifest.get("format") != ARCHIVE_FORMAT:
+            return None, "AppFab dışa aktarma dosyası değil"
+
+        counts = {"imported": 0, "skipped": 0, "invalid": 0}
+        seen = _existing_hashes(conn, user_id, batch_size) if skip_duplicates else set()
+        batch: List[Tuple] = []
+
+        def flush():
+            if not batch:
+                return
+            cursor = conn.cursor()
+            try:
+                cursor.executemany('''
+                    INSERT INTO apps (app_id, user_id, name, description, prompt, code, is_public, likes, created_at)
+                    VALUES (?,?,?,?,?,?,0,0,?)
+                ''', batch)
+                for values in batch:
+                    facets.save_facets(cursor, values[0], values[5])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            if on_batch:
+                on_batch([values[0] for values in batch])
+            counts["imported"] += len(batch)
+            IMPORTED_TOTAL.inc(len(batch), result="imported")
+            batch.clear()
+
+        for entry in manifest.get("apps", []):
+            try:
+                info = archive.getinfo(f"{entry['path']}/app.py")
+            except (KeyError, TypeError):
+                info = None
+            if info is None or info.file_size > max_app_bytes:
+                counts["invalid"] += 1
+                IMPORTED_TOTAL.inc(result="invalid")
+                continue
+            code = archive.read(info).decode("utf-8", errors="replace")
+            digest = hashlib.sha256(code.encode("utf-8")).hexdigest()
+            if digest in seen:
+                counts["skipped"] += 1
+                IMPORTED_TOTAL.inc(result="skipped")
+                continue
+            seen.add(digest)
+            batch.append((new_app_id(), user_id, entry.get("name") or entry["path"], entry.get("description") or "",
+                          entry.get("prompt") or "", code, entry.get("created_at") or time.strftime("%Y-%m-%dT%H:%M:%S")))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+    return counts, None
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from config import ARCHIVE_CONFIG
+
+    parser = argparse.ArgumentParser(description="Kullanıcı app'lerini zip olarak dışa/içe aktar")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("user_id")
+    parser.add_argument("path", help="zip dosyası ('-' = stdout, sadece export)")
+    parser.add_argument("--db", default="appfab.db")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    conn.row_factory = sqlite3.Row
+    try:
+        if args.command == "export":
+            out = sys.stdout.buffer if args.path == "-" else args.path
+            result = export_apps(conn, args.user_id, out, ARCHIVE_CONFIG["fetch_size"])
+        else:
+            result, err = import_apps(conn, args.user_id, args.path, ARCHIVE_CONFIG["batch_size"],
+                                      ARCHIVE_CONFIG["max_app_bytes"])
+            if err:
+                print(err, file=sys.stderr)
+                return 1
+    finally:
+        conn.close()
+    print(json.dumps(result), file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,11 @@ Local Authentication (PC'de kayıt)
 """
 
 import streamlit as st
+import secrets
+from typing import Any
+from config import PAYLOAD_CONFIG
 from database import LocalAuth, LocalDatabase
+from payload_store import get_store
 
 def init_session_state():
     """Session state'i başlat"""
@@ -14,14 +18,27 @@ def init_session_state():
         st.session_state.user = None
     if 'signup_success' not in st.session_state:
         st.session_state.signup_success = False
-    if 'generated_app' not in st.session_state:
-        st.session_state.generated_app = None
-    if 'generated_code' not in st.session_state:
-        st.session_state.generated_code = None
-    if 'last_prompt' not in st.session_state:
-        st.session_state.last_prompt = ""
+    if 'sid' not in st.session_state:
+        st.session_state.sid = secrets.token_hex(8)
+    # Büyük veriler payload deposunda; session_state sadece ID tutar
+    if 'generated_app_id' not in st.session_state:
+        st.session_state.generated_app_id = None
+    if 'generated_code_id' not in st.session_state:
+        st.session_state.generated_code_id = None
+    if 'last_prompt_id' not in st.session_state:
+        st.session_state.last_prompt_id = None
     if 'credits_updated' not in st.session_state:
         st.session_state.credits_updated = False
+    get_store(PAYLOAD_CONFIG).touch(st.session_state.sid)
+
+def get_session_payload(name: str, default: Any = None) -> Any:
+    """Oturum verisini (generated_app, generated_code, last_prompt) depodan oku"""
+    value = get_store(PAYLOAD_CONFIG).get(st.session_state.get(f"{name}_id"))
+    return default if value is None else value
+
+def set_session_payload(name: str, value: Any):
+    """Oturum verisini depoya yaz, session_state'te sadece ID kalsın"""
+    st.session_state[f"{name}_id"] = get_store(PAYLOAD_CONFIG).put(st.session_state.sid, name, value)
 
 def sign_up(email: str, password: str, username: str = ""):
     """Yeni kullanıcı kaydı"""
@@ -57,8 +74,10 @@ def log_out():
     """Çıkış yap"""
     st.session_state.user = None
     st.session_state.page = 'home'
-    st.session_state.generated_app = None
-    st.session_state.generated_code = None
+    get_store(PAYLOAD_CONFIG).release(st.session_state.sid)
+    st.session_state.generated_app_id = None
+    st.session_state.generated_code_id = None
+    st.session_state.last_prompt_id = None
     st.rerun()
 
 def get_current_user():
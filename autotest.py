@@ -0,0 +1,176 @@
+"""
+AppFab - Auto Test
+Kaydedilen app'leri streamlit.testing ile arka planda çalıştırır,
+sonucu apps satırına yazar ve başarısız olanları onarım kuyruğuna alır
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import facets
+import metrics
+from fix_context import GENERATED_FILENAME
+
+TEST_SECONDS = metrics.REGISTRY.histogram(
+    "appfab_autotest_duration_seconds", "Otomatik test süresi", ("result",))
+TEST_TOTAL = metrics.REGISTRY.counter(
+    "appfab_autotest_total", "Otomatik test sonuçları", ("status",))
+
+PENDING = "pending"
+PASSED = "passed"
+FAILED = "failed"
+REPAIRED = "repaired"
+SKIPPED = "skipped"
+
+# Arka plan onarımlarının kabul kimliği: kullanıcının kendi hız sınırı kovası harcanmaz,
+# tüm onarımlar tek (ücretsiz katman) kovayı paylaşır
+SYSTEM_USER = {"user_id": "system:autotest", "is_pro": False}
+
+# apps tablosuna eklenen kolonlar (app.py ve database.py aynı migrasyonu çalıştırır)
+TEST_COLUMNS = {
+    "test_status": "TEXT",
+    "test_error": "TEXT",
+    "test_ms": "INTEGER",
+    "tested_at": "TEXT",
+}
+
+def migrate_apps_table(cursor):
+    """apps tablosuna test kolonlarını ekle (yoksa)"""
+    cursor.execute("PRAGMA table_info(apps)")
+    existing = {row[1] for row in cursor.fetchall()}
+    for column, kind in TEST_COLUMNS.items():
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE apps ADD COLUMN {column} {kind}")
+
+def save_result(cursor, app_id: str, result: Dict[str, Any], code: Optional[str] = None):
+    """Test sonucunu (ve onarıldıysa yeni kodu) apps satırına yaz"""
+    if code is not None:
+        cursor.execute("UPDATE apps SET code = ? WHERE app_id = ?", (code, app_id))
+        facets.save_facets(cursor, app_id, code)
+    cursor.execute('''
+        UPDATE apps SET test_status = ?, test_error = ?, test_ms = ?, tested_at = ?
+        WHERE app_id = ?
+    ''', (result["status"], result.get("error"), result.get("duration_ms"),
+          datetime.now().isoformat(), app_id))
+
+def run_app_test(code: str, timeout: float = 15.0) -> Dict[str, Any]:
+    """Kodu başsız çalıştır: {'passed', 'error', 'duration_ms'}"""
+    from streamlit.testing.v1 import AppTest
+
+    started = time.perf_counter()
+    error = None
+    try:
+        at = AppTest.from_string(code, default_timeout=timeout)
+        at.run(timeout=timeout)
+        if at.exception:
+            first = at.exception[0]
+            trace = "\n".join(getattr(first, "stack_trace", []) or [])
+            error = f"{trace}\n{first.message}".strip()
+            # Geçici script yolunu önizlemedeki isimle değiştir (fix_context frame'leri tanısın)
+            script_path = getattr(at, "_script_path", None)
+            if script_path:
+                error = error.replace(str(script_path), GENERATED_FILENAME)
+    except Exception as e:
+        # Zaman aşımı veya derleme hatası
+        error = f"{type(e).__name__}: {e}"
+    duration = time.perf_counter() - started
+    TEST_SECONDS.observe(duration, result="passed" if error is None else "failed")
+    return {"passed": error is None, "error": error, "duration_ms": int(duration * 1000)}
+
+class AutoTestRunner:
+    """Sınırlı worker havuzu; etkileşimli trafiği yavaşlatmamak için düşük eşzamanlılık"""
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 50, timeout: float = 15.0,
+                 repair_attempts: int = 1):
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.repair_attempts = repair_attempts
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="appfab-autotest")
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, app_id: str, code: str,
+               save: Callable[[str, Dict[str, Any], Optional[str]], None],
+               repair: Optional[Callable[[str, str], Tuple[Optional[str], Optional[str]]]] = None) -> Optional[Future]:
+        """
+        Testi kuyruğa al.
+        save(app_id, sonuç, onarılmış_kod) sonucu kaydeder,
+        repair(kod, hata) -> (yeni_kod, hata) başarısız app'i onarır.
+        """
+        with self._lock:
+            pending = sum(1 for f in self._futures.values() if not f.done())
+            if pending >= self.max_pending:
+                TEST_TOTAL.inc(status=SKIPPED)
+                save(app_id, {"status": SKIPPED, "error": None, "duration_ms": None}, None)
+                return None
+            future = self._executor.submit(self._run, app_id, code, save, repair)
+            self._futures[app_id] = future
+            # Biten işlerin kaydını tutma
+            for done_id in [k for k, f in self._futures.items() if f.done() and k != app_id]:
+                del self._futures[done_id]
+        return future
+
+    def _run(self, app_id, code, save, repair) -> Dict[str, Any]:
+        try:
+            return self._test(app_id, code, save, repair)
+        except Exception as e:
+            # Onarım/kayıt hatası future'da kaybolmasın; satır 'pending'de kalmasın
+            outcome = {"status": FAILED, "error": f"{type(e).__name__}: {e}", "duration_ms": None}
+            TEST_TOTAL.inc(status=FAILED)
+            try:
+                save(app_id, outcome, None)
+            except Exception:
+                pass
+            return outcome
+
+    def _test(self, app_id, code, save, repair) -> Dict[str, Any]:
+        result = run_app_test(code, self.timeout)
+        if result["passed"]:
+            outcome = {"status": PASSED, "error": None, "duration_ms": result["duration_ms"]}
+            TEST_TOTAL.inc(status=PASSED)
+            save(app_id, outcome, None)
+            return outcome
+
+        current, error = code, result["error"]
+        for _ in range(self.repair_attempts if repair else 0):
+            fixed, _err = repair(current, error)
+            if not fixed:
+                break
+            retest = run_app_test(fixed, self.timeout)
+            if retest["passed"]:
+                outcome = {"status": REPAIRED, "error": error, "duration_ms": retest["duration_ms"],
+                           "code": fixed}
+                TEST_TOTAL.inc(status=REPAIRED)
+                save(app_id, outcome, fixed)
+                return outcome
+            current, error = fixed, retest["error"]
+
+        outcome = {"status": FAILED, "error": error, "duration_ms": result["duration_ms"]}
+        TEST_TOTAL.inc(status=FAILED)
+        save(app_id, outcome, None)
+        return outcome
+
+    def wait(self, app_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Devam eden test/onarımı en fazla timeout sn bekle"""
+        with self._lock:
+            future = self._futures.get(app_id)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            return None
+
+_runner: Optional[AutoTestRunner] = None
+_runner_lock = threading.Lock()
+
+def get_runner(config: Optional[Dict] = None) -> AutoTestRunner:
+    """Süreç genelindeki test havuzu"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = AutoTestRunner(**(config or {}))
+        return _runner
@@ -0,0 +1,245 @@
+"""
+AppFab - Batch
+JSONL prompt dosyasından toplu app üretimi (galeri tohumlama, çevrimdışı benchmark)
+
+    python batch.py prompts.jsonl --workers 4 --public
+
+Her satır: {"prompt": "...", "name": "...", "description": "...", "public": true}
+("prompt" yoksa "body" kullanılır). İlerleme <dosya>.done.jsonl'e yazılır; yarıda
+kalan çalıştırma aynı komutla devam eder, tamamlanan satırlar atlanır.
+"""
+
+import time
+
+_import_started = time.perf_counter()
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+import analytics
+import metrics
+from app_generator import generate_streamlit_app, save_generated_app
+from config import BATCH_CONFIG, MODEL_CONFIG
+from single_flight import get_group, normalize_prompt
+
+# Çekirdek katmanın soğuk başlangıç maliyeti (Streamlit yüklenmemeli)
+IMPORT_SECONDS = time.perf_counter() - _import_started
+STREAMLIT_LOADED = "streamlit" in sys.modules
+
+ITEMS_TOTAL = metrics.REGISTRY.counter(
+    "appfab_batch_items_total", "Toplu üretim satırları", ("status",))
+metrics.REGISTRY.gauge(
+    "appfab_batch_import_seconds", "Worker modüllerinin import süresi").set(IMPORT_SECONDS)
+
+def item_key(item: Dict[str, Any]) -> str:
+    """Satırın kalıcı anahtarı: açık id yoksa normalize prompt özeti"""
+    explicit = item.get("id") or item.get("request_id")
+    if explicit:
+        return str(explicit)
+    return hashlib.sha1(normalize_prompt(item["prompt"]).encode("utf-8")).hexdigest()[:16]
+
+def read_items(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                print(f"satır {line_no}: geçersiz JSON ({e})", file=sys.stderr)
+                continue
+            item["prompt"] = item.get("prompt") or item.get("body") or ""
+            if not item["prompt"]:
+                print(f"satır {line_no}: prompt yok", file=sys.stderr)
+                continue
+            item["line"] = line_no
+            item["key"] = item_key(item)
+            yield item
+
+def load_done(state_path: str) -> Set[str]:
+    """Başarıyla kaydedilmiş anahtarlar (hatalılar tekrar denenir)"""
+    done = set()
+    if not os.path.exists(state_path):
+        return done
+    with open(state_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # kesinti anında yarım yazılmış son satır
+            if record.get("ok"):
+                done.add(record["key"])
+    return done
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+class BatchStats:
+    """Çalıştırma boyunca throughput, gecikme ve token sayıları"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.ok = self.failed = self.templates = self.tokens = 0
+        self.latencies: List[float] = []
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, ok: bool, seconds: float, result: Optional[Dict] = None):
+        with self._lock:
+            if ok:
+                self.ok += 1
+            else:
+                self.failed += 1
+            self.latencies.append(seconds)
+            result = result or {}
+            if result.get("template"):
+                self.templates += 1
+            self.tokens += sum(call.get("total_tokens", 0) for call in result.get("usage", []))
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            finished = self.ok + self.failed
+            return {
+                "finished": finished,
+                "total": self.total,
+                "ok": self.ok,
+                "failed": self.failed,
+                "template_hits": self.templates,
+                "elapsed_s": round(elapsed, 1),
+                "apps_per_min": round(finished / elapsed * 60, 2) if elapsed else 0.0,
+                "p50_s": round(_percentile(self.latencies, 0.5), 2),
+                "p95_s": round(_percentile(self.latencies, 0.95), 2),
+                "tokens": self.tokens,
+                "tokens_per_s": round(self.tokens / elapsed, 1) if elapsed else 0.0,
+                "import_s": round(IMPORT_SECONDS, 3),
+                "streamlit_loaded": STREAMLIT_LOADED,
+            }
+
+def format_summary(s: Dict[str, Any]) -> str:
+    return (f"{s['finished']}/{s['total']} bitti (ok={s['ok']} hata={s['failed']} şablon={s['template_hits']}) "
+            f"| {s['apps_per_min']} app/dk | p50={s['p50_s']}s p95={s['p95_s']}s "
+            f"| {s['tokens']} token ({s['tokens_per_s']}/s) | {s['elapsed_s']}s")
+
+def result_provider(result: Dict[str, Any]) -> str:
+    """Sonucun sağlayıcısı: şablon, yapılan çağrının sağlayıcısı veya '' (çağrı yapılmadı)"""
+    if result.get("template"):
+        return "template"
+    calls = result.get("usage") or []
+    if calls:
+        return calls[-1]["provider"]
+    # Başarısız çağrının kullanım kaydı yok; model seçildiyse çağrı yapıldı
+    return MODEL_CONFIG["models"].get(result.get("model") or "", {}).get("provider", "")
+
+def run_batch(path: str, max_workers: int = 4, user_id: str = "batch", public: bool = False,
+              report_interval: float = 10.0, state_path: Optional[str] = None,
+              limit: Optional[int] = None) -> Dict[str, Any]:
+    """Dosyadaki bekleyen satırları üret ve kaydet; son istatistikleri döndür"""
+    state_path = state_path or f"{path}.done.jsonl"
+    done = load_done(state_path)
+    items, seen = [], set()
+    for item in read_items(path):
+        # Aynı dosyada tekrar eden prompt bir kez üretilir
+        if item["key"] in done or item["key"] in seen:
+            continue
+        seen.add(item["key"])
+        items.append(item)
+    if limit is not None:
+        items = items[:limit]
+    print(f"{len(items)} satır üretilecek ({len(done)} daha önce tamamlanmış) "
+          f"| import {IMPORT_SECONDS * 1000:.0f} ms{' (streamlit yüklendi!)' if STREAMLIT_LOADED else ''}")
+
+    stats = BatchStats(len(items))
+    state_lock = threading.Lock()
+    flight = get_group("batch")
+
+    def work(item: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        # Farklı id'li ama aynı (normalize) prompt'lu satırlar tek sağlayıcı çağrısı paylaşır
+        result, shared = flight.do(normalize_prompt(item["prompt"]),
+                                   lambda: generate_streamlit_app(item["prompt"], item.get("name", ""),
+                                                                  item.get("description", "")))
+        provider = result_provider(result)
+        if shared:
+            # Token'lar çağrıyı yapan (leader) satırda sayılır ve yazılır
+            result = dict(result, usage=[])
+        app_id, error = None, result.get("error")
+        if result.get("note"):
+            # API key yoksa generate_streamlit_app demo kodu döndürür; galeriye yazılmaz
+            error = result["note"]
+        elif result.get("success") and result.get("code"):
+            app_id, error = save_generated_app(user_id, item["prompt"], result, item.get("public", public))
+        seconds = time.perf_counter() - started
+        analytics.record("generation", user_id=user_id, app_id=app_id, ok=app_id is not None,
+                         latency_ms=seconds * 1000, provider=provider,
+                         model=result.get("model") or "", source="batch")
+        record = {"key": item["key"], "line": item["line"], "ok": app_id is not None, "app_id": app_id,
+                  "seconds": round(seconds, 2), "model": result.get("model"),
+                  "template": result.get("template"), "error": error}
+        with state_lock, open(state_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        stats.add(record["ok"], seconds, result)
+        ITEMS_TOTAL.inc(status="ok" if record["ok"] else "failed")
+        return record
+
+    last_report = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch") as pool:
+        futures = {pool.submit(work, item): item for item in items}
+        try:
+            for future in as_completed(futures):
+                try:
+                    record = future.result()
+                except Exception as e:
+                    item = futures[future]
+                    print(f"satır {item['line']}: {e}", file=sys.stderr)
+                    stats.add(False, 0.0)
+                    continue
+                if not record["ok"]:
+                    print(f"satır {record['line']}: {record['error'] or 'üretim başarısız'}", file=sys.stderr)
+                if time.perf_counter() - last_report >= report_interval:
+                    last_report = time.perf_counter()
+                    print(format_summary(stats.summary()))
+        except KeyboardInterrupt:
+            # Devam eden istekler biter, kuyruktakiler iptal; tekrar çalıştırınca kaldığı yerden
+            for future in futures:
+                future.cancel()
+            print("durduruldu - aynı komutla devam edilebilir", file=sys.stderr)
+            raise
+
+    summary = stats.summary()
+    print(format_summary(summary))
+    return summary
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="JSONL dosyasından toplu app üretimi")
+    parser.add_argument("path", help="prompt dosyası (JSONL)")
+    parser.add_argument("--workers", type=int, default=BATCH_CONFIG["max_workers"])
+    parser.add_argument("--user-id", default=BATCH_CONFIG["user_id"])
+    parser.add_argument("--public", action="store_true", default=BATCH_CONFIG["public"])
+    parser.add_argument("--state", help="ilerleme dosyası (varsayılan: <path>.done.jsonl)")
+    parser.add_argument("--limit", type=int, help="en fazla bu kadar satır üret")
+    parser.add_argument("--report-interval", type=float, default=BATCH_CONFIG["report_interval"])
+    parser.add_argument("--json", action="store_true", help="son istatistikleri JSON olarak yaz")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = run_batch(args.path, args.workers, args.user_id, args.public,
+                            args.report_interval, args.state, args.limit)
+    except KeyboardInterrupt:
+        return 130
+    if args.json:
+        print(json.dumps(summary))
+    return 0 if summary["failed"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
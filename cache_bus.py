@@ -0,0 +1,87 @@
+"""
+AppFab - Cache Bus
+Süreçler arası cache geçersiz kılma: yazan süreç paylaşılan SQLite tablosunda namespace
+sürümünü artırır, okuyan süreç cache'ten vermeden önce sürümü karşılaştırır.
+Kontrol ucuzdur: PRAGMA data_version değişmedikçe tablo okunmaz.
+"""
+
+import sqlite3
+import threading
+from typing import Dict
+
+import metrics
+
+BUMPS_TOTAL = metrics.REGISTRY.counter(
+    "appfab_cache_bus_bumps_total", "Yayınlanan geçersiz kılmalar", ("namespace",))
+ERRORS_TOTAL = metrics.REGISTRY.counter(
+    "appfab_cache_bus_errors_total", "Bus okuma/yazma hataları (TTL'e kalır)", ("op",))
+REFRESHES_TOTAL = metrics.REGISTRY.counter(
+    "appfab_cache_bus_refreshes_total", "Başka süreçlerin yazdığı sürümlerin okunması")
+
+VERSIONS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS cache_versions (
+        namespace TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+'''
+
+class InvalidationBus:
+    """namespace -> sürüm; tek kalıcı bağlantı, data_version ile değişiklik tespiti"""
+
+    def __init__(self, db_path: str = "cache_bus.db", timeout: float = 2.0):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        # WAL: bump yazarken okuyan süreçler beklemez
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(VERSIONS_TABLE_SQL)
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._versions: Dict[str, int] = {}
+
+    def _load(self):
+        self._versions = dict(self._conn.execute("SELECT namespace, version FROM cache_versions").fetchall())
+
+    def version(self, namespace: str) -> int:
+        """
+        Güncel sürüm; başka bir bağlantı yazmadıysa sadece bir PRAGMA.
+        Bus okunamazsa bilinen son sürüm: kayıtlar en geç TTL sonunda tazelenir.
+        """
+        with self._lock:
+            try:
+                data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+                if data_version != self._data_version:
+                    self._load()
+                    self._data_version = data_version
+                    REFRESHES_TOTAL.inc()
+            except sqlite3.Error:
+                ERRORS_TOTAL.inc(op="read")
+            return self._versions.get(namespace, 0)
+
+    def bump(self, *namespaces: str):
+        """Tüm süreçlerdeki ilgili cache kayıtlarını bayatlat"""
+        if not namespaces:
+            return
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._conn.executemany('''
+                        INSERT INTO cache_versions VALUES (?, 1)
+                        ON CONFLICT(namespace) DO UPDATE SET version = version + 1
+                    ''', [(ns,) for ns in namespaces])
+                    self._conn.execute("COMMIT")
+                except sqlite3.Error:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                # Kendi yazmamız data_version'ı değiştirmez: sürümleri hemen oku
+                self._load()
+            except sqlite3.Error:
+                # Yazma başarısız: diğer süreçler en geç TTL sonunda tazelenir
+                ERRORS_TOTAL.inc(op="write")
+                return
+        for namespace in namespaces:
+            BUMPS_TOTAL.inc(namespace=namespace)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._versions)
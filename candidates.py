@@ -0,0 +1,138 @@
+"""
+AppFab - Candidates
+Best-of-N: aynı istek için paralel aday kod üretir, adayları yerelde
+doğrular (parse, import, smoke-run) ve ilk geçeni seçer
+"""
+
+import ast
+import importlib.util
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+import usage
+from model_router import is_valid_code
+
+CANDIDATES_TOTAL = metrics.REGISTRY.counter(
+    "appfab_candidates_total", "Best-of-N aday sonuçları", ("result",))
+SELECTED_INDEX = metrics.REGISTRY.histogram(
+    "appfab_candidates_selected_index", "Kaçıncı biten aday seçildi", buckets=(1, 2, 3, 4, 5, 8))
+
+def missing_imports(code: str) -> List[str]:
+    """Kodun import ettiği ama bu ortamda bulunmayan üst seviye modüller"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    # try/except içindeki importlar koşullu (kod eksik kütüphaneyi kendisi ele alıyor)
+    guarded = {id(child) for node in ast.walk(tree) if isinstance(node, ast.Try)
+               for stmt in node.body for child in ast.walk(stmt)}
+    names = set()
+    for node in ast.walk(tree):
+        if id(node) in guarded:
+            continue
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split(".")[0])
+    missing = []
+    for name in sorted(names):
+        if name in sys.builtin_module_names:
+            continue
+        try:
+            if importlib.util.find_spec(name) is None:
+                missing.append(name)
+        except (ImportError, ValueError):
+            missing.append(name)
+    return missing
+
+def validate_candidate(code: Optional[str], smoke_test: bool = True,
+                       smoke_timeout: float = 10.0) -> Tuple[bool, Optional[str]]:
+    """(geçti_mi, sebep) - ucuz kontroller önce, smoke-run en son"""
+    if not is_valid_code(code):
+        return False, "parse"
+    missing = missing_imports(code)
+    if missing:
+        return False, f"missing imports: {', '.join(missing)}"
+    if smoke_test:
+        import autotest
+        result = autotest.run_app_test(code, smoke_timeout)
+        if not result["passed"]:
+            return False, result["error"]
+    return True, None
+
+def best_of_n(generate: Callable[[int], Tuple[Optional[str], Optional[str]]], n: int,
+              validate: Callable[[str], Tuple[bool, Optional[str]]],
+              on_result: Optional[Callable[[int, Optional[str], bool, float], None]] = None,
+              on_finished: Optional[Callable[[int], None]] = None,
+              on_late_usage: Optional[Callable[[List[Dict]], None]] = None
+              ) -> Tuple[Optional[str], Optional[str], Dict]:
+    """
+    generate(i) -> (kod, hata) çağrısını n kez paralel çalıştır, biten adayı hemen doğrula.
+    on_result(i, kod, geçti_mi, üretim_sn) her biten aday için çağrılır.
+    on_finished(i): adayın sağlayıcı çağrısı bitince, adayın thread'inde, aday başına tam bir
+    kez (ör. kabul hakkını bırakmak); seçim döndükten sonra süren çağrılar için de.
+    İlk geçen aday döner; devam eden HTTP çağrıları kesilemez, arka planda biter.
+    Kullanım kayıtları: dönüşten önce bitenler çağıranın kapsamlarına eklenir, sonra
+    bitenler on_late_usage(kayıtlar) ile (verilmezse sadece metriklerde kalır).
+    Hiçbiri geçmezse parse edilen ilk aday (kullanıcı düzeltebilir) veya son hata döner.
+    """
+    cancelled = threading.Event()
+    handoff = threading.Lock()
+    early_calls: List[Dict] = []
+    closed = [False]
+
+    def run(i):
+        started = time.perf_counter()
+        with usage.usage_scope() as calls:
+            try:
+                code, error = (None, "cancelled") if cancelled.is_set() else generate(i)
+            finally:
+                if on_finished is not None:
+                    on_finished(i)
+        elapsed = time.perf_counter() - started
+        with handoff:
+            late = closed[0]
+            if not late:
+                early_calls.extend(calls)
+        if late and calls and on_late_usage is not None:
+            on_late_usage(calls)
+        if cancelled.is_set():
+            CANDIDATES_TOTAL.inc(result="cancelled")
+            return i, code, "cancelled", False, elapsed
+        ok, reason = validate(code) if code else (False, error)
+        return i, code, reason, ok, elapsed
+
+    stats = {"requested": n, "finished": 0, "selected": None, "reasons": []}
+    fallback, last_error = None, None
+    executor = ThreadPoolExecutor(max_workers=n, thread_name_prefix="appfab-candidate")
+    pending = {executor.submit(run, i) for i in range(n)}
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, code, reason, ok, elapsed = future.result()
+                stats["finished"] += 1
+                if on_result is not None:
+                    on_result(i, code, ok, elapsed)
+                if ok:
+                    CANDIDATES_TOTAL.inc(result="selected")
+                    SELECTED_INDEX.observe(stats["finished"])
+                    stats["selected"] = i
+                    return code, None, stats
+                CANDIDATES_TOTAL.inc(result="rejected")
+                stats["reasons"].append(reason)
+                last_error = reason
+                if code and fallback is None and is_valid_code(code):
+                    fallback = code
+    finally:
+        cancelled.set()
+        with handoff:
+            closed[0] = True
+            usage.add_to_scopes(early_calls)
+        # Tüm adaylar başladı (max_workers=n); süren çağrılar beklenmeden bırakılır
+        executor.shutdown(wait=False)
+    return fallback, None if fallback else last_error, stats
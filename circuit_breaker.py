@@ -0,0 +1,138 @@
+"""
+AppFab - Circuit Breaker
+Sağlayıcı başına devre kesici ve gecikmeye göre uyarlanan timeout
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import metrics
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BREAKER_STATE = metrics.REGISTRY.gauge(
+    "appfab_circuit_state", "Devre durumu (0=closed, 1=half_open, 2=open)", ("provider",))
+BREAKER_REJECTED = metrics.REGISTRY.counter(
+    "appfab_circuit_rejected_total", "Açık devre nedeniyle atlanan çağrılar", ("provider",))
+
+class CircuitBreaker:
+    """closed -> (ardışık hatalar) -> open -> (bekleme) -> half_open -> closed/open"""
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0,
+                 window: int = 50, percentile: float = 0.95, multiplier: float = 1.5,
+                 min_timeout: float = 15.0, max_timeout: float = 120.0, min_samples: int = 5):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        BREAKER_STATE.set(0, provider=name)
+
+    def _set_state(self, state: str):
+        self._state = state
+        BREAKER_STATE.set(_STATE_VALUES[state], provider=self.name)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def is_open(self) -> bool:
+        """Çağrı şu an kesin reddedilecek mi? (probe hakkını tüketmez)"""
+        with self._lock:
+            if self._state == OPEN:
+                return time.monotonic() - self._opened_at < self.reset_timeout
+            return self._state == HALF_OPEN and self._probe_in_flight
+
+    def allow(self) -> bool:
+        """Çağrıya izin ver; half_open'da sadece tek bir deneme geçer"""
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    BREAKER_REJECTED.inc(provider=self.name)
+                    return False
+                self._set_state(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._probe_in_flight:
+                    BREAKER_REJECTED.inc(provider=self.name)
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+            self._failures = 0
+            self._probe_in_flight = False
+            if self._state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def timeout(self) -> float:
+        """Son başarılı çağrıların yüzdelik gecikmesine göre timeout"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.min_samples:
+            return self.max_timeout
+        index = min(int(len(samples) * self.percentile), len(samples) - 1)
+        return max(self.min_timeout, min(samples[index] * self.multiplier, self.max_timeout))
+
+    def snapshot(self) -> Dict:
+        return {
+            "state": self.state,
+            "failures": self._failures,
+            "timeout": round(self.timeout(), 1),
+            "samples": len(self._latencies),
+        }
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(provider: str, config: Optional[Dict] = None) -> CircuitBreaker:
+    """Süreç genelinde sağlayıcı başına tek breaker (oturumlar arası paylaşılır)"""
+    with _breakers_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            config = config or {}
+            max_timeout = config.get("max_timeout", {})
+            breaker = _breakers[provider] = CircuitBreaker(
+                provider,
+                failure_threshold=config.get("failure_threshold", 3),
+                reset_timeout=config.get("reset_timeout", 30.0),
+                window=config.get("window", 50),
+                percentile=config.get("timeout_percentile", 0.95),
+                multiplier=config.get("timeout_multiplier", 1.5),
+                min_timeout=config.get("min_timeout", 15.0),
+                max_timeout=max_timeout.get(provider, 120.0) if isinstance(max_timeout, dict) else max_timeout,
+            )
+        return breaker
+
+def all_breakers() -> Dict[str, Dict]:
+    """Tüm breaker'ların durumu"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
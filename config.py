@@ -1,16 +1,45 @@
 """
 AppFab - Configuration
+Streamlit'e bağımlı değil: worker/CLI süreçleri ortam değişkeni veya secrets dosyasından okur
 """
 
-import streamlit as st
+import os
+import sys
 from typing import Dict, Any, Optional
 
-def get_secret(key: str, default: Any = None) -> Any:
-    """Streamlit secrets'ten değer al"""
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+# Streamlit ile aynı dosya; APPFAB_SECRETS ile değiştirilebilir
+SECRETS_FILE = os.environ.get("APPFAB_SECRETS", os.path.join(".streamlit", "secrets.toml"))
+
+def _load_secrets_file(path: str) -> Dict[str, Any]:
+    if tomllib is None or not os.path.exists(path):
+        return {}
     try:
-        return st.secrets[key]
-    except:
-        return default
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    except (OSError, ValueError):
+        return {}
+
+_FILE_SECRETS = _load_secrets_file(SECRETS_FILE)
+
+def get_secret(key: str, default: Any = None) -> Any:
+    """Sırayla: ortam değişkeni, secrets dosyası, (UI sürecinde) st.secrets"""
+    if key in os.environ:
+        return os.environ[key]
+    if key in _FILE_SECRETS:
+        return _FILE_SECRETS[key]
+    # Streamlit'i burada import etmiyoruz; sadece UI zaten yüklediyse kullanılır
+    st = sys.modules.get("streamlit")
+    if st is not None:
+        try:
+            return st.secrets[key]
+        except Exception:
+            return default
+    return default
 
 # =============================================================================
 # APP CONFIGURATION
@@ -20,7 +49,36 @@ APP_CONFIG = {
     "name": "AppFab",
     "tagline": "AI ile App Üretin",
     "version": "1.0.0",
-    "mode": "local"  # local | firebase
+    "mode": "local",  # local | firebase
+    # Profil ve bellek paneline erişebilen e-postalar (virgülle ayrılmış)
+    "admins": [e.strip() for e in str(get_secret("APPFAB_ADMINS", "")).split(",") if e.strip()]
+}
+
+# LocalDatabase depolaması: sqlite (tek dosya) | sharded (user_id hash'ine göre N dosya) | memory (test)
+STORAGE_CONFIG = {
+    "backend": get_secret("APPFAB_STORAGE", "sqlite"),
+    "path": "appfab.db",
+    "directory": get_secret("APPFAB_DATA_DIR", "data"),  # sharded: shard'lar + global indeks
+    "shards": int(get_secret("APPFAB_SHARDS", 8))
+}
+
+# Çalışırken SQLite bakımı (maintenance.py): online yedek, incremental vacuum, optimize, WAL checkpoint
+MAINTENANCE_CONFIG = {
+    "enabled": True,
+    "wal": True,  # okuyucular (yedek dahil) yazarları bloklamaz
+    "backup_dir": "backups",
+    "keep_backups": 7,
+    "backup_interval": 6 * 3600,  # sn
+    "backup_pages": 256,  # WAL değilse yedekte adım başına kopyalanan sayfa
+    "backup_max_seconds": 300.0,  # adımlı yedek bu sürede bitmezse başarısız (yazmalar kopyayı yeniden başlatır)
+    "vacuum_interval": 3600,
+    "vacuum_pages": 128,  # incremental_vacuum adım başına sayfa
+    "vacuum_budget": 2.0,  # tur başına en fazla (sn)
+    "optimize_interval": 3600,
+    "checkpoint_interval": 300,
+    "step_sleep": 0.05,  # adımlar arası bekleme: canlı trafik kilidi alabilsin
+    "busy_timeout_ms": 100,  # bakım kilidi alamazsa vazgeçer, sonraki turda dener
+    "convert_max_bytes": 64 * 1024 * 1024  # auto_vacuum dönüşümü (tam VACUUM, sadece `maintenance.py prepare`) bu boyuta kadar
 }
 
 # =============================================================================
@@ -29,6 +87,31 @@ APP_CONFIG = {
 
 OPENAI_API_KEY = get_secret("OPENAI_API_KEY", "")
 OPENAI_MODEL = "gpt-3.5-turbo"
+GEMINI_API_KEY = get_secret("GEMINI_API_KEY", "")
+
+# Router bu katalogdan gözlenen gecikme/başarıya göre seçer
+# Fiyatlar: $ / 1M token
+MODEL_CONFIG = {
+    "models": {
+        "gpt-4o-mini": {"provider": "openai", "input_cost": 0.15, "output_cost": 0.60,
+                        "max_tokens": 4000, "context_tokens": 128000},
+        "gpt-4o": {"provider": "openai", "input_cost": 2.50, "output_cost": 10.00,
+                   "max_tokens": 4000, "context_tokens": 128000},
+        "gemini-pro": {"provider": "gemini", "input_cost": 0.50, "output_cost": 1.50,
+                       "max_tokens": 4000, "context_tokens": 30720},
+    },
+    "prior_success": 0.8,
+    "prior_weight": 5.0,
+    "ewma_alpha": 0.2
+}
+
+# Düzeltme prompt'u: traceback'ten sadece üretilen kod frame'leri + hatalı satır penceresi
+FIX_CONTEXT_CONFIG = {
+    "window": 8,  # hatalı satırın altında/üstünde gönderilecek satır
+    "token_budget": 6000,  # prompt için yerel token tahmini üst sınırı
+    "chars_per_token": 3.5,
+    "max_traceback_lines": 40
+}
 
 # =============================================================================
 # CREDITS
@@ -66,6 +149,149 @@ THEME = {
 FEATURES = {
     "allow_public_apps": True,
     "allow_app_likes": True,
-    "enable_analytics": False,
+    "enable_analytics": True,
     "enable_sharing": True
 }
+
+# Olay kaydı ve saatlik/günlük özetler (analytics.py); FEATURES["enable_analytics"] ile açılır
+ANALYTICS_CONFIG = {
+    "db_path": "analytics.db",  # ayrı dosya: olay yazmaları app/kullanıcı yazma kilidini beklemez
+    "batch_size": 200,  # bu kadar olay birikince hemen yaz
+    "flush_interval": 2.0,  # en geç (sn)
+    "max_buffer": 10000,  # tampon doluysa en eski olay atılır
+    "rollup_interval": 60.0,
+    "retention_days": 30  # ham olaylar; özetler silinmez
+}
+
+# =============================================================================
+# METRICS
+# =============================================================================
+
+METRICS_CONFIG = {
+    "port": int(get_secret("METRICS_PORT", 0)),  # 0 = kapalı (varsayılan); ör. 9464
+    "host": get_secret("METRICS_HOST", "127.0.0.1"),
+    "file": get_secret("METRICS_FILE", ""),  # ör. /var/lib/node_exporter/appfab.prom
+    "interval": 15.0
+}
+
+# Tek çalıştırmalık profil (profiler.py): ?profile=1 sadece admin e-postalarına açık
+PROFILER_CONFIG = {
+    "admins": APP_CONFIG["admins"],
+    "every_run": get_secret("APPFAB_PROFILE_ALL", "") == "1",  # her çalıştırma (yerel geliştirme)
+    "output_dir": get_secret("APPFAB_PROFILE_DIR", "profiles"),  # .collapsed + .speedscope.json
+    "interval": 0.005,  # örnekleme aralığı (sn)
+    "max_seconds": 120.0,  # takılan çalıştırmada profil en geç bu sürede yazılır
+    "keep": 50  # en yeni N profil tutulur
+}
+
+# =============================================================================
+# PROVIDER RESILIENCE
+# =============================================================================
+
+BREAKER_CONFIG = {
+    "failure_threshold": 3,  # ardışık hata -> devre açılır
+    "reset_timeout": 30.0,  # açık devre bu kadar sn sonra tek deneme alır
+    "window": 50,  # timeout hesabı için son başarılı çağrı sayısı
+    "timeout_percentile": 0.95,
+    "timeout_multiplier": 1.5,
+    "min_timeout": 15.0,
+    "max_timeout": {"openai": 120.0, "gemini": 60.0}
+}
+
+ADMISSION_CONFIG = {
+    "max_concurrent": 8,  # süreç genelinde aynı anda sağlayıcı çağrısı
+    "queue_timeout": 120.0,  # sırada en fazla bekleme (sn)
+    "user_rate_per_min": 6,
+    "user_burst": 3,
+    "pro_rate_per_min": 20,
+    "pro_burst": 10
+}
+
+# Best-of-N: aynı istek için paralel aday sayısı (1 = kapalı)
+BEST_OF_N_CONFIG = {
+    "candidates": 1,
+    "pro_candidates": int(get_secret("APPFAB_PRO_CANDIDATES", 1)),  # >1: Pro için açıkça aç (maliyet x N)
+    "smoke_test": True,  # adayları AppTest ile çalıştırarak doğrula
+    "smoke_timeout": 10.0
+}
+
+# Çevrimdışı şablonlar: eşleşen istek sağlayıcıya gitmeden yerelde üretilir
+TEMPLATE_CONFIG = {
+    "enabled": True,
+    "min_coverage": 0.7,  # istekteki kelimelerin şablonca açıklanan oranı
+    "max_words": 30,  # daha uzun (detaylı) istekler modele gider
+    "smoke_test": True,  # şablonlar başlangıçta AppTest ile doğrulanır
+    "smoke_timeout": 10.0
+}
+
+# Süreç belleği (memory.py): bütçe aşılınca boştaki oturumlar bırakılır; 0 = kapalı
+MEMORY_CONFIG = {
+    "soft_rss_mb": float(get_secret("APPFAB_SOFT_RSS_MB", 700)),  # soft_idle sn boştakiler bırakılır
+    "hard_rss_mb": float(get_secret("APPFAB_HARD_RSS_MB", 900)),  # hard_idle sn boştakiler + st.cache_data
+    "soft_idle": 300.0,
+    "hard_idle": 30.0,
+    "check_interval": 10.0,  # RSS arka planda bu sıklıkta ölçülür (0: thread yok)
+    "output_dir": "reports",  # memory-*.json raporları
+    "tracemalloc_frames": int(get_secret("APPFAB_TRACEMALLOC", 0)),  # >0: açılışta tahsis izleme
+    "keep_snapshots": 5
+}
+
+# Oturum verileri (kod, traceback, prompt) session_state yerine paylaşılan depoda
+PAYLOAD_CONFIG = {
+    "db_path": None,  # None: STORAGE_CONFIG'e göre appfab_payloads.db (storage.payload_path)
+    "max_bytes": 64 * 1024 * 1024,  # bellekteki LRU üst sınırı (taşan SQLite'tan okunur)
+    "idle_timeout": 1800.0,  # bu kadar sn görülmeyen oturumun referansları bırakılır
+    "sweep_interval": 60.0,
+    "flush_interval": 2.0,  # LRU'dan taşanlar arka planda bu aralıkla SQLite'a yazılır
+    "db_ttl_days": 7.0
+}
+
+# Public galeri / arama / istatistik için süreç genelinde okuma cache'i
+READ_CACHE_CONFIG = {
+    "ttl": 30.0,  # yazma işlemleri ayrıca geçersiz kılar; TTL sadece üst sınır
+    "max_entries": 1024,
+    "ttls": {"stats": 60.0},
+    # Worker'lar arası geçersiz kılma tablosu (tüm süreçler aynı dosyayı görmeli); boş = kapalı
+    "bus_path": os.getenv("APPFAB_CACHE_BUS", "cache_bus.db") or None
+}
+
+# Üretilen app'lerde saf veri/hesaplama fonksiyonlarını st.cache_data ile sar
+MEMOIZE_CONFIG = {
+    "enabled": True,
+    "max_entries": 32,  # preview'da fonksiyon başına cache kaydı (bellek sınırı)
+    "network_ttl": 600  # ağdan veri çeken fonksiyonların cache süresi (sn)
+}
+
+# =============================================================================
+# AUTO TEST
+# =============================================================================
+
+AUTOTEST_CONFIG = {
+    "enabled": True,
+    "preview_wait": 20.0,  # önizleme açılırken devam eden testi en fazla bekle (sn)
+    "runner": {
+        "max_workers": 2,  # etkileşimli trafiği yavaşlatmamak için düşük tutulur
+        "max_pending": 50,  # kuyruk doluysa test atlanır (status=skipped)
+        "timeout": 15.0,  # AppTest.run zaman aşımı
+        "repair_attempts": 1
+    }
+}
+
+# =============================================================================
+# BATCH
+# =============================================================================
+
+# python batch.py prompts.jsonl - galeri tohumlama / çevrimdışı benchmark
+BATCH_CONFIG = {
+    "max_workers": 4,  # aynı anda sağlayıcıya giden istek sayısı
+    "user_id": "batch",  # kayıtların sahibi
+    "public": False,
+    "report_interval": 10.0  # ara istatistik sıklığı (sn)
+}
+
+# Kullanıcı app'lerinin zip dışa/içe aktarımı (archive.py)
+ARCHIVE_CONFIG = {
+    "fetch_size": 50,  # dışa aktarmada cursor'dan tek seferde okunan app
+    "batch_size": 100,  # içe aktarmada transaction başına app
+    "max_app_bytes": 1024 * 1024  # zip'teki tek app.py için üst sınır
+}
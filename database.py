@@ -3,7 +3,6 @@ AppFab - Database Module
 SQLite Database (Cloud uyumlu - kalıcı)
 """
 
-import streamlit as st
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import sqlite3
@@ -11,20 +10,67 @@ import json
 import hashlib
 import secrets
 import os
+import threading
+import metrics
+import usage
+import analytics
+import archive
+import autotest
+import facets
+from ids import new_id
+from config import ARCHIVE_CONFIG, MODEL_CONFIG, READ_CACHE_CONFIG, STORAGE_CONFIG
+from read_cache import cached, get_cache, invalidate
+from storage import StorageBackend, create_backend
 
-DB_FILE = "appfab.db"
+DB_FILE = STORAGE_CONFIG["path"]
+
+# Galeri/arama/istatistik cache'i (AppManager, AnalyticsManager)
+get_cache(READ_CACHE_CONFIG)
+
+# sqlite | sharded | memory
+_backend = create_backend(**STORAGE_CONFIG)
+
+def get_backend() -> StorageBackend:
+    return _backend
+
+def set_backend(backend: StorageBackend):
+    """Depolamayı değiştir (testlerde MemoryBackend) ve şemayı kur"""
+    global _backend
+    _backend = backend
+    init_db()
+    get_cache().clear()
 
 def get_db_connection():
-    """SQLite bağlantısı oluştur"""
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Galeri/indeks veritabanı bağlantısı (tek dosyalı backend'lerde tüm veri)"""
+    return _backend.index_conn()
 
 def init_db():
-    """Veritabanı tablolarını oluştur"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+    """Veritabanı tablolarını oluştur (sharded modda her shard ve global indeks)"""
+    for conn in _backend.databases():
+        _init_schema(conn.cursor())
+        conn.commit()
+        conn.close()
+    start_facet_backfill(_backend)
+
+def start_facet_backfill(backend: StorageBackend) -> threading.Thread:
+    """
+    Eski app'lerin facet'lerini arka planda, kalmayana kadar doldur (her veritabanı sırayla).
+    Bitene kadar filtre/sayımlarda henüz analiz edilmemiş app'ler görünmez.
+    """
+    def run():
+        for conn in backend.databases():
+            try:
+                facets.backfill_all(conn)
+            except sqlite3.Error:
+                pass  # kalanlar bir sonraki süreçte
+            finally:
+                conn.close()
+
+    thread = threading.Thread(target=run, name="appfab-facet-backfill", daemon=True)
+    thread.start()
+    return thread
+
+def _init_schema(cursor):
     # Kullanıcılar tablosu
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -66,8 +112,29 @@ def init_db():
         )
     ''')
     
-    conn.commit()
-    conn.close()
+    # app.py'nin eski şemasıyla oluşturulmuş dosyalarda eksik kolonlar
+    _add_missing_columns(cursor, "users", {"created_at": "TEXT"})
+    _add_missing_columns(cursor, "apps", {"views": "INTEGER DEFAULT 0"})
+    
+    # Token / gecikme kayıtları
+    usage.init_usage_table(cursor)
+    
+    # Otomatik test sonuçları (apps tablosuna kolon)
+    autotest.migrate_apps_table(cursor)
+    
+    # Kod facet'leri (kütüphane, widget, grafik/yükleme) - eski app'ler init_db'den sonra arka planda
+    facets.init_facet_tables(cursor)
+    
+    # "En yeni" listeleri ve keyset sayfalama (created_at, app_id) indeks üzerinden
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_apps_user_created ON apps(user_id, created_at, app_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_apps_public_created ON apps(is_public, created_at, app_id)")
+
+def _add_missing_columns(cursor, table: str, columns: Dict[str, str]):
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in cursor.fetchall()}
+    for column, kind in columns.items():
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
 
 # DB'yi başlat
 init_db()
@@ -82,24 +149,24 @@ class LocalAuth:
     @staticmethod
     def create_user(email: str, password: str, username: str) -> Tuple[bool, str, Optional[Dict]]:
         """Yeni kullanıcı oluştur"""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Email kontrolü
-        cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-        if cursor.fetchone():
-            conn.close()
+        # Email kontrolü (sharded modda global dizinde, eşzamanlı kayıtta tek kazanan)
+        if _backend.lookup_email(email):
             return False, "Bu e-posta adresi zaten kayıtlı", None
         
-        user_id = f"user_{secrets.token_hex(8)}"
+        user_id = new_id("user")
+        if not _backend.claim_email(email, user_id):
+            return False, "Bu e-posta adresi zaten kayıtlı", None
         password_hash = hashlib.sha256(password.encode()).hexdigest()
         
+        conn = _backend.user_conn(user_id)
+        cursor = conn.cursor()
         try:
             cursor.execute('''
                 INSERT INTO users (user_id, email, username, password_hash, credits)
                 VALUES (?, ?, ?, ?, 10)
             ''', (user_id, email, username, password_hash))
             conn.commit()
+            invalidate("stats")
             
             user_data = {
                 "localId": user_id,
@@ -112,12 +179,16 @@ class LocalAuth:
             
         except Exception as e:
             conn.close()
+            _backend.release_email(email)
             return False, f"Kayıt hatası: {str(e)}", None
     
     @staticmethod
     def login(email: str, password: str) -> Tuple[bool, str, Optional[Dict]]:
         """Giriş yap"""
-        conn = get_db_connection()
+        user_id = _backend.lookup_email(email)
+        if not user_id:
+            return False, "E-posta veya şifre hatalı", None
+        conn = _backend.user_conn(user_id)
         cursor = conn.cursor()
         
         password_hash = hashlib.sha256(password.encode()).hexdigest()
@@ -130,6 +201,7 @@ class LocalAuth:
         user = cursor.fetchone()
         conn.close()
         
+        analytics.record("login", user_id=user_id, ok=user is not None)
         if not user:
             return False, "E-posta veya şifre hatalı", None
         
@@ -144,13 +216,23 @@ class LocalAuth:
 # DATABASE
 # =============================================================================
 
+def _fetch_app(conn, app_id: str) -> Optional[sqlite3.Row]:
+    return conn.execute("SELECT * FROM apps WHERE app_id = ?", (app_id,)).fetchone()
+
+def _sync_likes(conn, app_id: str):
+    """Public app'in beğeni sayısını galeri indeksine yansıt"""
+    row = conn.execute("SELECT likes, is_public FROM apps WHERE app_id = ?", (app_id,)).fetchone()
+    if row is not None and row["is_public"]:
+        _backend.sync_likes(app_id, row["likes"])
+
+@metrics.instrument_class("db", "sqlite")
 class LocalDatabase:
     """SQLite database operations"""
     
     @staticmethod
     def get_user_profile(user_id: str) -> Optional[Dict]:
         """Kullanıcı profilini al"""
-        conn = get_db_connection()
+        conn = _backend.user_conn(user_id)
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
         user = cursor.fetchone()
@@ -170,7 +252,7 @@ class LocalDatabase:
     @staticmethod
     def update_user_profile(user_id: str, data: Dict):
         """Kullanıcı profilini güncelle"""
-        conn = get_db_connection()
+        conn = _backend.user_conn(user_id)
         cursor = conn.cursor()
         
         for key, value in data.items():
@@ -184,7 +266,7 @@ class LocalDatabase:
     @staticmethod
     def add_credits(user_id: str, amount: int):
         """Kredi ekle"""
-        conn = get_db_connection()
+        conn = _backend.user_conn(user_id)
         cursor = conn.cursor()
         cursor.execute('''
             UPDATE users SET credits = credits + ? WHERE user_id = ?
@@ -195,7 +277,7 @@ class LocalDatabase:
     @staticmethod
     def deduct_credit(user_id: str, amount: int = 1) -> bool:
         """Kredi düş"""
-        conn = get_db_connection()
+        conn = _backend.user_conn(user_id)
         cursor = conn.cursor()
         
         # Pro kullanıcı kontrolü
@@ -221,6 +303,14 @@ class LocalDatabase:
         conn.close()
         return True
     
+    @staticmethod
+    def refund_credit(user_id: str, amount: int = 1):
+        """Sağlayıcıya hiç gitmeyen isteğin kredisini geri ver (pro kullanıcıdan düşülmemişti)"""
+        conn = _backend.user_conn(user_id)
+        conn.execute("UPDATE users SET credits = credits + ? WHERE user_id = ? AND NOT is_pro", (amount, user_id))
+        conn.commit()
+        conn.close()
+    
     @staticmethod
     def check_credit(user_id: str) -> Dict[str, Any]:
         """Kredi durumunu kontrol et"""
@@ -238,25 +328,44 @@ class LocalDatabase:
     def create_app(user_id: str, name: str, description: str, prompt: str, 
                    code: str, is_public: bool = False) -> Optional[str]:
         """App oluştur"""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        import time
-        app_id = f"app_{int(time.time())}_{secrets.token_hex(4)}"
+        # Zaman sıralı ID: ekleme B-tree'nin sağ ucuna, aynı saniyede çakışma yok
+        # (sharded modda shard'ı da taşır, yönlendirme için global yazma gerekmez)
+        app_id = _backend.new_app_id(user_id)
         
+        conn = _backend.user_conn(user_id)
+        cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO apps (app_id, user_id, name, description, prompt, code, is_public)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', (app_id, user_id, name, description, prompt, code, is_public))
+        facets.save_facets(cursor, app_id, code)
         
         conn.commit()
+        # Satır yazıldıktan sonra: kayıt başarısızsa dizinde sahipsiz girdi kalmaz
+        try:
+            _backend.register_app(app_id, user_id)
+        except Exception:
+            cursor.execute("DELETE FROM apps WHERE app_id = ?", (app_id,))
+            facets.delete_facets(cursor, app_id)
+            conn.commit()
+            conn.close()
+            raise
+        if is_public:
+            _backend.sync_public(app_id, _fetch_app(conn, app_id))
         conn.close()
+        # Özel app galeriyi değiştirmez, sadece sayılar
+        if is_public:
+            invalidate("public_apps", "search", "stats", "facets")
+        else:
+            invalidate("stats")
         return app_id
     
     @staticmethod
     def get_app(app_id: str) -> Optional[Dict]:
         """App detaylarını al"""
-        conn = get_db_connection()
+        conn = _backend.app_conn(app_id)
+        if conn is None:
+            return None
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM apps WHERE app_id = ?", (app_id,))
         app = cursor.fetchone()
@@ -267,24 +376,81 @@ class LocalDatabase:
         return None
     
     @staticmethod
-    def get_user_apps(user_id: str) -> List[Dict]:
-        """Kullanıcının app'lerini listele"""
-        conn = get_db_connection()
+    def save_test_result(app_id: str, result: Dict[str, Any], code: Optional[str] = None):
+        """Otomatik test sonucunu (ve onarılmış kodu) app satırına yaz"""
+        conn = _backend.app_conn(app_id)
+        if conn is None:
+            return
         cursor = conn.cursor()
+        autotest.save_result(cursor, app_id, result, code)
+        conn.commit()
+        if code is not None:
+            _backend.sync_public(app_id, _fetch_app(conn, app_id))
+        conn.close()
+        if code is not None:
+            invalidate("public_apps", "search", "facets")
+    
+    @staticmethod
+    def get_app_test(app_id: str) -> Optional[Dict]:
+        """App'in güncel kodu ve test durumu"""
+        conn = _backend.app_conn(app_id)
+        if conn is None:
+            return None
+        row = conn.execute("SELECT code, test_status, test_error, test_ms FROM apps WHERE app_id = ?",
+                           (app_id,)).fetchone()
+        conn.close()
+        return dict(row) if row else None
+    
+    @staticmethod
+    def get_user_apps(user_id: str, limit: int = -1, before_id: Optional[str] = None) -> List[Dict]:
+        """Kullanıcının app'lerini listele (before_id: önceki sayfanın son app'i, keyset sayfalama)"""
+        conn = _backend.user_conn(user_id)
+        cursor = conn.cursor()
+        # Eski 'app_<saniye>' ID'leri ULID'lerle sözlük sırasında karışır; sıra created_at,
+        # aynı zamandaki kayıtlar ID ile (ULID'ler kendi aralarında zaman sıralı)
         cursor.execute('''
-            SELECT * FROM apps WHERE user_id = ? ORDER BY created_at DESC
-        ''', (user_id,))
+            SELECT * FROM apps WHERE user_id = ?
+              AND (? IS NULL OR (created_at, app_id) < (SELECT created_at, app_id FROM apps WHERE app_id = ?))
+            ORDER BY created_at DESC, app_id DESC LIMIT ?
+        ''', (user_id, before_id, before_id, limit))
         apps = [dict(row) for row in cursor.fetchall()]
         conn.close()
         return apps
     
+    @staticmethod
+    def export_user_apps(user_id: str, out) -> Dict[str, Any]:
+        """Kullanıcının app'lerini zip'e akış halinde yaz (out: yol veya binary akış)"""
+        conn = _backend.user_conn(user_id)
+        try:
+            return archive.export_apps(conn, user_id, out, ARCHIVE_CONFIG["fetch_size"])
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def import_user_apps(user_id: str, source) -> Tuple[Optional[Dict[str, int]], Optional[str]]:
+        """export_user_apps zip'ini kullanıcıya ekle (gizli, toplu transaction'larla)"""
+        def register(app_ids):
+            for app_id in app_ids:
+                _backend.register_app(app_id, user_id)
+    
+        conn = _backend.user_conn(user_id)
+        try:
+            result, err = archive.import_apps(conn, user_id, source, ARCHIVE_CONFIG["batch_size"],
+                                              ARCHIVE_CONFIG["max_app_bytes"], on_batch=register,
+                                              new_app_id=lambda: _backend.new_app_id(user_id))
+        finally:
+            conn.close()
+        if result and result["imported"]:
+            invalidate("stats")
+        return result, err
+    
     @staticmethod
     def get_public_apps() -> List[Dict]:
         """Public app'leri getir"""
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT * FROM apps WHERE is_public = 1 ORDER BY likes DESC, created_at DESC
+            SELECT * FROM apps WHERE is_public = 1 ORDER BY likes DESC, created_at DESC, app_id DESC
         ''')
         apps = [dict(row) for row in cursor.fetchall()]
         conn.close()
@@ -305,9 +471,29 @@ class LocalDatabase:
         return apps
     
     @staticmethod
-    def toggle_like(app_id: str, user_id: str) -> Tuple[bool, bool]:
-        """Beğeni ekle/kaldır"""
+    def get_facet_counts() -> Dict[str, Any]:
+        """Public app'lerde kütüphane/widget/grafik/yükleme sayıları"""
+        conn = get_db_connection()
+        counts = facets.facet_counts(conn.cursor())
+        conn.close()
+        return counts
+    
+    @staticmethod
+    def filter_apps(libraries: Optional[List[str]] = None, widgets: Optional[List[str]] = None,
+                    has_charts: Optional[bool] = None, has_upload: Optional[bool] = None,
+                    limit: int = 50) -> List[Dict]:
+        """Facet filtreleriyle public app'ler"""
         conn = get_db_connection()
+        apps = facets.filter_apps(conn.cursor(), libraries, widgets, has_charts, has_upload, limit=limit)
+        conn.close()
+        return apps
+    
+    @staticmethod
+    def toggle_like(app_id: str, user_id: str) -> Tuple[bool, bool]:
+        """Beğeni ekle/kaldır (beğeniler app'in sahibinin shard'ında)"""
+        conn = _backend.app_conn(app_id)
+        if conn is None:
+            return False, False
         cursor = conn.cursor()
         
         # Kullanıcı daha önce beğenmiş mi?
@@ -324,7 +510,10 @@ class LocalDatabase:
                 UPDATE apps SET likes = likes - 1 WHERE app_id = ?
             ''', (app_id,))
             conn.commit()
+            _sync_likes(conn, app_id)
             conn.close()
+            invalidate("public_apps", "search", "stats")
+            analytics.record("like", user_id=user_id, app_id=app_id, liked=False)
             return True, False  # Kaldırıldı
         else:
             # Beğeni ekle
@@ -335,38 +524,81 @@ class LocalDatabase:
                 UPDATE apps SET likes = likes + 1 WHERE app_id = ?
             ''', (app_id,))
             conn.commit()
+            _sync_likes(conn, app_id)
             conn.close()
+            invalidate("public_apps", "search", "stats")
+            analytics.record("like", user_id=user_id, app_id=app_id, liked=True)
             return True, True  # Eklendi
     
     @staticmethod
     def delete_app(app_id: str):
         """App sil"""
-        conn = get_db_connection()
+        conn = _backend.app_conn(app_id)
+        if conn is None:
+            return
         cursor = conn.cursor()
         cursor.execute("DELETE FROM apps WHERE app_id = ?", (app_id,))
         cursor.execute("DELETE FROM likes WHERE app_id = ?", (app_id,))
+        facets.delete_facets(cursor, app_id)
         conn.commit()
         conn.close()
+        _backend.sync_public(app_id, None)
+        _backend.unregister_app(app_id)
+        invalidate("public_apps", "search", "stats", "facets")
     
     @staticmethod
-    def get_stats() -> Dict[str, int]:
-        """İstatistikleri al"""
-        conn = get_db_connection()
+    def set_public(app_id: str, is_public: bool):
+        """App'i herkese açık yap / gizle"""
+        conn = _backend.app_conn(app_id)
+        if conn is None:
+            return
         cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*) FROM users")
-        total_users = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM apps")
-        total_apps = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM apps WHERE is_public = 1")
-        public_apps = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT SUM(likes) FROM apps")
-        total_likes = cursor.fetchone()[0] or 0
-        
+        cursor.execute("UPDATE apps SET is_public = ? WHERE app_id = ?", (int(is_public), app_id))
+        conn.commit()
+        _backend.sync_public(app_id, _fetch_app(conn, app_id))
+        conn.close()
+        invalidate("public_apps", "search", "stats", "facets")
+    
+    @staticmethod
+    def record_usage(user_id: Optional[str], app_id: Optional[str], calls: List[Dict]):
+        """LLM çağrı kayıtlarını (token, gecikme) yaz"""
+        if not calls:
+            return
+        conn = _backend.user_conn(user_id)
+        cursor = conn.cursor()
+        usage.insert_usage(cursor, user_id, app_id, calls, MODEL_CONFIG["models"])
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    def get_usage_summary(user_id: str) -> Dict[str, Any]:
+        """Kullanıcının token/maliyet özeti"""
+        conn = _backend.user_conn(user_id)
+        cursor = conn.cursor()
+        summary = usage.usage_summary(cursor, user_id)
         conn.close()
+        return summary
+    
+    @staticmethod
+    def get_stats() -> Dict[str, int]:
+        """İstatistikleri al (sharded modda shard'ların toplamı)"""
+        total_users = total_apps = public_apps = total_likes = 0
+        for conn in _backend.shard_conns():
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT COUNT(*) FROM users")
+            total_users += cursor.fetchone()[0]
+            
+            cursor.execute("SELECT COUNT(*) FROM apps")
+            total_apps += cursor.fetchone()[0]
+            
+            cursor.execute("SELECT COUNT(*) FROM apps WHERE is_public = 1")
+            public_apps += cursor.fetchone()[0]
+            
+            cursor.execute("SELECT SUM(likes) FROM apps")
+            total_likes += cursor.fetchone()[0] or 0
+            
+            conn.close()
         return {
             "total_users": total_users,
             "total_apps": total_apps,
@@ -405,6 +637,10 @@ class UserManager:
     def check_credit(user_id: str) -> Dict[str, Any]:
         return LocalDatabase.check_credit(user_id)
     
+    @staticmethod
+    def get_usage_summary(user_id: str) -> Dict[str, Any]:
+        return LocalDatabase.get_usage_summary(user_id)
+    
     @staticmethod
     def activate_pro(user_id: str, months: int = 1):
         # Pro aktivasyonu
@@ -423,17 +659,39 @@ class AppManager:
         return LocalDatabase.get_app(app_id)
     
     @staticmethod
-    def get_user_apps(user_id: str):
-        return LocalDatabase.get_user_apps(user_id)
+    def get_user_apps(user_id: str, limit: int = -1, before_id: Optional[str] = None):
+        return LocalDatabase.get_user_apps(user_id, limit, before_id)
+    
+    @staticmethod
+    def export_user_apps(user_id: str, out):
+        return LocalDatabase.export_user_apps(user_id, out)
     
     @staticmethod
+    def import_user_apps(user_id: str, source):
+        return LocalDatabase.import_user_apps(user_id, source)
+    
+    @staticmethod
+    @cached("public_apps")
     def get_public_apps(limit: int = 50, order_by_likes: bool = True):
         return LocalDatabase.get_public_apps()[:limit]
     
     @staticmethod
+    @cached("search")
     def search_apps(query: str, limit: int = 20):
         return LocalDatabase.search_apps(query)[:limit]
     
+    @staticmethod
+    @cached("facets")
+    def get_facet_counts():
+        return LocalDatabase.get_facet_counts()
+    
+    @staticmethod
+    @cached("public_apps")
+    def filter_apps(libraries: Tuple[str, ...] = (), widgets: Tuple[str, ...] = (),
+                    has_charts: Optional[bool] = None, has_upload: Optional[bool] = None,
+                    limit: int = 50):
+        return LocalDatabase.filter_apps(list(libraries), list(widgets), has_charts, has_upload, limit)
+    
     @staticmethod
     def toggle_like(app_id: str, user_id: str):
         return LocalDatabase.toggle_like(app_id, user_id)
@@ -441,13 +699,35 @@ class AppManager:
     @staticmethod
     def delete_app(app_id: str):
         LocalDatabase.delete_app(app_id)
+    
+    @staticmethod
+    def set_public(app_id: str, is_public: bool):
+        LocalDatabase.set_public(app_id, is_public)
 
 class AnalyticsManager:
     """Analytics wrapper"""
     
     @staticmethod
+    @cached("stats")
     def get_dashboard_stats():
         return LocalDatabase.get_stats()
+    
+    @staticmethod
+    @cached("rollups")
+    def get_event_rollups(period: str = "hour", kind: Optional[str] = None):
+        """Saatlik (son 24 saat) / günlük (son 30 gün) olay özetleri"""
+        return analytics.get_recorder().rollups(period, kind=kind)
+    
+    @staticmethod
+    @cached("rollups")
+    def get_provider_health(hours: int = 24):
+        """Sağlayıcı bazında çağrı sayısı, başarı oranı, ortalama/maks. gecikme"""
+        return analytics.get_recorder().provider_health(hours)
+    
+    @staticmethod
+    def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+        """Galeri/arama/istatistik cache isabet oranları"""
+        return get_cache().stats()
 
 class FirebaseManager:
     def is_using_local(self):
@@ -0,0 +1,181 @@
+"""
+AppFab - Facets
+Kaydedilen kodun AST analizi (kütüphaneler, widget'lar, satır sayısı, grafik/yükleme)
+ve galeri filtreleri için indeksli yan tablolar
+"""
+
+import ast
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import metrics
+
+APPS_ANALYZED_TOTAL = metrics.REGISTRY.counter(
+    "appfab_facet_apps_analyzed_total", "Facet'i çıkarılan app'ler", ("parsed",))
+
+WIDGETS = {
+    "button", "download_button", "link_button", "checkbox", "toggle", "radio", "selectbox",
+    "multiselect", "slider", "select_slider", "text_input", "number_input", "text_area",
+    "date_input", "time_input", "file_uploader", "camera_input", "color_picker", "data_editor",
+    "chat_input", "form_submit_button",
+}
+CHART_CALLS = {
+    "line_chart", "bar_chart", "area_chart", "scatter_chart", "map", "pyplot", "plotly_chart",
+    "altair_chart", "vega_lite_chart", "bokeh_chart", "pydeck_chart", "graphviz_chart",
+}
+CHART_LIBRARIES = {"matplotlib", "plotly", "altair", "seaborn", "bokeh", "pydeck"}
+UPLOAD_CALLS = {"file_uploader", "camera_input"}
+
+FACET_TABLES_SQL = [
+    '''CREATE TABLE IF NOT EXISTS app_facets (
+        app_id TEXT PRIMARY KEY,
+        loc INTEGER,
+        has_charts INTEGER DEFAULT 0,
+        has_upload INTEGER DEFAULT 0,
+        analyzed_at TEXT
+    )''',
+    # (değer, app_id) sırası: filtre ve sayım indeks üzerinden
+    '''CREATE TABLE IF NOT EXISTS app_libraries (
+        library TEXT,
+        app_id TEXT,
+        PRIMARY KEY (library, app_id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS app_widgets (
+        widget TEXT,
+        app_id TEXT,
+        PRIMARY KEY (widget, app_id)
+    )''',
+    "CREATE INDEX IF NOT EXISTS idx_app_facets_charts ON app_facets(has_charts, app_id)",
+    "CREATE INDEX IF NOT EXISTS idx_app_facets_upload ON app_facets(has_upload, app_id)",
+    "CREATE INDEX IF NOT EXISTS idx_app_libraries_app ON app_libraries(app_id)",
+    "CREATE INDEX IF NOT EXISTS idx_app_widgets_app ON app_widgets(app_id)",
+]
+
+def analyze_code(code: str) -> Dict[str, Any]:
+    """{'libraries', 'widgets', 'loc', 'has_charts', 'has_upload'} - parse edilemezse sadece loc"""
+    with metrics.timed("facets.analyze"):
+        loc = sum(1 for line in code.split("\n") if line.strip() and not line.strip().startswith("#"))
+        facets = {"libraries": [], "widgets": [], "loc": loc, "has_charts": False, "has_upload": False}
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            APPS_ANALYZED_TOTAL.inc(parsed="no")
+            return facets
+
+        libraries, calls = set(), set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                libraries.update(alias.name.split(".")[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                libraries.add(node.module.split(".")[0])
+            elif isinstance(node, ast.Call):
+                # st.x(...), col.x(...), st.sidebar.x(...) -> x
+                func = node.func
+                if isinstance(func, ast.Attribute):
+                    calls.add(func.attr)
+
+        facets["libraries"] = sorted(libraries)
+        facets["widgets"] = sorted(calls & WIDGETS)
+        facets["has_charts"] = bool(calls & CHART_CALLS or libraries & CHART_LIBRARIES)
+        facets["has_upload"] = bool(calls & UPLOAD_CALLS)
+        APPS_ANALYZED_TOTAL.inc(parsed="yes")
+        return facets
+
+# =============================================================================
+# STORAGE
+# =============================================================================
+
+def init_facet_tables(cursor):
+    for sql in FACET_TABLES_SQL:
+        cursor.execute(sql)
+
+def delete_facets(cursor, app_id: str):
+    cursor.execute("DELETE FROM app_facets WHERE app_id = ?", (app_id,))
+    cursor.execute("DELETE FROM app_libraries WHERE app_id = ?", (app_id,))
+    cursor.execute("DELETE FROM app_widgets WHERE app_id = ?", (app_id,))
+
+def save_facets(cursor, app_id: str, code: str) -> Dict[str, Any]:
+    """Kodu analiz et, yan tablolara yaz (varsa eskisini değiştir)"""
+    facets = analyze_code(code or "")
+    delete_facets(cursor, app_id)
+    cursor.execute("INSERT INTO app_facets VALUES (?,?,?,?,?)",
+                   (app_id, facets["loc"], int(facets["has_charts"]), int(facets["has_upload"]),
+                    datetime.now().isoformat()))
+    cursor.executemany("INSERT INTO app_libraries VALUES (?,?)", [(lib, app_id) for lib in facets["libraries"]])
+    cursor.executemany("INSERT INTO app_widgets VALUES (?,?)", [(w, app_id) for w in facets["widgets"]])
+    return facets
+
+def backfill_facets(cursor, limit: int = 200) -> int:
+    """Facet'i olmayan (eski) app'lerden bir partiyi analiz et; işlenen sayı (0: kalmadı)"""
+    cursor.execute('''
+        SELECT a.app_id FROM apps a
+        LEFT JOIN app_facets f ON f.app_id = a.app_id
+        WHERE f.app_id IS NULL LIMIT ?
+    ''', (limit,))
+    app_ids = [row[0] for row in cursor.fetchall()]
+    for app_id in app_ids:
+        # Arada kaydedilen app'in facet'i istek yolunda güncel koddan yazılmıştır: atla
+        cursor.execute('''
+            SELECT a.code FROM apps a
+            LEFT JOIN app_facets f ON f.app_id = a.app_id
+            WHERE a.app_id = ? AND f.app_id IS NULL
+        ''', (app_id,))
+        row = cursor.fetchone()
+        if row:
+            save_facets(cursor, app_id, row[0])
+    return len(app_ids)
+
+def backfill_all(conn, batch: int = 200) -> int:
+    """Kalmayana kadar parti parti backfill; her parti ayrı commit (yazma kilidi kısa tutulur)"""
+    total = 0
+    while True:
+        done = backfill_facets(conn.cursor(), batch)
+        conn.commit()
+        if not done:
+            return total
+        total += done
+
+def facet_counts(cursor, public_only: bool = True) -> Dict[str, Any]:
+    """Galeri yan paneli için sayımlar (indeks + apps PK join)"""
+    where = "WHERE a.is_public = 1" if public_only else ""
+    out: Dict[str, Any] = {}
+    for key, table, column in (("libraries", "app_libraries", "library"), ("widgets", "app_widgets", "widget")):
+        cursor.execute(f'''
+            SELECT t.{column}, COUNT(*) FROM {table} t
+            JOIN apps a ON a.app_id = t.app_id {where}
+            GROUP BY t.{column} ORDER BY COUNT(*) DESC
+        ''')
+        out[key] = {row[0]: row[1] for row in cursor.fetchall()}
+    cursor.execute(f'''
+        SELECT COALESCE(SUM(f.has_charts), 0), COALESCE(SUM(f.has_upload), 0) FROM app_facets f
+        JOIN apps a ON a.app_id = f.app_id {where}
+    ''')
+    row = cursor.fetchone()
+    out["has_charts"], out["has_upload"] = row[0], row[1]
+    return out
+
+def filter_apps(cursor, libraries: Optional[List[str]] = None, widgets: Optional[List[str]] = None,
+                has_charts: Optional[bool] = None, has_upload: Optional[bool] = None,
+                public_only: bool = True, limit: int = 50) -> List[Dict]:
+    """Tüm koşulları sağlayan app'ler; her koşul bir indeks araması (code üzerinde LIKE yok)"""
+    clauses, params = [], []
+    if public_only:
+        clauses.append("a.is_public = 1")
+    for library in libraries or []:
+        clauses.append("a.app_id IN (SELECT app_id FROM app_libraries WHERE library = ?)")
+        params.append(library)
+    for widget in widgets or []:
+        clauses.append("a.app_id IN (SELECT app_id FROM app_widgets WHERE widget = ?)")
+        params.append(widget)
+    if has_charts is not None:
+        clauses.append("a.app_id IN (SELECT app_id FROM app_facets WHERE has_charts = ?)")
+        params.append(int(has_charts))
+    if has_upload is not None:
+        clauses.append("a.app_id IN (SELECT app_id FROM app_facets WHERE has_upload = ?)")
+        params.append(int(has_upload))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    cursor.execute(f'''
+        SELECT a.* FROM apps a {where}
+        ORDER BY a.likes DESC, a.created_at DESC, a.app_id DESC LIMIT ?
+    ''', params + [limit])
+    return [dict(row) for row in cursor.fetchall()]
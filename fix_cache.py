@@ -0,0 +1,318 @@
+"""
+AppFab - Fix Cache
+Normalize edilmiş hata imzasına göre düzeltme önbelleği ve bilinen hatalar
+için AST tabanlı yerel düzeltme kuralları (sağlayıcı çağrısı yok)
+"""
+
+import ast
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+FIX_CACHE_TOTAL = metrics.REGISTRY.counter(
+    "appfab_fix_cache_total", "Yerel düzeltme denemeleri", ("source",))
+
+# =============================================================================
+# SIGNATURE
+# =============================================================================
+
+def _exception_line(error_message: str) -> str:
+    lines = [l for l in error_message.strip().split("\n") if l.strip()]
+    for line in reversed(lines):
+        if re.match(r"^[A-Za-z_][\w.]*(Error|Exception|Warning|Exit|Interrupt)\b", line.strip()):
+            return line.strip()
+    return lines[-1].strip() if lines else ""
+
+def error_signature(error_message: str) -> str:
+    """Adres, sayı, yol gibi değişken kısımları atılmış hata imzası"""
+    line = _exception_line(error_message)
+    line = re.sub(r"<[^<>]* at 0x[0-9a-fA-F]+>", "<OBJ>", line)
+    line = re.sub(r"0x[0-9a-fA-F]+", "ADDR", line)
+    line = re.sub(r"(/[\w.\-]+)+\.\w+", "PATH", line)
+    line = re.sub(r"\b\d+(\.\d+)?\b", "N", line)
+    # Modül yolu yerine sadece sınıf adı (PIL.UnidentifiedImageError -> UnidentifiedImageError)
+    line = re.sub(r"^(?:\w+\.)+(\w+:)", r"\1", line)
+    return " ".join(line.split())[:300]
+
+def code_hash(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()[:16]
+
+# =============================================================================
+# SOURCE REWRITE HELPERS
+# =============================================================================
+
+def _replace_nodes(code: str, replacements: List[Tuple[ast.AST, str]]) -> str:
+    """AST düğümlerinin kaynak aralığını değiştir (biçim ve yorumlar korunur)"""
+    lines = code.split("\n")
+    # col_offset UTF-8 bayt cinsinden
+    for node, text in sorted(replacements, key=lambda r: (r[0].lineno, r[0].col_offset), reverse=True):
+        first = lines[node.lineno - 1].encode("utf-8")
+        last = lines[node.end_lineno - 1].encode("utf-8")
+        head = first[:node.col_offset].decode("utf-8")
+        tail = last[node.end_col_offset:].decode("utf-8")
+        lines[node.lineno - 1:node.end_lineno] = (head + text + tail).split("\n")
+    return "\n".join(lines)
+
+def _indent_block(block: str, indent: int) -> str:
+    prefix = " " * indent
+    return "\n".join((prefix + l if l.strip() and i else l) for i, l in enumerate(block.split("\n")))
+
+def _ensure_import(code: str, tree: ast.Module, module: str) -> str:
+    """`import module` yoksa ilk import'tan önce ekle"""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import) and any(a.name == module and not a.asname for a in node.names):
+            return code
+    lines = code.split("\n")
+    imports = [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+    at = imports[0].lineno - 1 if imports else 0
+    lines.insert(at, f"import {module}")
+    return "\n".join(lines)
+
+def _imports_streamlit_as_st(tree: ast.Module) -> bool:
+    return any(isinstance(n, ast.Import) and any(a.name == "streamlit" and a.asname == "st" for a in n.names)
+               for n in ast.walk(tree))
+
+# =============================================================================
+# RULES
+# =============================================================================
+
+_RULES: List[Tuple[str, re.Pattern, Callable[[str, ast.Module], Optional[str]]]] = []
+
+def rule(name: str, pattern: str):
+    """İmzası pattern'e uyan hatalar için yerel düzeltme kuralı kaydet"""
+    def decorator(func):
+        _RULES.append((name, re.compile(pattern), func))
+        return func
+    return decorator
+
+_CV2_SHIM = '''# cv2 yerine PIL/numpy (otomatik duzeltme)
+import io as _io
+import numpy as _np
+from PIL import Image as _Image, ImageFilter as _ImageFilter
+class cv2:
+    COLOR_BGR2RGB = COLOR_RGB2BGR = "swap"
+    COLOR_BGR2GRAY = "bgr2gray"
+    COLOR_RGB2GRAY = "rgb2gray"
+    COLOR_GRAY2RGB = COLOR_GRAY2BGR = "gray2rgb"
+    IMREAD_COLOR, IMREAD_GRAYSCALE, IMREAD_UNCHANGED = 1, 0, -1
+    THRESH_BINARY, THRESH_BINARY_INV = 0, 1
+    INTER_LINEAR = INTER_AREA = INTER_CUBIC = INTER_NEAREST = None
+    @staticmethod
+    def _pil(img):
+        return _Image.fromarray(_np.asarray(img).astype(_np.uint8))
+    @staticmethod
+    def cvtColor(img, code):
+        img = _np.asarray(img)
+        if code == "swap":
+            return img[..., ::-1].copy()
+        if code in ("bgr2gray", "rgb2gray"):
+            rgb = img[..., 2::-1] if code == "bgr2gray" else img[..., :3]
+            return _np.asarray(cv2._pil(rgb).convert("L"))
+        if code == "gray2rgb":
+            return _np.stack([img] * 3, axis=-1)
+        return img
+    @staticmethod
+    def GaussianBlur(img, ksize, sigmaX=0, *args, **kwargs):
+        radius = sigmaX or max(ksize[0] // 2, 1)
+        return _np.asarray(cv2._pil(img).filter(_ImageFilter.GaussianBlur(radius)))
+    @staticmethod
+    def blur(img, ksize, *args, **kwargs):
+        return _np.asarray(cv2._pil(img).filter(_ImageFilter.BoxBlur(max(ksize[0] // 2, 1))))
+    @staticmethod
+    def medianBlur(img, ksize):
+        return _np.asarray(cv2._pil(img).filter(_ImageFilter.MedianFilter(ksize | 1)))
+    @staticmethod
+    def Canny(img, threshold1=100, threshold2=200, *args, **kwargs):
+        return _np.asarray(cv2._pil(img).convert("L").filter(_ImageFilter.FIND_EDGES))
+    @staticmethod
+    def resize(img, dsize, dst=None, fx=0, fy=0, interpolation=None):
+        pil = cv2._pil(img)
+        if not dsize or tuple(dsize) == (0, 0):
+            dsize = (max(int(pil.width * fx), 1), max(int(pil.height * fy), 1))
+        return _np.asarray(pil.resize(tuple(int(v) for v in dsize)))
+    @staticmethod
+    def flip(img, code):
+        img = _np.asarray(img)
+        return img[::-1] if code == 0 else img[:, ::-1] if code > 0 else img[::-1, ::-1]
+    @staticmethod
+    def threshold(img, thresh, maxval, type=0):
+        img = _np.asarray(img)
+        mask = img > thresh if type == 0 else img <= thresh
+        return thresh, _np.where(mask, maxval, 0).astype(_np.uint8)
+    @staticmethod
+    def bitwise_not(img):
+        return 255 - _np.asarray(img).astype(_np.uint8)
+    @staticmethod
+    def imdecode(buf, flags=1):
+        pil = _Image.open(_io.BytesIO(bytes(_np.asarray(buf).tobytes())))
+        if flags == 0:
+            return _np.asarray(pil.convert("L"))
+        return _np.asarray(pil.convert("RGB"))[..., ::-1].copy()
+    @staticmethod
+    def imencode(ext, img):
+        out = _io.BytesIO()
+        cv2._pil(img).save(out, format={".jpg": "JPEG", ".jpeg": "JPEG"}.get(ext.lower(), "PNG"))
+        return True, _np.frombuffer(out.getvalue(), dtype=_np.uint8)'''
+
+_CV2_SUPPORTED = {name for name in re.findall(r"^    (?:def )?(\w+)", _CV2_SHIM, re.M)} | {
+    "COLOR_RGB2BGR", "COLOR_GRAY2BGR", "IMREAD_GRAYSCALE", "IMREAD_UNCHANGED",
+    "THRESH_BINARY_INV", "INTER_AREA", "INTER_CUBIC", "INTER_NEAREST",
+}
+
+@rule("cv2_to_pil", r"No module named 'cv2'|libGL\.so|ImportError: .*cv2")
+def _cv2_to_pil(code: str, tree: ast.Module) -> Optional[str]:
+    """import cv2 -> PIL/numpy ile yazılmış küçük cv2 uyumlu katman"""
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module == "cv2":
+            return None
+        if isinstance(node, ast.Import) and any(a.name == "cv2" for a in node.names):
+            if len(node.names) > 1 or node.names[0].asname:
+                return None
+            imports.append(node)
+    if not imports:
+        return None
+    # Katman modül seviyesinde tanımlanmalı (metotları global cv2'ye başvurur)
+    top_level = list(tree.body) + [c for n in tree.body if isinstance(n, ast.Try) for c in n.body]
+    if any(node not in top_level for node in imports):
+        return None
+    used = {n.attr for n in ast.walk(tree)
+            if isinstance(n, ast.Attribute) and isinstance(n.value, ast.Name) and n.value.id == "cv2"}
+    if not used <= _CV2_SUPPORTED:
+        return None  # Katmanın karşılamadığı fonksiyon var; LLM'e bırak
+    return _replace_nodes(code, [(node, _indent_block(_CV2_SHIM, node.col_offset)) for node in imports])
+
+def _uploader_names(tree: ast.Module) -> set:
+    """st.file_uploader(...) sonucunun atandığı isimler (tekli dosya)"""
+    names = set()
+    for node in ast.walk(tree):
+        value = getattr(node, "value", None)
+        if isinstance(node, (ast.Assign, ast.AnnAssign, ast.NamedExpr)) and isinstance(value, ast.Call):
+            func = value.func
+            if isinstance(func, ast.Attribute) and func.attr == "file_uploader":
+                if any(k.arg == "accept_multiple_files" for k in value.keywords):
+                    continue
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                names.update(t.id for t in targets if isinstance(t, ast.Name))
+    return names
+
+@rule("uploaded_file_image_open", r"cannot identify image file|'bytes' object has no attribute 'read'")
+def _uploaded_file_image_open(code: str, tree: ast.Module) -> Optional[str]:
+    """Image.open(uploaded) / Image.open(uploaded.read()) -> Image.open(io.BytesIO(uploaded.getvalue()))"""
+    uploads = _uploader_names(tree)
+    replacements = []
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and node.args and isinstance(node.func, ast.Attribute)
+                and node.func.attr == "open" and isinstance(node.func.value, (ast.Name, ast.Attribute))
+                and (getattr(node.func.value, "id", None) == "Image" or getattr(node.func.value, "attr", None) == "Image")):
+            continue
+        arg = node.args[0]
+        name = None
+        if isinstance(arg, ast.Name) and arg.id in uploads:
+            name = arg.id
+        elif (isinstance(arg, ast.Call) and isinstance(arg.func, ast.Attribute) and arg.func.attr == "read"
+              and isinstance(arg.func.value, ast.Name) and arg.func.value.id in uploads):
+            name = arg.func.value.id
+        if name:
+            replacements.append((arg, f"io.BytesIO({name}.getvalue())"))
+    if not replacements:
+        return None
+    code = _replace_nodes(code, replacements)
+    return _ensure_import(code, ast.parse(code), "io")
+
+@rule("openai_unavailable", r"No module named 'openai'|cannot import name '\w+' from 'openai'")
+def _openai_unavailable(code: str, tree: ast.Module) -> Optional[str]:
+    """openai import'unu korumaya al: paket yoksa uygulama anlaşılır mesajla durur"""
+    if not _imports_streamlit_as_st(tree):
+        return None
+    replacements = []
+    for node in tree.body:
+        if (isinstance(node, ast.Import) and any(a.name.split(".")[0] == "openai" for a in node.names)) or \
+           (isinstance(node, ast.ImportFrom) and (node.module or "").split(".")[0] == "openai"):
+            original = ast.get_source_segment(code, node)
+            replacements.append((node, "try:\n    " + original + "\nexcept ImportError:\n"
+                                 "    st.error(\"Bu uygulama 'openai' paketini (>=1.0) gerektiriyor.\")\n"
+                                 "    st.stop()"))
+    if not replacements:
+        return None
+    return _replace_nodes(code, replacements)
+
+def apply_rules(code: str, error_message: str) -> Optional[Tuple[str, str]]:
+    """İmzaya uyan ilk kuralı uygula: (yeni kod, kural adı)"""
+    signature = error_signature(error_message)
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    for name, pattern, func in _RULES:
+        if not pattern.search(signature) and not pattern.search(error_message):
+            continue
+        fixed = func(code, tree)
+        if fixed and fixed != code:
+            try:
+                ast.parse(fixed)
+            except SyntaxError:
+                continue
+            return fixed, name
+    return None
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+class FixCache:
+    """(hata imzası, kod) -> düzeltilmiş kod; süreç genelinde paylaşılır"""
+
+    def __init__(self, max_entries: int = 500):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, code: str, error_message: str) -> Optional[Tuple[str, str]]:
+        """(düzeltilmiş kod, kaynak) - kaynak 'cache' veya kural adı"""
+        key = (error_signature(error_message), code_hash(code))
+        with self._lock:
+            fixed = self._entries.get(key)
+            if fixed is not None:
+                self._entries.move_to_end(key)
+        if fixed is not None:
+            FIX_CACHE_TOTAL.inc(source="cache")
+            return fixed, "cache"
+        result = apply_rules(code, error_message)
+        if result:
+            FIX_CACHE_TOTAL.inc(source="rule")
+            self.store(code, error_message, result[0])
+            return result
+        FIX_CACHE_TOTAL.inc(source="miss")
+        return None
+
+    def store(self, code: str, error_message: str, fixed: str):
+        key = (error_signature(error_message), code_hash(code))
+        with self._lock:
+            self._entries[key] = fixed
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+_cache: Optional[FixCache] = None
+_cache_lock = threading.Lock()
+
+def get_fix_cache() -> FixCache:
+    """Süreç genelindeki düzeltme önbelleği"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = FixCache()
+        return _cache
+
+# =============================================================================
+# LOOP GUARD
+# =============================================================================
+
+def is_repeating(history: List[str], signature: str, max_repeats: int = 2) -> bool:
+    """Aynı imza daha önce max_repeats kez düzeltilmeye çalışıldıysa döngü var"""
+    return history.count(signature) >= max_repeats
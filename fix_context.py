@@ -0,0 +1,223 @@
+"""
+AppFab - Fix Context
+Düzeltme prompt'u için traceback'i üretilen koda indirger ve
+hatalı satırların çevresini token bütçesi içinde seçer
+"""
+
+import ast
+import math
+import re
+import textwrap
+from typing import Dict, List, Optional, Tuple
+
+# Önizlemede exec edilen kodun dosya adı; traceback'te bu isimle görünür
+GENERATED_FILENAME = "<generated_app>"
+
+_FRAME_RE = re.compile(r'^\s*File "(?P<file>[^"]+)", line (?P<line>\d+)(?:, in (?P<func>.+))?$')
+
+# Bütçeye tek satır bile sığmadığında kısaltılan satırların sonuna eklenir; model satırı
+# olduğu gibi döndürürse splice_window orijinalini geri koyar
+TRUNCATION_MARK = "# <satir {} kisaltildi>"
+_TRUNCATED_RE = re.compile(r"# <satir (\d+) kisaltildi>")
+
+def prepare_preview_code(code: str) -> str:
+    """set_page_config satırlarını boşalt (satır numaraları korunur)"""
+    return "\n".join("" if "set_page_config" in line else line for line in code.split("\n"))
+
+def estimate_tokens(text: str, chars_per_token: float = 3.5) -> int:
+    """Yerel, kaba token tahmini (kod için ~3.5 karakter/token)"""
+    return math.ceil(len(text) / chars_per_token)
+
+# =============================================================================
+# TRACEBACK
+# =============================================================================
+
+def parse_traceback(text: str) -> Tuple[List[Dict], List[str]]:
+    """(frame listesi, exception satırları) - zincirli traceback'te sonuncusu"""
+    lines = text.strip("\n").split("\n")
+    starts = [i for i, line in enumerate(lines) if line.startswith("Traceback (most recent call last)")]
+    if starts:
+        lines = lines[starts[-1] + 1:]
+    frames: List[Dict] = []
+    exception: List[str] = []
+    for line in lines:
+        match = _FRAME_RE.match(line)
+        if match and not exception:
+            frames.append({
+                "file": match.group("file"),
+                "line": int(match.group("line")),
+                "func": match.group("func") or "",
+                "source": [],
+            })
+        elif frames and not exception and line.startswith("    "):
+            frames[-1]["source"].append(line)
+        elif line.strip():
+            exception.append(line)
+    return frames, exception
+
+def trim_traceback(text: str, filename: str = GENERATED_FILENAME, max_lines: int = 40) -> str:
+    """Üretilen kod dışındaki (app.py, Streamlit, kütüphane) frame'leri at"""
+    frames, exception = parse_traceback(text)
+    kept = [f for f in frames if f["file"] == filename]
+    if not kept and not exception:
+        return text.strip()[-max_lines * 120:]
+    out = []
+    for frame in kept:
+        header = f'  File "{frame["file"]}", line {frame["line"]}'
+        out.append(f'{header}, in {frame["func"]}' if frame["func"] else header)
+        out.extend(frame["source"])
+    out.extend(exception[-max_lines:])
+    return "\n".join(out[-max_lines:])
+
+def error_lines(text: str, filename: str = GENERATED_FILENAME) -> List[int]:
+    """Traceback'te üretilen koda ait satır numaraları (en derindeki sonda)"""
+    frames, _ = parse_traceback(text)
+    return [f["line"] for f in frames if f["file"] == filename]
+
+# =============================================================================
+# CODE WINDOWS
+# =============================================================================
+
+def numbered_excerpt(code: str, linenos: List[int], window: int) -> str:
+    """Hatalı satırlar ve çevresi, satır numaralı; hatalı satır '>>' ile işaretli"""
+    lines = code.split("\n")
+    ranges: List[List[int]] = []
+    for lineno in sorted(set(linenos)):
+        start, end = max(1, lineno - window), min(len(lines), lineno + window)
+        if ranges and start <= ranges[-1][1] + 1:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([start, end])
+    out = []
+    marked = set(linenos)
+    for start, end in ranges:
+        if out:
+            out.append("   ...")
+        for n in range(start, end + 1):
+            out.append(f"{'>>' if n in marked else '  '}{n:4d} | {lines[n - 1]}")
+    return "\n".join(out)
+
+def _statement_span(code: str, lineno: int, max_lines: int) -> Optional[Tuple[int, int, int]]:
+    """Satırı içeren, max_lines'a sığan en dış ifade aralığı: (başlangıç, bitiş, girinti)"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    body = tree.body
+    while body:
+        node = next((n for n in body if n.lineno <= lineno <= n.end_lineno), None)
+        if node is None:
+            return None
+        start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+        if node.end_lineno - start + 1 <= max_lines:
+            return start, node.end_lineno, node.col_offset
+        # Çok büyük: içindeki ifade listesine in (if/for/with/def gövdesi)
+        children = []
+        for field in ("body", "orelse", "finalbody", "handlers"):
+            children.extend(getattr(node, field, []) or [])
+        body = [c for c in children if hasattr(c, "lineno") and hasattr(c, "end_lineno")]
+    return None
+
+def select_window(code: str, linenos: List[int], window: int, max_lines: int) -> Tuple[int, int, int]:
+    """Değiştirilecek satır aralığı: tam ifadeler (AST), olmazsa düz pencere"""
+    lines = code.split("\n")
+    target = linenos[-1] if linenos else len(lines)
+    lo = max(1, min(linenos or [target]) - window)
+    hi = min(len(lines), max(linenos or [target]) + window)
+    if hi - lo + 1 > max_lines:
+        # Sadece en derindeki hataya odaklan
+        lo, hi = max(1, target - window), min(len(lines), target + window)
+    spans = [_statement_span(code, n, max_lines) for n in range(lo, hi + 1) if lines[n - 1].strip()]
+    spans = [s for s in spans if s]
+    if spans:
+        start = min(s[0] for s in spans)
+        end = max(s[1] for s in spans)
+        indent = min(s[2] for s in spans)
+        if end - start + 1 <= max_lines:
+            return start, end, indent
+        start, end, indent = _statement_span(code, target, max_lines) or (lo, hi, 0)
+        return start, end, indent
+    chunk = [l for l in lines[lo - 1:hi] if l.strip()]
+    indent = min((len(l) - len(l.lstrip()) for l in chunk), default=0)
+    return lo, hi, indent
+
+def splice_window(code: str, start: int, end: int, indent: int, replacement: str) -> str:
+    """
+    Modelin döndürdüğü (girintisiz) bloğu start..end aralığına yerleştir; kısaltılarak
+    gönderilip işaretiyle dönen satırların yerine orijinali konur
+    """
+    lines = code.split("\n")
+    new_lines = []
+    prefix = " " * indent
+    for line in textwrap.dedent(replacement).strip("\n").split("\n"):
+        match = _TRUNCATED_RE.search(line)
+        if match and 1 <= int(match.group(1)) <= len(lines):
+            new_lines.append(lines[int(match.group(1)) - 1])
+        else:
+            new_lines.append(prefix + line if line.strip() else line)
+    return "\n".join(lines[:start - 1] + new_lines + lines[end:])
+
+def _truncate_lines(lines: List[str], first_lineno: int, max_chars: int) -> List[str]:
+    return [line if len(line) <= max_chars else f"{line[:max_chars]}  {TRUNCATION_MARK.format(first_lineno + i)}"
+            for i, line in enumerate(lines)]
+
+# =============================================================================
+# BUILDER
+# =============================================================================
+
+def build_fix_context(code: str, error_message: str, window: int = 8, token_budget: int = 6000,
+                      max_output_tokens: int = 4000, chars_per_token: float = 3.5,
+                      max_traceback_lines: int = 40) -> Dict:
+    """
+    Düzeltme bağlamı:
+    - mode="full": tüm kod + kısaltılmış traceback + hatalı satır özeti
+    - mode="window": sadece hatalı ifade bloğu gönderilir, dönen blok koda yerleştirilir;
+      tek satır bile bütçeyi aşarsa uzun satırlar kısaltılır (truncated=True)
+    """
+    traceback_text = trim_traceback(error_message, max_lines=max_traceback_lines)
+    linenos = error_lines(error_message)
+    excerpt = numbered_excerpt(code, linenos, window) if linenos else ""
+
+    code_tokens = estimate_tokens(code, chars_per_token)
+    fixed_tokens = estimate_tokens(traceback_text + excerpt, chars_per_token) + 400
+    # Tam kod hem prompt bütçesine hem de çıktı limitine sığmalı (model tüm kodu geri yazar)
+    if code_tokens + fixed_tokens <= token_budget and code_tokens * 1.2 <= max_output_tokens:
+        return {"mode": "full", "traceback": traceback_text, "excerpt": excerpt, "code": code}
+
+    # Pencere: hem prompt'a hem çıktıya sığacak kadar satır
+    lines = code.split("\n")
+    avg_line_tokens = max(code_tokens / max(len(lines), 1), 1)
+    room = min(token_budget - fixed_tokens, max_output_tokens / 1.2)
+    max_lines = max(int(room / avg_line_tokens), window * 2 + 1)
+    start, end, indent = select_window(code, linenos, window, max_lines)
+    block = textwrap.dedent("\n".join(lines[start - 1:end]))
+    target = linenos[-1] if linenos else len(lines)
+    span = window
+    while estimate_tokens(block, chars_per_token) + fixed_tokens > token_budget and span >= 0:
+        # Satırlar çok uzun: en derindeki hatanın çevresini daralt (en son sadece o satır)
+        start, end = max(1, target - span), min(len(lines), target + span)
+        chunk = lines[start - 1:end]
+        indent = min((len(l) - len(l.lstrip()) for l in chunk if l.strip()), default=0)
+        block = textwrap.dedent("\n".join(chunk))
+        span = span // 2 if span > 1 else span - 1
+    truncated = estimate_tokens(block, chars_per_token) + fixed_tokens > token_budget
+    if truncated:
+        # Tek satır bile sığmıyor: özet atılır (blok hatalı satırı zaten içerir), traceback
+        # bütçenin yarısıyla sınırlanır, kalan yere sığacak şekilde satırlar kısaltılır
+        excerpt = ""
+        traceback_text = traceback_text[-int(token_budget / 2 * chars_per_token):]
+        fixed_tokens = estimate_tokens(traceback_text, chars_per_token) + 400
+        chunk = lines[start - 1:end]
+        room_chars = max(token_budget - fixed_tokens, 0) * chars_per_token
+        max_chars = max(int(room_chars / len(chunk)) - len(TRUNCATION_MARK.format(end)) - 2, indent + 40)
+        block = textwrap.dedent("\n".join(_truncate_lines(chunk, start, max_chars)))
+    return {
+        "mode": "window",
+        "traceback": traceback_text,
+        "excerpt": excerpt,
+        "code": block,
+        "start": start,
+        "end": end,
+        "indent": indent,
+        "truncated": truncated,
+    }
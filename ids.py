@@ -0,0 +1,71 @@
+"""
+AppFab - IDs
+Zaman sıralı, çakışmasız ID'ler (ULID): 48 bit milisaniye + 80 bit rastgele,
+Crockford base32; aynı milisaniyede monoton artar
+"""
+
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DECODE = {c: i for i, c in enumerate(ALPHABET)}
+_RANDOM_MAX = (1 << 80) - 1
+
+_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, rem = divmod(value, 32)
+        chars.append(ALPHABET[rem])
+    return "".join(reversed(chars))
+
+def ulid(now_ms: Optional[int] = None) -> str:
+    """26 karakterlik ULID; sözlük sırası = oluşturma sırası (aynı süreçte)"""
+    global _last_ms, _last_random
+    ms = int(time.time() * 1000) if now_ms is None else now_ms
+    with _lock:
+        if ms <= _last_ms:
+            # Aynı ms (veya saat geri gitti): öncekinin bir fazlası, sıra bozulmaz
+            ms = _last_ms
+            if _last_random == _RANDOM_MAX:
+                ms += 1
+                _last_random = int.from_bytes(os.urandom(10), "big") >> 1
+            else:
+                _last_random += 1
+        else:
+            # Üst bit boş: aynı ms içinde 2^79 artış payı
+            _last_random = int.from_bytes(os.urandom(10), "big") >> 1
+        _last_ms = ms
+        return _encode(ms, 10) + _encode(_last_random, 16)
+
+def new_id(prefix: str, shard: Optional[int] = None) -> str:
+    """
+    'app_01J...' gibi önekli ID (app, user, job); shard verilirse önekte taşınır
+    ('app03_01J...'): kaydın hangi dosyada olduğu dizin sorgusu olmadan bilinir
+    """
+    return f"{prefix}{'' if shard is None else f'{shard:02d}'}_{ulid()}"
+
+def id_shard(value: str) -> Optional[int]:
+    """new_id(prefix, shard) ile üretilmiş ID'nin shard'ı; eski ID'lerde None"""
+    match = re.match(r"[a-z]+(\d{2})_", value or "")
+    return int(match.group(1)) if match else None
+
+def id_datetime(value: str) -> Optional[datetime]:
+    """ID'nin oluşturulma zamanı; eski 'app_<unix saniye>' biçimini de çözer"""
+    body = value.split("_", 1)[-1]
+    head = body.split("_", 1)[0]
+    if head.isdigit():
+        return datetime.fromtimestamp(int(head), tz=timezone.utc)
+    if len(body) != 26 or any(c not in _DECODE for c in body):
+        return None
+    ms = 0
+    for c in body[:10]:
+        ms = ms * 32 + _DECODE[c]
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
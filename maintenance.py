@@ -0,0 +1,335 @@
+"""
+AppFab - Maintenance
+Uygulama çalışırken SQLite bakımı: tek okuma snapshot'ından (WAL) online yedek,
+incremental_vacuum, PRAGMA optimize ve WAL checkpoint; zamanlayıcı ve süre/boyut raporları
+
+    python maintenance.py report|prepare|backup|vacuum|optimize|checkpoint|all
+
+prepare: auto_vacuum=INCREMENTAL dönüşümü (tam VACUUM, yazmaları bloklar) sadece buradan
+yapılır; uygulama içindeki zamanlayıcı arka planda yalnızca WAL'a geçer.
+"""
+
+import glob
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+from storage import storage_paths
+
+TASK_SECONDS = metrics.REGISTRY.histogram(
+    "appfab_maintenance_seconds", "Bakım görevi süresi", ("task",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0))
+TASK_TOTAL = metrics.REGISTRY.counter(
+    "appfab_maintenance_total", "Bakım görevleri", ("task", "status"))
+DB_BYTES = metrics.REGISTRY.gauge(
+    "appfab_db_size_bytes", "Veritabanı dosya boyutu (WAL dahil)", ("db",))
+DB_FREE_BYTES = metrics.REGISTRY.gauge(
+    "appfab_db_free_bytes", "Veritabanındaki boş sayfaların boyutu", ("db",))
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+def _connect(path: str, busy_timeout_ms: int = 100) -> sqlite3.Connection:
+    """Bakım bağlantısı: kısa busy_timeout, kilit alamazsa canlı trafiğe yol verir"""
+    conn = sqlite3.connect(path, timeout=busy_timeout_ms / 1000, check_same_thread=False,
+                           isolation_level=None)
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    return conn
+
+def _pragma(conn: sqlite3.Connection, name: str) -> Any:
+    return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+def db_size(path: str) -> Dict[str, Any]:
+    """Dosya/WAL boyutu, sayfa sayısı ve boş sayfalar"""
+    conn = _connect(path)
+    try:
+        page_size = _pragma(conn, "page_size")
+        pages = _pragma(conn, "page_count")
+        free = _pragma(conn, "freelist_count")
+        info = {
+            "db": os.path.basename(path),
+            "file_bytes": os.path.getsize(path) if os.path.exists(path) else 0,
+            "wal_bytes": os.path.getsize(path + "-wal") if os.path.exists(path + "-wal") else 0,
+            "page_size": page_size,
+            "pages": pages,
+            "free_pages": free,
+            "free_bytes": free * page_size,
+            "auto_vacuum": _pragma(conn, "auto_vacuum"),
+            "journal_mode": _pragma(conn, "journal_mode"),
+        }
+    finally:
+        conn.close()
+    DB_BYTES.set(info["file_bytes"] + info["wal_bytes"], db=info["db"])
+    DB_FREE_BYTES.set(info["free_bytes"], db=info["db"])
+    return info
+
+# =============================================================================
+# TASKS
+# =============================================================================
+
+def prepare(path: str, wal: bool = True, convert_max_bytes: int = 64 * 1024 * 1024,
+            convert: bool = False) -> Dict[str, Any]:
+    """
+    WAL'a geç (okuyucular yazarları bloklamaz); convert ile auto_vacuum=INCREMENTAL ayarla.
+    Mevcut dosyada auto_vacuum değişikliği tam VACUUM ister (dosya boyunca yazma kilidi):
+    sadece CLI'dan ve küçük dosyalarda yapılır.
+    """
+    conn = _connect(path, busy_timeout_ms=1000)
+    try:
+        if wal and _pragma(conn, "journal_mode") != "wal":
+            conn.execute("PRAGMA journal_mode = WAL")
+        converted = False
+        if convert and _pragma(conn, "auto_vacuum") != AUTO_VACUUM_INCREMENTAL:
+            size = _pragma(conn, "page_count") * _pragma(conn, "page_size")
+            if size <= convert_max_bytes:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+                converted = True
+        return {"auto_vacuum": _pragma(conn, "auto_vacuum"), "journal_mode": _pragma(conn, "journal_mode"),
+                "converted": converted}
+    finally:
+        conn.close()
+
+class BackupTimeout(Exception):
+    """Adımlı yedek max_seconds içinde bitmedi (kaynağa sürekli yazılıyor)"""
+
+def backup(path: str, backup_dir: str = "backups", pages: int = 256, step_sleep: float = 0.05,
+           keep: int = 7, busy_timeout_ms: int = 100, max_seconds: float = 300.0) -> Dict[str, Any]:
+    """
+    Online yedek. WAL'da VACUUM INTO: tek okuma snapshot'ı, yazarlar beklemez ve araya giren
+    yazmalar kopyayı baştan başlatmaz. WAL değilse backup API ile `pages` sayfalık adımlar
+    (aralarda step_sleep); başka bağlantının her yazması kopyayı baştan başlattığı için
+    max_seconds'ta kesilir ve BackupTimeout ile başarısız sayılır.
+    Yedek .tmp'ye yazılıp tamamlanınca taşınır; yarım kalan .tmp silinir.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(path))[0]
+    target = os.path.join(backup_dir, f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.db")
+    deadline = time.monotonic() + max_seconds
+    steps = [0]
+
+    def progress(status, remaining, total):
+        steps[0] += 1
+        if time.monotonic() > deadline:
+            raise BackupTimeout(f"{steps[0]} adımda bitmedi ({max_seconds:.0f} sn)")
+        # backup()'ın sleep'i sadece BUSY/LOCKED adımlarında bekler; okuma kilidi adım
+        # sonunda bırakıldığı için yazarlara burada yol verilir
+        if remaining:
+            time.sleep(step_sleep)
+
+    source = _connect(path, busy_timeout_ms)
+    try:
+        wal = _pragma(source, "journal_mode") == "wal"
+        if wal:
+            steps[0] = 1
+            source.execute("VACUUM INTO ?", (target + ".tmp",))
+        else:
+            dest = sqlite3.connect(target + ".tmp")
+            try:
+                source.backup(dest, pages=pages, progress=progress, sleep=step_sleep)
+            finally:
+                dest.close()
+        os.replace(target + ".tmp", target)
+    except BaseException:
+        if os.path.exists(target + ".tmp"):
+            os.remove(target + ".tmp")
+        raise
+    finally:
+        source.close()
+
+    # En yeni `keep` yedek kalır (isimler zaman damgalı, sözlük sırası = zaman sırası)
+    old = sorted(glob.glob(os.path.join(backup_dir, f"{name}-*.db")))[:-keep] if keep else []
+    # Çöken süreçten kalan .tmp'ler (başka bir sürecin devam eden yedeğine dokunmamak için eski olanlar)
+    old += [tmp for tmp in glob.glob(os.path.join(backup_dir, f"{name}-*.db.tmp"))
+            if time.time() - os.path.getmtime(tmp) > 3600]
+    for stale in old:
+        os.remove(stale)
+    return {"target": target, "bytes": os.path.getsize(target), "method": "vacuum_into" if wal else "backup_api",
+            "steps": steps[0], "removed": len(old)}
+
+def incremental_vacuum(path: str, pages: int = 128, budget: float = 2.0, step_sleep: float = 0.05,
+                       busy_timeout_ms: int = 100) -> Dict[str, Any]:
+    """Boş sayfaları küçük adımlarla dosyadan at; her adım kısa bir yazma işlemi, süre bütçesiyle sınırlı"""
+    conn = _connect(path, busy_timeout_ms)
+    freed = steps = 0
+    try:
+        if _pragma(conn, "auto_vacuum") != AUTO_VACUUM_INCREMENTAL:
+            return {"skipped": "auto_vacuum is not INCREMENTAL", "free_pages": _pragma(conn, "freelist_count")}
+        deadline = time.monotonic() + budget
+        while time.monotonic() < deadline:
+            before = _pragma(conn, "freelist_count")
+            if before == 0:
+                break
+            try:
+                # execute() tek adım çalıştırır (1 sayfa); executescript tamamlanana kadar
+                conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+            except sqlite3.OperationalError:
+                break  # kilit meşgul: bir sonraki turda devam
+            freed += before - _pragma(conn, "freelist_count")
+            steps += 1
+            time.sleep(step_sleep)
+        return {"freed_pages": freed, "steps": steps, "free_pages": _pragma(conn, "freelist_count")}
+    finally:
+        conn.close()
+
+def optimize(path: str, busy_timeout_ms: int = 100) -> Dict[str, Any]:
+    """PRAGMA optimize: sadece gereken tablolar için ANALYZE (genelde milisaniyeler)"""
+    conn = _connect(path, busy_timeout_ms)
+    try:
+        conn.execute("PRAGMA optimize").fetchall()
+        return {}
+    finally:
+        conn.close()
+
+def checkpoint(path: str, mode: str = "PASSIVE", busy_timeout_ms: int = 100) -> Dict[str, Any]:
+    """WAL checkpoint; PASSIVE yazarları/okuyucuları beklemez, yetişemediğini sonraki tura bırakır"""
+    conn = _connect(path, busy_timeout_ms)
+    try:
+        busy, log, done = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        return {"busy": bool(busy), "wal_pages": log, "checkpointed": done}
+    finally:
+        conn.close()
+
+# =============================================================================
+# SCHEDULER
+# =============================================================================
+
+class MaintenanceScheduler:
+    """Arka plan thread'i: görevleri aralıklarına göre sırayla çalıştırır, son raporları tutar"""
+
+    def __init__(self, enabled: bool = True, paths: Optional[List[str]] = None, wal: bool = True,
+                 backup_dir: str = "backups", keep_backups: int = 7, backup_interval: float = 6 * 3600,
+                 backup_pages: int = 256, backup_max_seconds: float = 300.0, vacuum_interval: float = 3600, vacuum_pages: int = 128,
+                 vacuum_budget: float = 2.0, optimize_interval: float = 3600,
+                 checkpoint_interval: float = 300, step_sleep: float = 0.05, busy_timeout_ms: int = 100,
+                 convert_max_bytes: int = 64 * 1024 * 1024, tick: float = 30.0, history: int = 200):
+        self.enabled = enabled
+        self.paths = paths or []
+        self.wal = wal
+        self.convert_max_bytes = convert_max_bytes
+        self.tick = tick
+        self.tasks: Dict[str, Callable[[str], Dict[str, Any]]] = {
+            "checkpoint": lambda p: checkpoint(p, busy_timeout_ms=busy_timeout_ms),
+            "optimize": lambda p: optimize(p, busy_timeout_ms),
+            "vacuum": lambda p: incremental_vacuum(p, vacuum_pages, vacuum_budget, step_sleep, busy_timeout_ms),
+            "backup": lambda p: backup(p, backup_dir, backup_pages, step_sleep, keep_backups, busy_timeout_ms,
+                                       backup_max_seconds),
+        }
+        self.intervals = {"checkpoint": checkpoint_interval, "optimize": optimize_interval,
+                          "vacuum": vacuum_interval, "backup": backup_interval}
+        self._last_run: Dict[str, float] = {}
+        self._reports: "deque[Dict[str, Any]]" = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if not self.enabled or self._thread is not None or not self.paths:
+            return
+        now = time.monotonic()
+        # İlk turlar süreç açılışına yığılmasın: her görev kendi aralığı kadar sonra
+        self._last_run = {task: now for task in self.tasks}
+        self._thread = threading.Thread(target=self._loop, name="appfab-maintenance", daemon=True)
+        self._thread.start()
+
+    def prepare_databases(self, convert: bool = False) -> List[Dict[str, Any]]:
+        """WAL'a geç; convert=True (sadece CLI) auto_vacuum dönüşümünü de yapar"""
+        with self._run_lock:
+            return [self._record("prepare", path, lambda p: prepare(p, self.wal, self.convert_max_bytes, convert))
+                    for path in self.paths if os.path.exists(path)]
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        # İstek yolunda değil: ilk ziyaretçi kilit beklemez
+        self.prepare_databases()
+        while not self._stop.wait(self.tick):
+            for task in self.tasks:
+                if time.monotonic() - self._last_run[task] >= self.intervals[task]:
+                    self.run(task)
+
+    def run(self, task: str) -> List[Dict[str, Any]]:
+        """Görevi tüm veritabanlarında hemen çalıştır (aynı anda tek bakım görevi)"""
+        with self._run_lock:
+            self._last_run[task] = time.monotonic()
+            return [self._record(task, path, self.tasks[task]) for path in self.paths if os.path.exists(path)]
+
+    def _record(self, task: str, path: str, fn: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        before = db_size(path)
+        started = time.perf_counter()
+        report = {"task": task, "db": os.path.basename(path), "at": datetime.now().isoformat(timespec="seconds")}
+        try:
+            report.update(fn(path))
+            report["ok"] = True
+        except Exception as e:
+            report.update(ok=False, error=str(e))
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        after = db_size(path)
+        report["bytes_before"] = before["file_bytes"] + before["wal_bytes"]
+        report["bytes_after"] = after["file_bytes"] + after["wal_bytes"]
+        TASK_SECONDS.observe(report["seconds"], task=task)
+        TASK_TOTAL.inc(task=task, status="ok" if report["ok"] else "error")
+        with self._lock:
+            self._reports.append(report)
+        return report
+
+    def reports(self, task: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Son raporlar (en yenisi sonda)"""
+        with self._lock:
+            return [r for r in self._reports if task is None or r["task"] == task]
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "databases": [db_size(p) for p in self.paths if os.path.exists(p)],
+            "last": {task: next((r for r in reversed(self.reports(task))), None) for task in self.tasks},
+        }
+
+_scheduler: Optional[MaintenanceScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler(config: Optional[Dict] = None, storage: Optional[Dict] = None) -> MaintenanceScheduler:
+    """Süreç genelindeki zamanlayıcı; dosyalar verilmezse STORAGE_CONFIG'ten"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            config = dict(config or {})
+            if "paths" not in config:
+                config["paths"] = storage_paths(**(storage or {}))
+            _scheduler = MaintenanceScheduler(**config)
+            _scheduler.start()
+        return _scheduler
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from config import MAINTENANCE_CONFIG, STORAGE_CONFIG
+
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else "report"
+    scheduler = MaintenanceScheduler(**dict(MAINTENANCE_CONFIG, paths=storage_paths(**STORAGE_CONFIG)))
+    if command == "report":
+        print(json.dumps(scheduler.status()["databases"], indent=2))
+        return 0
+    if command == "prepare":
+        reports = scheduler.prepare_databases(convert=True)
+        print(json.dumps(reports, indent=2))
+        return 0 if all(r["ok"] for r in reports) else 1
+    tasks = list(scheduler.tasks) if command == "all" else [command]
+    if any(task not in scheduler.tasks for task in tasks):
+        print(f"kullanım: python maintenance.py report|prepare|all|{'|'.join(scheduler.tasks)}", file=sys.stderr)
+        return 2
+    reports = scheduler.prepare_databases()
+    for task in tasks:
+        reports += scheduler.run(task)
+    print(json.dumps(reports, indent=2))
+    return 0 if all(r["ok"] for r in reports) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""
+AppFab - Memoize
+Üretilen app'lerdeki saf veri yükleme/hesaplama fonksiyonlarını AST ile bulur
+ve st.cache_data / st.cache_resource ile sarar
+"""
+
+import ast
+import hashlib
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import metrics
+from fix_context import GENERATED_FILENAME, prepare_preview_code
+
+MEMOIZED_TOTAL = metrics.REGISTRY.counter(
+    "appfab_memoized_functions_total", "Cache'e sarılan fonksiyonlar", ("kind",))
+
+# Preview'da exec namespace'ine eklenen decorator fabrikasının adı
+DECORATOR_NAME = "__appfab_memo__"
+
+# Sonucu çağrıdan çağrıya değişen veya dışarıya yazan çağrılar (cache'lenmez)
+_IMPURE_ROOTS = {"st", "random", "secrets", "uuid", "input", "getpass", "subprocess", "shutil"}
+_IMPURE_ATTRS = {
+    "now", "today", "utcnow", "time", "sleep", "perf_counter", "monotonic",
+    "post", "put", "patch", "delete", "remove", "unlink", "rmdir", "mkdir", "makedirs", "rename",
+    "to_csv", "to_excel", "to_json", "to_parquet", "to_sql", "savefig", "save", "write", "writelines",
+    "send", "commit", "execute", "rerun", "experimental_rerun",
+}
+# Paylaşılabilir kaynak döndüren çağrılar (model, bağlantı, istemci) -> cache_resource
+_RESOURCE_CALLS = {
+    "connect", "create_engine", "pipeline", "from_pretrained", "load_model", "OpenAI", "Anthropic",
+    "MongoClient", "Redis", "Client", "SentenceTransformer", "YOLO", "Groq",
+}
+# Ağdan veri çeken çağrılar -> cache_data(ttl=...)
+_NETWORK_CALLS = {"get", "urlopen", "read_html", "download"}
+
+def _call_name(node: ast.Call) -> Tuple[Optional[str], Optional[str]]:
+    """(kök isim, son isim): pd.read_csv(...) -> ('pd', 'read_csv')"""
+    func = node.func
+    last = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+    while isinstance(func, ast.Attribute):
+        func = func.value
+    while isinstance(func, ast.Call):
+        func = func.func
+        while isinstance(func, ast.Attribute):
+            func = func.value
+    root = func.id if isinstance(func, ast.Name) else None
+    return root, last
+
+def _module_state(tree: ast.Module) -> Set[str]:
+    """Modül seviyesinde atanan değişkenler (widget değerleri vb.); fonksiyon/import hariç"""
+    names = set()
+    for node in tree.body:
+        targets = []
+        if isinstance(node, (ast.Assign, ast.AugAssign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+        elif isinstance(node, (ast.For, ast.With)):
+            targets = [node.target] if isinstance(node, ast.For) else [i.optional_vars for i in node.items if i.optional_vars]
+        for target in targets:
+            names.update(n.id for n in ast.walk(target) if isinstance(n, ast.Name))
+    # Her rerun'da değişmeyen sabitler (BÜYÜK_HARF) serbest
+    return {n for n in names if not n.isupper()}
+
+def _has_open_for_write(node: ast.Call) -> bool:
+    args = list(node.args[1:2]) + [k.value for k in node.keywords if k.arg == "mode"]
+    return any(isinstance(a, ast.Constant) and isinstance(a.value, str) and set(a.value) & set("wax+")
+               for a in args)
+
+def classify_function(func: ast.FunctionDef, module_state: Set[str]) -> Tuple[Optional[str], str]:
+    """('data' | 'resource' | 'network' | None, sebep)"""
+    if func.decorator_list:
+        return None, "decorated"
+    params = {a.arg for a in func.args.args + func.args.kwonlyargs + func.args.posonlyargs}
+    for extra in (func.args.vararg, func.args.kwarg):
+        if extra:
+            params.add(extra.arg)
+
+    local = set(params)
+    has_return = has_work = False
+    kind = "data"
+    for node in ast.walk(func):
+        if node is func:
+            continue
+        if isinstance(node, (ast.Global, ast.Nonlocal, ast.Yield, ast.YieldFrom, ast.Await)):
+            return None, type(node).__name__.lower()
+        if isinstance(node, ast.Return) and node.value is not None:
+            has_return = True
+        if isinstance(node, (ast.For, ast.While, ast.ListComp, ast.DictComp, ast.SetComp, ast.GeneratorExp)):
+            has_work = True
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            local.add(node.id)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            local.add(node.name)
+        if isinstance(node, ast.arg):
+            local.add(node.arg)
+        if isinstance(node, ast.Call):
+            has_work = True
+            root, last = _call_name(node)
+            if root in _IMPURE_ROOTS or last in _IMPURE_ROOTS:
+                return None, f"impure call: {root or last}"
+            if last in _IMPURE_ATTRS and root not in ("pd", "np", "json", "math", "re"):
+                return None, f"impure call: {last}"
+            if last == "open" and _has_open_for_write(node):
+                return None, "writes file"
+            if last in _RESOURCE_CALLS:
+                kind = "resource"
+            elif last in _NETWORK_CALLS and kind == "data" and root in ("requests", "urllib", "httpx", "pd", "yf"):
+                kind = "network"
+    if not has_return:
+        return None, "no return value"
+    if not has_work:
+        return None, "trivial"
+
+    # Global değişken okuyan fonksiyon argümanlarla anahtarlanamaz (widget değeri değişince bayat kalır)
+    # Nesne mutasyonu da dışarı sızar: sadece yerel isimlere attribute/subscript ataması serbest
+    for node in ast.walk(func):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+            if node.id in module_state and node.id not in local:
+                return None, f"reads module state: {node.id}"
+        if isinstance(node, (ast.Attribute, ast.Subscript)) and isinstance(node.ctx, ast.Store):
+            base = node.value
+            while isinstance(base, (ast.Attribute, ast.Subscript)):
+                base = base.value
+            if isinstance(base, ast.Name) and (base.id not in local or base.id in params):
+                return None, f"mutates {base.id}"
+    return kind, "ok"
+
+def find_cacheable(code: str) -> List[Dict[str, Any]]:
+    """Modül seviyesindeki cache'lenebilir fonksiyonlar: [{'name', 'kind', 'lineno'}]"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    if not _imports_streamlit_as_st(tree):
+        return []
+    state = _module_state(tree)
+    found = []
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef):
+            kind, _reason = classify_function(node, state)
+            if kind:
+                found.append({"name": node.name, "kind": kind, "lineno": node.lineno})
+    return found
+
+def _imports_streamlit_as_st(tree: ast.Module) -> bool:
+    return any(isinstance(n, ast.Import) and any(a.name == "streamlit" and a.asname == "st" for a in n.names)
+               for n in tree.body)
+
+def decorator_source(kind: str, network_ttl: int = 600) -> str:
+    """İndirilen koda eklenen decorator"""
+    if kind == "resource":
+        return "@st.cache_resource(show_spinner=False)"
+    if kind == "network":
+        return f"@st.cache_data(show_spinner=False, ttl={network_ttl})"
+    return "@st.cache_data(show_spinner=False)"
+
+def memoize_source(code: str, network_ttl: int = 600) -> Tuple[str, List[Dict[str, Any]]]:
+    """İndirme için: decorator satırlarını ekle (yorumlar ve biçim korunur)"""
+    found = find_cacheable(code)
+    if not found:
+        return code, []
+    lines = code.split("\n")
+    for item in sorted(found, key=lambda f: -f["lineno"]):
+        lines.insert(item["lineno"] - 1, decorator_source(item["kind"], network_ttl))
+    return "\n".join(lines), found
+
+# =============================================================================
+# PREVIEW
+# =============================================================================
+
+def preview_decorator(kind: str, tag: str, max_entries: int = 32, network_ttl: int = 600):
+    """
+    Preview'da kullanılan decorator: qualname'e kod özeti eklenir, böylece aynı isimli
+    fonksiyonlar farklı app'ler arasında aynı cache'i paylaşmaz (hepsi __main__ modülünde)
+    """
+    import streamlit as st
+
+    def decorate(func):
+        func.__qualname__ = f"{func.__qualname__}@{tag}"
+        if kind == "resource":
+            return st.cache_resource(show_spinner=False, max_entries=max_entries)(func)
+        ttl = network_ttl if kind == "network" else None
+        return st.cache_data(show_spinner=False, max_entries=max_entries, ttl=ttl)(func)
+    return decorate
+
+@lru_cache(maxsize=128)
+def compile_preview(code: str, memoize: bool = True) -> Tuple[Any, Tuple[Tuple[str, str], ...]]:
+    """
+    Preview için derle: (code object, ((fonksiyon, tür), ...)).
+    Decorator'lar AST'ye eklenir, kaynak değişmez; traceback satır numaraları korunur.
+    """
+    source = prepare_preview_code(code)
+    found = find_cacheable(source) if memoize else []
+    if not found:
+        return compile(source, GENERATED_FILENAME, "exec"), ()
+    tree = ast.parse(source)
+    tag = hashlib.sha1(code.encode("utf-8")).hexdigest()[:10]
+    kinds = {item["name"]: item["kind"] for item in found}
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name in kinds:
+            decorator = ast.Call(
+                func=ast.Name(id=DECORATOR_NAME, ctx=ast.Load()),
+                args=[ast.Constant(kinds[node.name]), ast.Constant(tag)],
+                keywords=[])
+            node.decorator_list.append(ast.copy_location(decorator, node))
+            MEMOIZED_TOTAL.inc(kind=kinds[node.name])
+    ast.fix_missing_locations(tree)
+    return compile(tree, GENERATED_FILENAME, "exec"), tuple((f["name"], f["kind"]) for f in found)
@@ -0,0 +1,305 @@
+"""
+AppFab - Memory
+Süreç RSS'i ve oturum başına bellek (payload + preview namespace) takibi, isteğe bağlı
+tracemalloc snapshot/fark, yumuşak/sert RSS bütçeleri: arka plan thread'i aşımda boştaki
+oturumları bırakır ve preview namespace'lerini temizler. Raporlar admin panelinde veya diskte.
+"""
+
+import gc
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+
+RSS_BYTES = metrics.REGISTRY.gauge(
+    "appfab_process_rss_bytes", "Sürecin yerleşik belleği (RSS)")
+SESSIONS = metrics.REGISTRY.gauge(
+    "appfab_memory_sessions", "Bellek takibindeki oturumlar")
+EVICTIONS_TOTAL = metrics.REGISTRY.counter(
+    "appfab_memory_evictions_total", "Bütçe aşımında bırakılan oturumlar", ("level",))
+BUDGET_TOTAL = metrics.REGISTRY.counter(
+    "appfab_memory_budget_exceeded_total", "RSS bütçesi aşımları", ("level",))
+
+OK, SOFT, HARD = "ok", "soft", "hard"
+
+MB = 1024 * 1024
+
+def process_rss() -> int:
+    """Şu anki RSS (bayt); /proc yoksa tepe değer (ru_maxrss)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _malloc_trim():
+    """glibc'de serbest bırakılan heap'i işletim sistemine geri ver (yoksa sessizce geç)"""
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+def estimate_size(value: Any) -> int:
+    """Yaklaşık boyut: DataFrame/ndarray için veri boyutu, diğerleri için sys.getsizeof"""
+    try:
+        usage = getattr(value, "memory_usage", None)
+        if callable(usage) and hasattr(value, "columns"):
+            return int(usage(deep=True).sum())
+        nbytes = getattr(value, "nbytes", None)
+        if isinstance(nbytes, int):
+            return nbytes
+        return sys.getsizeof(value)
+    except Exception:
+        return 0
+
+def namespace_size(namespace: Dict[str, Any]) -> int:
+    """exec namespace'indeki global'lerin yaklaşık boyutu (modüller ve __builtins__ hariç)"""
+    return sum(estimate_size(v) for k, v in list(namespace.items())
+               if k != "__builtins__" and type(v).__name__ != "module")
+
+class _Session:
+    __slots__ = ("last_seen", "namespace")
+
+    def __init__(self):
+        self.last_seen = time.monotonic()
+        self.namespace: Optional[Dict[str, Any]] = None
+
+class MemoryMonitor:
+    """
+    Her rerun'da touch(sid) çağrılır (sadece zaman damgası); RSS arka plan thread'inde
+    check_interval'da bir ölçülür. soft_rss_mb aşılırsa soft_idle sn, hard_rss_mb aşılırsa
+    hard_idle sn boştaki oturumlar bırakılır (payload referansları + preview namespace'i
+    temizlenir), ardından gc; sert aşımda on_hard da çağrılır (ör. st.cache_data.clear).
+    """
+
+    def __init__(self, soft_rss_mb: float = 0, hard_rss_mb: float = 0, soft_idle: float = 300.0,
+                 hard_idle: float = 30.0, check_interval: float = 10.0, output_dir: str = "reports",
+                 tracemalloc_frames: int = 0, keep_snapshots: int = 5, payloads=None,
+                 on_hard: Optional[Callable[[], None]] = None):
+        self.soft = int(soft_rss_mb * MB)
+        self.hard = int(hard_rss_mb * MB)
+        self.soft_idle = soft_idle
+        self.hard_idle = hard_idle
+        self.check_interval = check_interval
+        self.output_dir = output_dir
+        self.keep_snapshots = keep_snapshots
+        self._payloads = payloads
+        self._on_hard = on_hard
+        self._sessions: Dict[str, _Session] = {}
+        self._snapshots: List[Dict[str, Any]] = []
+        self._events: List[Dict[str, Any]] = []
+        self._last_hard_report = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if tracemalloc_frames:
+            self.start_tracing(tracemalloc_frames)
+
+    def start(self):
+        """Bütçe kontrolünü arka planda başlat (istek yolunda gc/malloc_trim çalışmaz)"""
+        if self._thread is not None or self.check_interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._loop, name="appfab-memory", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception:
+                # İzleyici thread'i ölmesin; sonraki turda yeniden denenir
+                pass
+
+    # -------------------------------------------------------------------------
+    # Oturumlar
+    # -------------------------------------------------------------------------
+
+    def touch(self, session_id: str):
+        """Oturumu aktif say"""
+        with self._lock:
+            self._sessions.setdefault(session_id, _Session()).last_seen = time.monotonic()
+            SESSIONS.set(len(self._sessions))
+
+    def track_namespace(self, session_id: str, namespace: Dict[str, Any]):
+        """Oturumun son preview exec namespace'i (bütçe aşımında temizlenir)"""
+        with self._lock:
+            self._sessions.setdefault(session_id, _Session()).namespace = namespace
+
+    def release(self, session_id: str) -> bool:
+        """Oturumu bırak: preview namespace'i temizle, payload referanslarını bırak"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            SESSIONS.set(len(self._sessions))
+        if self._payloads is not None:
+            self._payloads.release(session_id)
+        if session is None:
+            return False
+        if session.namespace is not None:
+            # Üretilen koddaki fonksiyonlar __globals__ ile namespace'i tutar; boşaltınca
+            # dışarıda kalan bir referans (callback, cache) büyük global'leri tutamaz
+            session.namespace.clear()
+        return True
+
+    def evict_idle(self, idle: float, level: str = "manual") -> int:
+        """idle sn'den uzun süredir görülmeyen oturumları bırak"""
+        limit = time.monotonic() - idle
+        with self._lock:
+            sids = [sid for sid, s in self._sessions.items() if s.last_seen < limit]
+        evicted = sum(1 for sid in sids if self.release(sid))
+        if evicted:
+            EVICTIONS_TOTAL.inc(evicted, level=level)
+        return evicted
+
+    # -------------------------------------------------------------------------
+    # Bütçe
+    # -------------------------------------------------------------------------
+
+    def check(self) -> str:
+        """RSS'i ölç, bütçe aşıldıysa boştaki oturumları bırak; seviye döner"""
+        rss = process_rss()
+        RSS_BYTES.set(rss)
+        if self.hard and rss > self.hard:
+            level, idle = HARD, self.hard_idle
+        elif self.soft and rss > self.soft:
+            level, idle = SOFT, self.soft_idle
+        else:
+            return OK
+        BUDGET_TOTAL.inc(level=level)
+        evicted = self.evict_idle(idle, level)
+        if level == HARD and self._on_hard is not None:
+            self._on_hard()
+        gc.collect()
+        _malloc_trim()
+        after = process_rss()
+        RSS_BYTES.set(after)
+        event = {"time": time.time(), "level": level, "rss_before": rss, "rss_after": after, "evicted": evicted}
+        with self._lock:
+            self._events = (self._events + [event])[-50:]
+        if level == HARD and time.monotonic() - self._last_hard_report >= 300:
+            # Sert aşım sürerken her kontrolde değil, 5 dk'da bir rapor
+            self._last_hard_report = time.monotonic()
+            self.write_report(f"hard-{int(event['time'])}")
+        return level
+
+    # -------------------------------------------------------------------------
+    # tracemalloc
+    # -------------------------------------------------------------------------
+
+    def start_tracing(self, frames: int = 25):
+        """Tahsis izlemeyi başlat (açıkken bellek ve CPU maliyeti vardır)"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop_tracing(self):
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+
+    def snapshot(self, label: str = "") -> Dict[str, Any]:
+        """tracemalloc snapshot'ı al (izleme kapalıysa başlatır); son keep_snapshots tutulur"""
+        self.start_tracing()
+        snap = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+        entry = {"label": label or time.strftime("%H:%M:%S"), "time": time.time(), "snapshot": snap,
+                 "traced_bytes": tracemalloc.get_traced_memory()[0], "rss": process_rss()}
+        with self._lock:
+            self._snapshots = (self._snapshots + [entry])[-self.keep_snapshots:]
+        return {k: v for k, v in entry.items() if k != "snapshot"}
+
+    def top(self, limit: int = 20, key_type: str = "lineno") -> List[Dict[str, Any]]:
+        """Son snapshot'ta en çok bellek tutan tahsis yerleri"""
+        with self._lock:
+            if not self._snapshots:
+                return []
+            snap = self._snapshots[-1]["snapshot"]
+        return [{"site": str(stat.traceback), "size": stat.size, "count": stat.count}
+                for stat in snap.statistics(key_type)[:limit]]
+
+    def diff(self, older: int = -2, newer: int = -1, limit: int = 20,
+             key_type: str = "lineno") -> List[Dict[str, Any]]:
+        """İki snapshot arasındaki fark, tahsis yerine göre (en çok büyüyen önce)"""
+        with self._lock:
+            if len(self._snapshots) < 2:
+                return []
+            a, b = self._snapshots[older]["snapshot"], self._snapshots[newer]["snapshot"]
+        return [{"site": str(stat.traceback), "size_diff": stat.size_diff, "size": stat.size,
+                 "count_diff": stat.count_diff}
+                for stat in b.compare_to(a, key_type)[:limit]]
+
+    # -------------------------------------------------------------------------
+    # Rapor
+    # -------------------------------------------------------------------------
+
+    def sessions(self) -> List[Dict[str, Any]]:
+        """Oturum başına yaklaşık bellek (büyükten küçüğe)"""
+        now = time.monotonic()
+        with self._lock:
+            items = list(self._sessions.items())
+        out = []
+        for sid, session in items:
+            payload_bytes = self._payloads.session_bytes(sid) if self._payloads is not None else 0
+            ns_bytes = namespace_size(session.namespace) if session.namespace else 0
+            out.append({"session": sid, "idle_s": int(now - session.last_seen),
+                        "payload_bytes": payload_bytes, "namespace_bytes": ns_bytes,
+                        "total_bytes": payload_bytes + ns_bytes})
+        return sorted(out, key=lambda s: -s["total_bytes"])
+
+    def report(self, limit: int = 20) -> Dict[str, Any]:
+        with self._lock:
+            snapshots = [{k: v for k, v in s.items() if k != "snapshot"} for s in self._snapshots]
+            events = list(self._events)
+        traced, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        return {
+            "time": time.time(),
+            "rss": process_rss(),
+            "soft_budget": self.soft,
+            "hard_budget": self.hard,
+            "gc_objects": len(gc.get_objects()),
+            "sessions": self.sessions()[:limit],
+            "tracing": tracemalloc.is_tracing(),
+            "traced_bytes": traced,
+            "traced_peak": peak,
+            "snapshots": snapshots,
+            "top": self.top(limit),
+            "diff": self.diff(limit=limit),
+            "events": events,
+        }
+
+    def write_report(self, name: Optional[str] = None) -> str:
+        """Raporu output_dir altına JSON olarak yaz; dosya yolu"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"memory-{name or time.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        return path
+
+_monitor: Optional[MemoryMonitor] = None
+_monitor_lock = threading.Lock()
+
+def get_monitor(config: Optional[Dict] = None, payloads=None,
+                on_hard: Optional[Callable[[], None]] = None) -> MemoryMonitor:
+    """Süreç genelindeki izleyici (tüm oturumlar paylaşır); ilk çağrıda thread'i başlar"""
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = MemoryMonitor(payloads=payloads, on_hard=on_hard, **(config or {}))
+            _monitor.start()
+        return _monitor
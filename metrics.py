@@ -0,0 +1,314 @@
+"""
+AppFab - Metrics
+Hafif metrik katmanı (Prometheus text formatı)
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Saniye cinsinden histogram sınırları (DB sorgusu ~ms, LLM çağrısı ~dakika)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+ENABLED = os.environ.get("APPFAB_METRICS", "1") != "0"
+
+# =============================================================================
+# METRIC TYPES
+# =============================================================================
+
+def _escape(value: Any) -> str:
+    """Label değerini Prometheus formatına kaçışla"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    """Label seti -> {a="1",b="2"}"""
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    """Sayıyı Prometheus formatına çevir"""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    """Ortak metrik tabanı"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    """Sadece artan sayaç"""
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Gauge(Counter):
+    """Artıp azalabilen değer"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    """Gecikme dağılımı (sabit bucket'lar)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket sayıları..., +Inf], toplam, adet
+        self._series: Dict[Tuple, List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = [(k, (list(s[0]), s[1], s[2])) for k, s in self._series.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+# =============================================================================
+# REGISTRY
+# =============================================================================
+
+class Registry:
+    """Süreç genelindeki metrik kayıt defteri"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help_text: str, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+OPERATION_SECONDS = REGISTRY.histogram(
+    "appfab_operation_duration_seconds", "Operasyon süresi (saniye)", ("operation", "provider"))
+OPERATION_TOTAL = REGISTRY.counter(
+    "appfab_operation_total", "Operasyon sayısı", ("operation", "provider", "status"))
+OPERATION_ERRORS = REGISTRY.counter(
+    "appfab_operation_errors_total", "Hatalı operasyon sayısı", ("operation", "provider"))
+
+# =============================================================================
+# INSTRUMENTATION
+# =============================================================================
+
+class Span:
+    """Tek bir ölçümün durumu"""
+
+    __slots__ = ("failed",)
+
+    def __init__(self):
+        self.failed = False
+
+    def fail(self):
+        self.failed = True
+
+def record(operation: str, provider: str, seconds: float, ok: bool = True):
+    """Tek bir ölçümü kaydet"""
+    if not ENABLED:
+        return
+    OPERATION_SECONDS.observe(seconds, operation=operation, provider=provider)
+    OPERATION_TOTAL.inc(operation=operation, provider=provider, status="ok" if ok else "error")
+    if not ok:
+        OPERATION_ERRORS.inc(operation=operation, provider=provider)
+
+@contextmanager
+def timed(operation: str, provider: str = ""):
+    """Bloğun süresini ölç; exception veya span.fail() hata sayılır"""
+    span = Span()
+    start = time.perf_counter()
+    try:
+        yield span
+    except BaseException:
+        span.failed = True
+        raise
+    finally:
+        record(operation, provider, time.perf_counter() - start, not span.failed)
+
+def returns_error(result: Any) -> bool:
+    """(sonuç, hata[, ...]) döndüren fonksiyonlar için hata kontrolü"""
+    return isinstance(result, tuple) and len(result) >= 2 and bool(result[1])
+
+def instrument(operation: str, provider: str = "",
+               is_error: Optional[Callable[[Any], bool]] = None):
+    """Fonksiyonu ölçen decorator"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(operation, provider) as span:
+                result = func(*args, **kwargs)
+                if is_error is not None and is_error(result):
+                    span.fail()
+                return result
+        return wrapper
+    return decorator
+
+def instrument_class(prefix: str, provider: str = ""):
+    """Sınıftaki tüm staticmethod'ları ölç (ör. db.get_app)"""
+    def decorator(cls):
+        for name, attr in list(vars(cls).items()):
+            if isinstance(attr, staticmethod) and not name.startswith("_"):
+                wrapped = instrument(f"{prefix}.{name}", provider)(attr.__func__)
+                setattr(cls, name, staticmethod(wrapped))
+        return cls
+    return decorator
+
+# =============================================================================
+# EXPORT
+# =============================================================================
+
+def render_prometheus() -> str:
+    """Tüm metrikleri Prometheus text formatında döndür"""
+    return REGISTRY.render()
+
+def write_prometheus(path: str):
+    """Metrikleri dosyaya atomik yaz (node_exporter textfile uyumlu)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """/metrics endpoint'ini arka planda başlat"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="appfab-metrics", daemon=True).start()
+    return server
+
+def start_file_exporter(path: str, interval: float = 15.0):
+    """Metrikleri periyodik olarak dosyaya yaz"""
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                write_prometheus(path)
+            except OSError:
+                pass
+    threading.Thread(target=loop, name="appfab-metrics-file", daemon=True).start()
+
+def start_exporters(config: Dict[str, Any]):
+    """Config'e göre exporter'ları süreç başına bir kez başlat"""
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started or not ENABLED:
+            return
+        _exporters_started = True
+    if config.get("port"):
+        try:
+            start_metrics_server(int(config["port"]), config.get("host", "127.0.0.1"))
+        except OSError:
+            pass  # Port başka bir süreçte açık
+    if config.get("file"):
+        start_file_exporter(config["file"], config.get("interval", 15.0))
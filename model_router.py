@@ -0,0 +1,165 @@
+"""
+AppFab - Model Router
+Gözlenen gecikme/başarı istatistiklerine göre model seçimi
+"""
+
+import ast
+import re
+import threading
+from typing import Dict, Iterable, List, Optional
+
+# Karmaşıklığı artıran istek işaretleri
+_COMPLEX_HINTS = (
+    "yukle", "upload", "excel", "pdf", "api", "grafik", "chart", "analiz", "oyun",
+    "game", "veritaban", "database", "chat", "yapay zeka", "scrap", "harita", "map",
+    "resim", "foto", "image", "model", "tahmin", "login", "giris",
+)
+
+def _normalize(text: str) -> str:
+    table = str.maketrans("şçöğüıİŞÇÖĞÜ", "scoguiiscogu")
+    return text.translate(table).lower()
+
+def prompt_complexity(prompt: str) -> float:
+    """Üretim isteğinin 0..1 arası karmaşıklık tahmini"""
+    text = _normalize(prompt)
+    words = len(text.split())
+    hints = sum(1 for hint in _COMPLEX_HINTS if hint in text)
+    clauses = len(re.findall(r"[,;]|\bve\b|\bayrica\b|\bsonra\b", text))
+    score = min(words / 80, 1.0) * 0.4 + min(hints / 4, 1.0) * 0.4 + min(clauses / 6, 1.0) * 0.2
+    return round(min(score, 1.0), 3)
+
+def fix_complexity(code: str, error_message: str) -> float:
+    """Düzeltme isteğinin karmaşıklığı: hata ne kadar yerel ise o kadar basit"""
+    total_lines = max(len(code.splitlines()), 1)
+    error_lines = {int(n) for n in re.findall(r'File "<[^"]+>", line (\d+)', error_message)}
+    try:
+        ast.parse(code)
+        syntax_ok = True
+    except SyntaxError:
+        syntax_ok = False
+    if error_lines:
+        # Tek satırlık hata -> küçük diff beklenir
+        spread = (max(error_lines) - min(error_lines) + 1) / total_lines
+        locality = min(len(error_lines) / 5, 1.0) * 0.5 + min(spread, 1.0) * 0.5
+    else:
+        locality = 0.5
+    size = min(total_lines / 400, 1.0)
+    score = locality * 0.6 + size * 0.3 + (0.0 if syntax_ok else 0.1)
+    return round(min(score, 1.0), 3)
+
+class ModelStats:
+    """Tek model için EWMA gecikme ve başarı oranı"""
+
+    __slots__ = ("calls", "successes", "latency", "_alpha")
+
+    def __init__(self, alpha: float):
+        self.calls = 0
+        self.successes = 0
+        self.latency: Optional[float] = None
+        self._alpha = alpha
+
+    def record(self, latency: float, ok: bool):
+        self.calls += 1
+        self.successes += int(ok)
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self._alpha * (latency - self.latency)
+
+    def success_rate(self, prior: float, weight: float) -> float:
+        # Az gözlemde önsel değere yakın kal
+        return (self.successes + prior * weight) / (self.calls + weight)
+
+class ModelRouter:
+    """Süreç genelinde paylaşılan model seçici"""
+
+    def __init__(self, models: Dict[str, Dict], prior_success: float = 0.8,
+                 prior_weight: float = 5.0, ewma_alpha: float = 0.2):
+        self.models = models
+        self.prior_success = prior_success
+        self.prior_weight = prior_weight
+        self._alpha = ewma_alpha
+        self._stats: Dict[str, ModelStats] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, model: str) -> ModelStats:
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = ModelStats(self._alpha)
+        return stats
+
+    def record(self, model: str, latency: float, ok: bool):
+        """Çağrı sonucunu istatistiklere ekle (ok = doğrulamadan geçti)"""
+        with self._lock:
+            self._get(model).record(latency, ok)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Model başına güncel istatistikler"""
+        with self._lock:
+            return {
+                name: {
+                    "calls": s.calls,
+                    "success_rate": round(s.success_rate(self.prior_success, self.prior_weight), 3),
+                    "latency": s.latency,
+                }
+                for name, s in self._stats.items()
+            }
+
+    def _score(self, model: str, complexity: float, candidates: List[str]) -> float:
+        stats = self._get(model)
+        success = stats.success_rate(self.prior_success, self.prior_weight)
+
+        def cost(name):
+            info = self.models[name]
+            return info.get("input_cost", 0) + info.get("output_cost", 0)
+
+        max_cost = max(cost(n) for n in candidates) or 1.0
+        latencies = [self._get(n).latency for n in candidates if self._get(n).latency]
+        # Gecikmesi henüz bilinmeyen model ortalama kabul edilir
+        mean_latency = sum(latencies) / len(latencies) if latencies else 1.0
+        max_latency = max(latencies) if latencies else 1.0
+        latency = stats.latency if stats.latency is not None else mean_latency
+        penalty = (cost(model) / max_cost + latency / max_latency) / 2 + 0.05
+        # Başarıya ulaşmanın beklenen bedeli; karmaşık istekte başarısızlık daha pahalı
+        return -penalty / success ** (1 + 2 * complexity)
+
+    def plan(self, complexity: float, providers: Iterable[str]) -> List[str]:
+        """Denenecek modeller: önce seçilen, sonra başarıya göre yükseltme sırası"""
+        providers = set(providers)
+        candidates = [n for n, info in self.models.items() if info.get("provider") in providers]
+        if not candidates:
+            return []
+        with self._lock:
+            chosen = max(candidates, key=lambda n: self._score(n, complexity, candidates))
+            rest = sorted(
+                (n for n in candidates if n != chosen),
+                key=lambda n: self._get(n).success_rate(self.prior_success, self.prior_weight),
+                reverse=True,
+            )
+        return [chosen] + rest
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+def get_router(config: Dict) -> ModelRouter:
+    """Süreç genelindeki router (oturumlar arası paylaşılır)"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter(
+                config["models"],
+                prior_success=config.get("prior_success", 0.8),
+                prior_weight=config.get("prior_weight", 5.0),
+                ewma_alpha=config.get("ewma_alpha", 0.2),
+            )
+        return _router
+
+def is_valid_code(code: Optional[str]) -> bool:
+    """Yerel doğrulama: boş değil ve parse ediliyor"""
+    if not code or ("import streamlit" not in code and "st." not in code):
+        return False
+    try:
+        ast.parse(code)
+    except SyntaxError:
+        return False
+    return True
@@ -0,0 +1,316 @@
+"""
+AppFab - Payload Store
+Büyük oturum verileri (üretilen kod, traceback, prompt) için paylaşılan depo:
+session_state sadece ID tutar, veri bayt sınırlı LRU'da durur; LRU'dan taşanlar arka plan
+thread'inde kendi SQLite dosyasına yazılır (istek yolunda SQLite yazması yok)
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+import metrics
+
+STORE_BYTES = metrics.REGISTRY.gauge(
+    "appfab_payload_memory_bytes", "Bellekteki payload boyutu")
+STORE_SESSIONS = metrics.REGISTRY.gauge(
+    "appfab_payload_sessions", "Payload tutan oturum sayısı")
+LOOKUPS_TOTAL = metrics.REGISTRY.counter(
+    "appfab_payload_lookups_total", "Payload okumaları", ("source",))
+EVICTIONS_TOTAL = metrics.REGISTRY.counter(
+    "appfab_payload_evictions_total", "Bellekten atılan payload'lar", ("reason",))
+SPILLED_TOTAL = metrics.REGISTRY.counter(
+    "appfab_payload_spilled_total", "LRU'dan taşıp SQLite'a yazılan payload'lar")
+
+PAYLOADS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS payloads (
+        payload_id TEXT PRIMARY KEY,
+        kind TEXT,
+        data BLOB,
+        size INTEGER,
+        created_at REAL
+    )
+'''
+
+def _encode(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+class _Session:
+    __slots__ = ("payloads", "last_seen")
+
+    def __init__(self):
+        self.payloads: Dict[str, str] = {}  # isim -> payload_id
+        self.last_seen = time.monotonic()
+
+class PayloadStore:
+    """
+    İçerik adresli (sha1) payload deposu.
+    Bellek: max_bytes ile sınırlı LRU. SQLite (write-behind): LRU'dan taşan veya yeni sürümüyle
+    değiştirilen payload'lar yazma kuyruğuna girer, arka plan thread'i flush_interval'da bir
+    toplu yazar; yazılana kadar kuyruktan okunur. db_path None ise sadece bellek.
+    Oturum başına referans ve bayt hesabı; idle_timeout boyunca görülmeyen oturumlar bırakılır.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_bytes: int = 64 * 1024 * 1024,
+                 idle_timeout: float = 1800.0, sweep_interval: float = 60.0,
+                 flush_interval: float = 2.0, db_ttl_days: float = 7.0):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self.flush_interval = flush_interval
+        self.db_ttl = db_ttl_days * 86400
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        # Bellekte olup diskte olmayanlar: payload_id -> isim
+        self._dirty: Dict[str, str] = {}
+        # Yazılmayı bekleyenler: payload_id -> (isim, veri)
+        self._pending: Dict[str, Tuple[str, bytes]] = {}
+        self._sessions: Dict[str, _Session] = {}
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if db_path:
+            conn = self._connect()
+            conn.execute(PAYLOADS_TABLE_SQL)
+            conn.commit()
+            conn.close()
+            self._thread = threading.Thread(target=self._writer, name="appfab-payload-writer", daemon=True)
+            self._thread.start()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, check_same_thread=False)
+
+    # -------------------------------------------------------------------------
+    # Bellek LRU
+    # -------------------------------------------------------------------------
+
+    def _remember(self, payload_id: str, data: bytes, name: Optional[str] = None):
+        """Belleğe al; name verilirse diskte yok sayılır (taşarsa yazılır)"""
+        if payload_id in self._memory:
+            self._memory.move_to_end(payload_id)
+            if name is not None:
+                # Tekrar kaydedilen içerik taşarsa yeniden yazılır (diskteki yaşı yenilenir)
+                self._dirty.setdefault(payload_id, name)
+            return
+        if len(data) > self.max_bytes:
+            if name is not None:
+                self._spill(payload_id, name, data)
+            return
+        self._memory[payload_id] = data
+        self._bytes += len(data)
+        if name is not None:
+            self._dirty[payload_id] = name
+        while self._bytes > self.max_bytes:
+            old_id, old = self._memory.popitem(last=False)
+            self._bytes -= len(old)
+            old_name = self._dirty.pop(old_id, None)
+            if old_name is not None:
+                self._spill(old_id, old_name, old)
+            EVICTIONS_TOTAL.inc(reason="lru")
+        STORE_BYTES.set(self._bytes)
+
+    def _spill(self, payload_id: str, name: str, data: bytes):
+        """Yazma kuyruğuna ekle (kilit tutulurken çağrılır)"""
+        if self.db_path:
+            self._pending[payload_id] = (name, data)
+            self._wake.set()
+
+    def _forget(self, payload_ids: Set[str], reason: str):
+        for payload_id in payload_ids:
+            data = self._memory.pop(payload_id, None)
+            name = self._dirty.pop(payload_id, None)
+            if data is not None:
+                self._bytes -= len(data)
+                EVICTIONS_TOTAL.inc(reason=reason)
+                # Değiştirilen eski sürüm diskte kalır; bırakılan oturumunkine erişen olmaz
+                if reason == "replace" and name is not None:
+                    self._spill(payload_id, name, data)
+        STORE_BYTES.set(self._bytes)
+
+    # -------------------------------------------------------------------------
+    # API
+    # -------------------------------------------------------------------------
+
+    def put(self, session_id: str, name: str, value: Any) -> Optional[str]:
+        """Oturumun `name` verisini kaydet, payload_id döndür (None -> referansı sil)"""
+        if value is None:
+            self.release(session_id, name)
+            return None
+        data = _encode(value)
+        payload_id = hashlib.sha1(data).hexdigest()
+        with self._lock:
+            self._remember(payload_id, data, name)
+            session = self._sessions.setdefault(session_id, _Session())
+            previous = session.payloads.get(name)
+            session.payloads[name] = payload_id
+            session.last_seen = time.monotonic()
+            if previous and previous != payload_id:
+                # Her düzeltme denemesi kodu değiştirir; eski sürüm sadece SQLite'ta kalır
+                self._forget({previous} - self._referenced(), "replace")
+            STORE_SESSIONS.set(len(self._sessions))
+        self._maybe_sweep()
+        return payload_id
+
+    def get(self, payload_id: Optional[str]) -> Any:
+        """Payload'ı bellekten, yoksa SQLite'tan oku"""
+        if not payload_id:
+            return None
+        with self._lock:
+            data = self._memory.get(payload_id)
+            if data is not None:
+                self._memory.move_to_end(payload_id)
+            else:
+                pending = self._pending.get(payload_id)
+                data = pending[1] if pending else None
+        if data is not None:
+            LOOKUPS_TOTAL.inc(source="memory")
+            return json.loads(data)
+        if not self.db_path:
+            LOOKUPS_TOTAL.inc(source="missing")
+            return None
+        conn = self._connect()
+        row = conn.execute("SELECT data FROM payloads WHERE payload_id = ?", (payload_id,)).fetchone()
+        conn.close()
+        if row is None:
+            LOOKUPS_TOTAL.inc(source="missing")
+            return None
+        LOOKUPS_TOTAL.inc(source="db")
+        data = zlib.decompress(row[0])
+        with self._lock:
+            self._remember(payload_id, data)
+        return json.loads(data)
+
+    def touch(self, session_id: str):
+        """Oturumu aktif say (her rerun'da çağrılır)"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_seen = time.monotonic()
+        self._maybe_sweep()
+
+    def release(self, session_id: str, name: Optional[str] = None):
+        """Oturumun bir (veya tüm) referansını bırak; başka oturum kullanmıyorsa bellekten at"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            if name is None:
+                dropped = set(session.payloads.values())
+                del self._sessions[session_id]
+            else:
+                payload_id = session.payloads.pop(name, None)
+                dropped = {payload_id} if payload_id else set()
+            self._forget(dropped - self._referenced(), "release")
+            STORE_SESSIONS.set(len(self._sessions))
+
+    def _referenced(self) -> Set[str]:
+        return {pid for s in self._sessions.values() for pid in s.payloads.values()}
+
+    # -------------------------------------------------------------------------
+    # Bakım
+    # -------------------------------------------------------------------------
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        self.evict_idle()
+
+    def evict_idle(self, idle_timeout: Optional[float] = None) -> int:
+        """idle_timeout sn görülmeyen oturumları bırak; bırakılan oturum sayısı"""
+        limit = time.monotonic() - (self.idle_timeout if idle_timeout is None else idle_timeout)
+        with self._lock:
+            idle = [sid for sid, s in self._sessions.items() if s.last_seen < limit]
+            dropped = set()
+            for sid in idle:
+                dropped.update(self._sessions.pop(sid).payloads.values())
+            self._forget(dropped - self._referenced(), "idle")
+            STORE_SESSIONS.set(len(self._sessions))
+        return len(idle)
+
+    def flush(self) -> int:
+        """Yazma kuyruğunu tek transaction'da SQLite'a yaz; yazılan payload sayısı"""
+        with self._lock:
+            batch = dict(self._pending)
+        if not batch:
+            return 0
+        now = time.time()
+        conn = self._connect()
+        try:
+            # Aynı içerik tekrar yazılırsa yaşı yenilenir (TTL temizliğinde silinmesin)
+            conn.executemany('''
+                INSERT INTO payloads VALUES (?,?,?,?,?)
+                ON CONFLICT(payload_id) DO UPDATE SET created_at = excluded.created_at
+            ''', [(pid, name, zlib.compress(data), len(data), now) for pid, (name, data) in batch.items()])
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            for pid, entry in batch.items():
+                if self._pending.get(pid) is entry:
+                    del self._pending[pid]
+        SPILLED_TOTAL.inc(len(batch))
+        return len(batch)
+
+    def _writer(self):
+        last_cleanup = 0.0
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.monotonic() - last_cleanup >= self.sweep_interval:
+                    last_cleanup = time.monotonic()
+                    # Hiçbir oturumun erişemeyeceği eski kopyalar
+                    conn = self._connect()
+                    conn.execute("DELETE FROM payloads WHERE created_at < ?", (time.time() - self.db_ttl,))
+                    conn.commit()
+                    conn.close()
+            except sqlite3.Error:
+                # Kuyruk korunur, sonraki turda tekrar denenir
+                pass
+
+    def session_bytes(self, session_id: str) -> int:
+        """Oturumun referans verdiği payload'ların toplam boyutu"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return 0
+            return sum(len(self._memory.get(pid, b"")) for pid in set(session.payloads.values()))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = {sid: sum(len(self._memory.get(pid, b"")) for pid in set(s.payloads.values()))
+                        for sid, s in self._sessions.items()}
+            return {
+                "memory_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "payloads": len(self._memory),
+                "pending_writes": len(self._pending),
+                "sessions": len(self._sessions),
+                "largest_sessions": sorted(sessions.items(), key=lambda kv: -kv[1])[:10],
+            }
+
+_store: Optional[PayloadStore] = None
+_store_lock = threading.Lock()
+
+def get_store(config: Optional[Dict] = None) -> PayloadStore:
+    """Süreç genelindeki depo (tüm oturumlar paylaşır); db_path yoksa STORAGE_CONFIG'ten"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            config = dict(config or {})
+            if config.get("db_path") is None:
+                from config import STORAGE_CONFIG
+                from storage import payload_path
+                config["db_path"] = payload_path(**STORAGE_CONFIG)
+            _store = PayloadStore(**config)
+        return _store
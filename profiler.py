@@ -0,0 +1,182 @@
+"""
+AppFab - Profiler
+İsteğe bağlı, tek script çalıştırmalık örnekleyici profiler: admin ?profile=1 ile veya
+config ile açılır; çıktı collapsed-stack (flamegraph.pl / speedscope) ve speedscope JSON.
+Kapalıyken maliyeti birkaç karşılaştırmadır: thread başlatılmaz, trace/profile hook'u kurulmaz.
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+
+PROFILES_TOTAL = metrics.REGISTRY.counter(
+    "appfab_profiles_total", "Yazılan profiller", ("reason",))
+
+Frame = Tuple[str, str, int]  # (fonksiyon, dosya, satır)
+
+def _stack(frame, stop=None) -> Tuple[Frame, ...]:
+    """Kökten yaprağa çerçeveler; stop (script modülü) görülünce onun üstü atılır"""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append((code.co_name, code.co_filename, code.co_firstlineno))
+        if frame is stop:
+            break
+        frame = frame.f_back
+    return tuple(reversed(frames))
+
+def _contains(frame, target) -> bool:
+    while frame is not None:
+        if frame is target:
+            return True
+        frame = frame.f_back
+    return False
+
+def _label(frame: Frame) -> str:
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+class RunProfiler:
+    """
+    Script thread'ini (ve çalıştırma sırasında başlayan thread'leri, ör. best-of-N adayları)
+    interval sn'de bir örnekler. Script'in modül çerçevesi yığından çıkınca (bitiş, st.rerun,
+    st.stop, hata) çalıştırmanın bittiği anlaşılır ve dosyalar yazılır.
+    """
+
+    def __init__(self, module_frame, name: str, output_dir: str = "profiles", interval: float = 0.005,
+                 max_seconds: float = 120.0, keep: int = 50):
+        self.name = name
+        self.output_dir = output_dir
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.keep = keep
+        self.paths: List[str] = []
+        self._module_frame = module_frame
+        self._script_thread = threading.current_thread()
+        self._known = set(threading.enumerate())
+        # thread adı -> yığın -> toplam süre (sn)
+        self._samples: Dict[str, Counter] = {}
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="appfab-profiler", daemon=True)
+
+    def start(self) -> "RunProfiler":
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def _targets(self) -> Iterable[threading.Thread]:
+        yield self._script_thread
+        for thread in threading.enumerate():
+            # Diğer oturumların script thread'leri bu çalıştırmaya ait değil
+            if thread not in self._known and thread.name != self._script_thread.name \
+                    and thread is not self._thread:
+                yield thread
+
+    def _loop(self):
+        last = self._started
+        reason = "finished"
+        while True:
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            frames = sys._current_frames()
+            script_frame = frames.get(self._script_thread.ident)
+            if not _contains(script_frame, self._module_frame):
+                break
+            if now - self._started > self.max_seconds:
+                reason = "timeout"
+                break
+            weight = now - last
+            last = now
+            for thread in self._targets():
+                frame = frames.get(thread.ident)
+                if frame is None:
+                    continue
+                stop = self._module_frame if thread is self._script_thread else None
+                self._samples.setdefault(thread.name, Counter())[_stack(frame, stop)] += weight
+        del frames, script_frame
+        self._module_frame = None
+        self._write(time.perf_counter() - self._started)
+        PROFILES_TOTAL.inc(reason=reason)
+        self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def collapsed(self) -> str:
+        """flamegraph.pl / speedscope'un okuduğu 'a;b;c <mikrosaniye>' satırları"""
+        lines = []
+        for thread_name, stacks in self._samples.items():
+            for stack, seconds in stacks.items():
+                labels = [thread_name] + [_label(frame) for frame in stack]
+                lines.append(f"{';'.join(labels)} {max(1, int(seconds * 1e6))}")
+        return "\n".join(sorted(lines)) + "\n"
+
+    def speedscope(self, duration: float) -> Dict[str, Any]:
+        """speedscope 'sampled' biçimi; thread başına bir profil"""
+        index: Dict[Frame, int] = {}
+        profiles = []
+        for thread_name, stacks in self._samples.items():
+            samples, weights = [], []
+            for stack, seconds in stacks.items():
+                samples.append([index.setdefault(frame, len(index)) for frame in stack])
+                weights.append(seconds)
+            profiles.append({"type": "sampled", "name": thread_name, "unit": "seconds",
+                             "startValue": 0, "endValue": duration,
+                             "samples": samples, "weights": weights})
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "appfab",
+            "shared": {"frames": [{"name": name, "file": filename, "line": line}
+                                  for name, filename, line in index]},
+            "profiles": profiles,
+        }
+
+    def _write(self, duration: float):
+        os.makedirs(self.output_dir, exist_ok=True)
+        now = time.time()
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}{int(now % 1 * 1000):03d}"
+        base = os.path.join(self.output_dir, f"{stamp}_{self.name}")
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        with open(base + ".speedscope.json", "w", encoding="utf-8") as f:
+            json.dump(self.speedscope(duration), f)
+        self.paths = [base + ".collapsed", base + ".speedscope.json"]
+        self._rotate()
+
+    def _rotate(self):
+        if not self.keep:
+            return
+        runs = sorted({name.split(".", 1)[0] for name in os.listdir(self.output_dir)
+                       if name.endswith((".collapsed", ".speedscope.json"))})
+        for run in runs[:-self.keep]:
+            for suffix in (".collapsed", ".speedscope.json"):
+                path = os.path.join(self.output_dir, run + suffix)
+                if os.path.exists(path):
+                    os.remove(path)
+
+def maybe_start(config: Dict[str, Any], requested: Any = None,
+                user: Optional[Dict[str, Any]] = None, name: str = "run") -> Optional[RunProfiler]:
+    """
+    Script'in modül seviyesinden çağrılır (çağıranın çerçevesi izlenir).
+    requested: ?profile= değeri; sadece config'teki admin e-postalarına açıktır.
+    """
+    every_run = config.get("every_run")
+    if not every_run:
+        if not requested or requested in ("0", "false") or not user:
+            return None
+        if user.get("email") not in config.get("admins", ()):
+            return None
+    label = re.sub(r"[^A-Za-z0-9_-]+", "-", f"{name}_{(user or {}).get('user_id') or 'anon'}")
+    return RunProfiler(sys._getframe(1), label,
+                       output_dir=config.get("output_dir", "profiles"),
+                       interval=config.get("interval", 0.005),
+                       max_seconds=config.get("max_seconds", 120.0),
+                       keep=config.get("keep", 50)).start()
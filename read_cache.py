@@ -0,0 +1,138 @@
+"""
+AppFab - Read Cache
+Her ziyaretçiye aynı dönen sorgular (public galeri, arama, istatistik) için
+süreç genelinde TTL'li read-through cache; yazma işlemleri açıkça geçersiz kılar.
+bus_path verilirse geçersiz kılmalar cache_bus üzerinden diğer worker süreçlerine de ulaşır.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import metrics
+from cache_bus import InvalidationBus
+from single_flight import get_group
+
+LOOKUPS_TOTAL = metrics.REGISTRY.counter(
+    "appfab_read_cache_total", "Okuma cache'i sonuçları", ("namespace", "result"))
+ENTRIES = metrics.REGISTRY.gauge(
+    "appfab_read_cache_entries", "Cache'teki kayıt sayısı")
+
+def _clone(value: Any) -> Any:
+    """Oturumlar paylaşılan kaydı değiştirmesin (satırlar dict)"""
+    if isinstance(value, list):
+        return [dict(item) if isinstance(item, dict) else item for item in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+class ReadCache:
+    """namespace + argümanlar -> (değer, son geçerlilik, bus sürümü); namespace bazında geçersiz kılma"""
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 1024,
+                 ttls: Optional[Dict[str, float]] = None, bus_path: Optional[str] = None):
+        self.ttl = ttl
+        self.ttls = ttls or {}
+        self.max_entries = max_entries
+        self._bus = InvalidationBus(bus_path) if bus_path else None
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[Any, float, int]]" = OrderedDict()
+        # Yükleme sürerken gelen invalidate'i kaçırmamak için namespace sürümü
+        self._generations: Dict[str, int] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._flight = get_group("read_cache")
+
+    def _count(self, namespace: str, result: str):
+        counts = self._counts.setdefault(namespace, {"hit": 0, "miss": 0, "stale": 0, "invalidated": 0})
+        counts[result] += 1
+        LOOKUPS_TOTAL.inc(namespace=namespace, result=result)
+
+    def get_or_load(self, namespace: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Geçerli kayıt varsa onu, yoksa loader() sonucunu döndür (eşzamanlı kaçırmalar tek sorgu)"""
+        full_key = (namespace, key)
+        # Başka bir süreç bu namespace'i geçersiz kıldıysa sürüm artmıştır
+        version = self._bus.version(namespace) if self._bus else 0
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None and entry[1] > now:
+                if entry[2] == version:
+                    self._entries.move_to_end(full_key)
+                    self._count(namespace, "hit")
+                    return _clone(entry[0])
+                del self._entries[full_key]
+                self._count(namespace, "stale")
+            self._count(namespace, "miss")
+            generation = self._generations.get(namespace, 0)
+
+        value, _ = self._flight.do(full_key, loader)
+        with self._lock:
+            if self._generations.get(namespace, 0) == generation:
+                expires = time.monotonic() + self.ttls.get(namespace, self.ttl)
+                # Yükleme öncesi sürümle: yükleme sırasında gelen bump kaydı bayat bırakır
+                self._entries[full_key] = (value, expires, version)
+                self._entries.move_to_end(full_key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                ENTRIES.set(len(self._entries))
+        return _clone(value)
+
+    def invalidate(self, *namespaces: str):
+        """Namespace'lerdeki tüm kayıtları sil (bus varsa tüm süreçlerde)"""
+        if self._bus:
+            self._bus.bump(*namespaces)
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+                for full_key in [k for k in self._entries if k[0] == namespace]:
+                    del self._entries[full_key]
+                self._count(namespace, "invalidated")
+            ENTRIES.set(len(self._entries))
+
+    def clear(self):
+        """Sadece bu sürecin kayıtları"""
+        with self._lock:
+            for namespace in {k[0] for k in self._entries} | set(self._generations):
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._entries.clear()
+            ENTRIES.set(0)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Namespace bazında hit/miss, isabet oranı ve bus sürümü"""
+        versions = self._bus.snapshot() if self._bus else {}
+        with self._lock:
+            out = {}
+            for namespace, counts in self._counts.items():
+                lookups = counts["hit"] + counts["miss"]
+                out[namespace] = dict(counts,
+                                      entries=sum(1 for k in self._entries if k[0] == namespace),
+                                      hit_rate=counts["hit"] / lookups if lookups else 0.0,
+                                      version=versions.get(namespace, 0))
+            return out
+
+_cache: Optional[ReadCache] = None
+_cache_lock = threading.Lock()
+
+def get_cache(config: Optional[Dict] = None) -> ReadCache:
+    """Süreç genelindeki cache (tüm oturumlar paylaşır)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ReadCache(**(config or {}))
+        return _cache
+
+def cached(namespace: str):
+    """Fonksiyon sonucunu argümanlarına göre cache'le"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            return get_cache().get_or_load(namespace, key, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
+
+def invalidate(*namespaces: str):
+    """Yazma işlemlerinden sonra çağrılır"""
+    get_cache().invalidate(*namespaces)
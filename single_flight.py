@@ -0,0 +1,84 @@
+"""
+AppFab - Single Flight
+Aynı anda gelen özdeş isteklerin tek çağrıda birleştirilmesi
+"""
+
+import re
+import threading
+import unicodedata
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+import metrics
+
+COALESCED_TOTAL = metrics.REGISTRY.counter(
+    "appfab_singleflight_total", "Tek uçuş çağrıları (leader=çağrıyı yapan, shared=sonucu paylaşan)",
+    ("group", "role"))
+
+def normalize_prompt(prompt: str) -> str:
+    """Büyük/küçük harf, Türkçe karakter, noktalama ve boşluk farklarını yok say"""
+    text = prompt.translate(str.maketrans("şçöğüıİŞÇÖĞÜ", "scoguiiscogu")).lower()
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+class SingleFlight:
+    """Aynı anahtarla devam eden çağrı varsa onu bekle ve sonucunu paylaş"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """(sonuç, paylaşıldı_mı) döndür; fn'in exception'ı tüm bekleyenlere iletilir"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            COALESCED_TOTAL.inc(group=self.name, role="shared")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        COALESCED_TOTAL.inc(group=self.name, role="leader")
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+def get_group(name: str) -> SingleFlight:
+    """Süreç genelinde isimli grup (app.py her rerun'da yeniden çalışır)"""
+    with _groups_lock:
+        group = _groups.get(name)
+        if group is None:
+            group = _groups[name] = SingleFlight(name)
+        return group
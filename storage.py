@@ -0,0 +1,281 @@
+"""
+AppFab - Storage
+LocalDatabase'in arkasındaki depolama: tek SQLite dosyası, user_id'ye göre
+parçalanmış (sharded) SQLite dosyaları veya testler için bellek içi SQLite
+"""
+
+import abc
+import itertools
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+
+import facets
+import metrics
+from ids import id_shard, new_id
+
+CONNECTIONS_TOTAL = metrics.REGISTRY.counter(
+    "appfab_storage_connections_total", "Açılan depolama bağlantıları", ("target",))
+
+# Sharded modda global veritabanındaki yönlendirme tabloları
+DIRECTORY_TABLES_SQL = [
+    '''CREATE TABLE IF NOT EXISTS user_directory (
+        email TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS app_directory (
+        app_id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL
+    )''',
+]
+
+GLOBAL_FILE = "appfab_global.db"
+SHARD_FILE = "appfab_shard_{:02d}.db"
+# Oturum payload'ları (payload_store) ana veritabanının yazma kilidini paylaşmasın
+PAYLOAD_FILE = "appfab_payloads.db"
+
+def _connect(target: str, uri: bool = False) -> sqlite3.Connection:
+    conn = sqlite3.connect(target, check_same_thread=False, uri=uri)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+class StorageBackend(abc.ABC):
+    """
+    Bağlantı yönlendirmesi. LocalDatabase her işlemde verinin sahibine göre bağlantı ister:
+    user_conn (kullanıcı ve app'leri), app_conn (app_id -> sahibinin verisi),
+    index_conn (public galeri, arama, facet'ler). Tek dosyalı backend'lerde hepsi aynı DB.
+    """
+
+    sharded = False
+
+    def databases(self) -> List[sqlite3.Connection]:
+        """Şema kurulumu için tüm veritabanları"""
+        return [self.index_conn()]
+
+    def shard_conns(self) -> List[sqlite3.Connection]:
+        """Asıl kayıtları tutan veritabanları (istatistikler toplanırken)"""
+        return [self.index_conn()]
+
+    @abc.abstractmethod
+    def index_conn(self) -> sqlite3.Connection:
+        """Galeri/indeks veritabanı (tek dosyalı backend'lerde tüm veri)"""
+
+    def user_conn(self, user_id: Optional[str]) -> sqlite3.Connection:
+        return self.index_conn()
+
+    def app_conn(self, app_id: str) -> Optional[sqlite3.Connection]:
+        return self.index_conn()
+
+    def lookup_email(self, email: str) -> Optional[str]:
+        conn = self.index_conn()
+        row = conn.execute("SELECT user_id FROM users WHERE email = ?", (email,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def claim_email(self, email: str, user_id: str) -> bool:
+        """E-postayı kullanıcıya ayır (tek DB'de users.email UNIQUE zaten korur)"""
+        return True
+
+    def release_email(self, email: str):
+        pass
+
+    def new_app_id(self, user_id: str) -> str:
+        """Kullanıcının yeni app'i için ID (sharded'da shard'ı taşır)"""
+        return new_id("app")
+
+    def register_app(self, app_id: str, user_id: str):
+        """App'i yönlendirmeye ekle; app satırı sahibinin veritabanına yazıldıktan sonra çağrılır"""
+        pass
+
+    def unregister_app(self, app_id: str):
+        pass
+
+    def sync_public(self, app_id: str, row: Optional[sqlite3.Row]):
+        """Galeri indeksini app satırıyla eşitle (tek DB'de apps tablosu zaten indeks)"""
+        pass
+
+    def sync_likes(self, app_id: str, likes: int):
+        pass
+
+class SQLiteBackend(StorageBackend):
+    """Tek dosya (varsayılan, mevcut appfab.db)"""
+
+    def __init__(self, path: str = "appfab.db"):
+        self.path = path
+
+    def index_conn(self) -> sqlite3.Connection:
+        CONNECTIONS_TOTAL.inc(target="main")
+        return _connect(self.path)
+
+class MemoryBackend(StorageBackend):
+    """Bellek içi paylaşımlı SQLite (testler); son bağlantı kapanınca veri kaybolmasın diye bir bağlantı açık tutulur"""
+
+    _counter = itertools.count()
+
+    def __init__(self, name: Optional[str] = None):
+        self.uri = f"file:{name or f'appfab_mem_{next(self._counter)}'}?mode=memory&cache=shared"
+        self._keeper = _connect(self.uri, uri=True)
+
+    def index_conn(self) -> sqlite3.Connection:
+        CONNECTIONS_TOTAL.inc(target="memory")
+        return _connect(self.uri, uri=True)
+
+class ShardedSQLiteBackend(StorageBackend):
+    """
+    Kullanıcılar ve app'leri user_id hash'ine göre N dosyaya dağıtılır; her dosyanın kendi
+    yazma kilidi olduğundan farklı kullanıcıların yazmaları birbirini beklemez.
+    App ID'leri shard'ı taşır (app03_...): app oluşturmak global dosyaya yazmaz.
+    Global dosya: e-posta yönlendirmesi, eski ID'li app'lerin dizini ve public app'lerin
+    kopyası (galeri, arama, facet).
+    """
+
+    sharded = True
+
+    def __init__(self, directory: str = "data", shards: int = 8):
+        os.makedirs(directory, exist_ok=True)
+        self.shards = shards
+        self.global_path, *self.shard_paths = storage_paths("sharded", directory=directory, shards=shards,
+                                                            payloads=False)
+        # app_id -> user_id: app'ler silinmedikçe değişmez
+        self._owners: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        conn = _connect(self.global_path)
+        for sql in DIRECTORY_TABLES_SQL:
+            conn.execute(sql)
+        conn.commit()
+        conn.close()
+
+    def shard_of(self, user_id: Optional[str]) -> int:
+        return zlib.crc32((user_id or "").encode("utf-8")) % self.shards
+
+    def databases(self) -> List[sqlite3.Connection]:
+        return [self.index_conn()] + self.shard_conns()
+
+    def shard_conns(self) -> List[sqlite3.Connection]:
+        return [_connect(path) for path in self.shard_paths]
+
+    def index_conn(self) -> sqlite3.Connection:
+        CONNECTIONS_TOTAL.inc(target="global")
+        return _connect(self.global_path)
+
+    def user_conn(self, user_id: Optional[str]) -> sqlite3.Connection:
+        CONNECTIONS_TOTAL.inc(target="shard")
+        return _connect(self.shard_paths[self.shard_of(user_id)])
+
+    def new_app_id(self, user_id: str) -> str:
+        return new_id("app", self.shard_of(user_id))
+
+    def _encoded_shard(self, app_id: str) -> Optional[int]:
+        shard = id_shard(app_id)
+        return shard if shard is not None and shard < self.shards else None
+
+    def _owner(self, app_id: str) -> Optional[str]:
+        with self._lock:
+            owner = self._owners.get(app_id)
+        if owner is None:
+            conn = self.index_conn()
+            row = conn.execute("SELECT user_id FROM app_directory WHERE app_id = ?", (app_id,)).fetchone()
+            conn.close()
+            if row is None:
+                return None
+            owner = row[0]
+            with self._lock:
+                self._owners[app_id] = owner
+        return owner
+
+    def app_conn(self, app_id: str) -> Optional[sqlite3.Connection]:
+        shard = self._encoded_shard(app_id)
+        if shard is not None:
+            CONNECTIONS_TOTAL.inc(target="shard")
+            return _connect(self.shard_paths[shard])
+        # Eski ID: sahibi global dizinden
+        owner = self._owner(app_id)
+        return self.user_conn(owner) if owner is not None else None
+
+    def _write_global(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        conn = self.index_conn()
+        try:
+            result = fn(conn)
+            conn.commit()
+            return result
+        finally:
+            conn.close()
+
+    def lookup_email(self, email: str) -> Optional[str]:
+        conn = self.index_conn()
+        row = conn.execute("SELECT user_id FROM user_directory WHERE email = ?", (email,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def claim_email(self, email: str, user_id: str) -> bool:
+        def claim(conn):
+            cursor = conn.execute("INSERT OR IGNORE INTO user_directory VALUES (?, ?)", (email, user_id))
+            return cursor.rowcount == 1
+        return self._write_global(claim)
+
+    def release_email(self, email: str):
+        self._write_global(lambda conn: conn.execute("DELETE FROM user_directory WHERE email = ?", (email,)))
+
+    def register_app(self, app_id: str, user_id: str):
+        if self._encoded_shard(app_id) is not None:
+            return
+        self._write_global(lambda conn: conn.execute("INSERT INTO app_directory VALUES (?, ?)", (app_id, user_id)))
+        with self._lock:
+            self._owners[app_id] = user_id
+
+    def unregister_app(self, app_id: str):
+        if self._encoded_shard(app_id) is not None:
+            return
+        self._write_global(lambda conn: conn.execute("DELETE FROM app_directory WHERE app_id = ?", (app_id,)))
+        with self._lock:
+            self._owners.pop(app_id, None)
+
+    def sync_public(self, app_id: str, row: Optional[sqlite3.Row]):
+        """Public app'in kopyasını (ve facet'lerini) global indekse yaz; gizli/silinmişse kaldır"""
+        def sync(conn):
+            conn.execute("DELETE FROM apps WHERE app_id = ?", (app_id,))
+            facets.delete_facets(conn.cursor(), app_id)
+            if row is not None and row["is_public"]:
+                columns = row.keys()
+                conn.execute(f"INSERT INTO apps ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                             tuple(row))
+                facets.save_facets(conn.cursor(), app_id, row["code"])
+        self._write_global(sync)
+
+    def sync_likes(self, app_id: str, likes: int):
+        self._write_global(lambda conn: conn.execute("UPDATE apps SET likes = ? WHERE app_id = ?", (likes, app_id)))
+
+def payload_path(backend: str = "sqlite", path: str = "appfab.db", directory: str = "data",
+                 shards: int = 8) -> Optional[str]:
+    """Payload deposunun dosyası (ana veritabanının/shard'ların yanında); memory'de yok"""
+    if backend == "sharded":
+        return os.path.join(directory, PAYLOAD_FILE)
+    if backend == "memory":
+        return None
+    return os.path.join(os.path.dirname(path), PAYLOAD_FILE)
+
+def storage_paths(backend: str = "sqlite", path: str = "appfab.db", directory: str = "data",
+                  shards: int = 8, payloads: bool = True) -> List[str]:
+    """
+    Backend'in veritabanı dosyaları (bakım/yedekleme); sharded'da ilki global indeks, sonra
+    shard'lar. payloads: payload deposunun dosyası da (en sonda)
+    """
+    if backend == "sharded":
+        paths = [os.path.join(directory, GLOBAL_FILE)] + [os.path.join(directory, SHARD_FILE.format(i))
+                                                          for i in range(shards)]
+    elif backend == "memory":
+        return []
+    else:
+        paths = [path]
+    return paths + [payload_path(backend, path, directory, shards)] if payloads else paths
+
+def create_backend(backend: str = "sqlite", path: str = "appfab.db", directory: str = "data",
+                   shards: int = 8) -> StorageBackend:
+    """STORAGE_CONFIG'ten backend oluştur"""
+    if backend == "sharded":
+        return ShardedSQLiteBackend(directory, shards)
+    if backend == "memory":
+        return MemoryBackend()
+    return SQLiteBackend(path)
@@ -0,0 +1,535 @@
+"""
+AppFab - Templates
+Sık istenen uygulamalar için parametreli, önceden doğrulanmış şablonlar;
+eşleşen istek sağlayıcıya gitmeden yerelde üretilir
+"""
+
+import itertools
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+from fix_context import GENERATED_FILENAME, prepare_preview_code
+from single_flight import normalize_prompt
+
+TEMPLATE_TOTAL = metrics.REGISTRY.counter(
+    "appfab_template_total", "Şablon eşleşmeleri", ("template", "result"))
+MATCH_SECONDS = metrics.REGISTRY.histogram(
+    "appfab_template_match_seconds", "Şablon eşleştirme + render süresi",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1))
+
+# Her şablonda açıklanmış sayılan genel kelimeler ("... yapan bir app yap")
+GENERIC_WORDS = re.compile(
+    r"(app\w*|uygulama\w*|yap\w*|olustur\w*|hazirla\w*|gelistir\w*|bir|ve|ile|icin|bana|benim|"
+    r"lutfen|istiyorum|olan|eden|basit|guzel|modern|hizli|kucuk|kullanisli|sayfa\w*|web|site\w*|"
+    r"program\w*|arac\w*|tool|streamlit|python|make|create|build|simple|the|an|for|with|that|"
+    r"which|me|please|my|to|of|and|in|on|bi|sey|seyi|ornek\w*)")
+
+class Template:
+    """
+    Şablon: kaynak koddaki __SLOT__ yer tutucuları sabit seçeneklerden biriyle doldurulur.
+    groups: isteğin her birinden en az bir kelime içermesi gereken regex'ler
+    vocab: şablonun açıkladığı kelimeler (kapsam oranı için)
+    slots: {slot: {değer: regex}}; ilk eşleşen değer seçilir, yoksa varsayılan
+    """
+
+    def __init__(self, name: str, title: str, source: str, groups: List[str], vocab: str,
+                 slots: Optional[Dict[str, Dict[str, str]]] = None,
+                 defaults: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.title = title
+        self.source = source
+        self.groups = [re.compile(g) for g in groups]
+        self.vocab = re.compile(vocab)
+        self.slots = {slot: {value: re.compile(rx) for value, rx in choices.items()}
+                      for slot, choices in (slots or {}).items()}
+        self.defaults = defaults or {}
+
+    def choices(self, slot: str) -> List[str]:
+        return list(self.slots[slot])
+
+    def render(self, values: Dict[str, str]) -> str:
+        code = self.source
+        for slot in self.slots:
+            value = values.get(slot, self.defaults[slot])
+            if value not in self.slots[slot]:
+                raise ValueError(f"{self.name}: geçersiz {slot}={value!r}")
+            code = code.replace(f"__{slot.upper()}__", repr(value))
+        return code
+
+    def variants(self):
+        """Tüm slot kombinasyonları (hepsi başlangıçta derlenir)"""
+        slots = list(self.slots)
+        for combo in itertools.product(*(self.choices(s) for s in slots)):
+            yield dict(zip(slots, combo))
+
+    def extract(self, words: List[str]) -> Dict[str, str]:
+        """İstekteki kelimelerden slot değerleri"""
+        values = dict(self.defaults)
+        for slot, choices in self.slots.items():
+            for word in words:
+                value = next((v for v, rx in choices.items() if rx.fullmatch(word)), None)
+                if value:
+                    values[slot] = value
+                    break
+        return values
+
+# =============================================================================
+# SOURCES
+# =============================================================================
+
+BMI_SOURCE = r'''import streamlit as st
+
+UNITS = __UNITS__
+
+st.set_page_config(page_title="VKİ Hesaplayıcı", page_icon="⚖️")
+st.title("⚖️ Vücut Kitle İndeksi Hesaplayıcı")
+
+units = st.radio("Birim", ["metric", "imperial"], index=["metric", "imperial"].index(UNITS),
+                 format_func={"metric": "kg / cm", "imperial": "lb / inç"}.get, horizontal=True)
+
+col1, col2 = st.columns(2)
+if units == "imperial":
+    weight = col1.number_input("Kilo (lb)", min_value=1.0, max_value=1500.0, value=154.0)
+    height = col2.number_input("Boy (inç)", min_value=20.0, max_value=110.0, value=67.0)
+    bmi = 703 * weight / height ** 2
+else:
+    weight = col1.number_input("Kilo (kg)", min_value=1.0, max_value=700.0, value=70.0)
+    height = col2.number_input("Boy (cm)", min_value=50.0, max_value=280.0, value=170.0)
+    bmi = weight / (height / 100) ** 2
+
+CATEGORIES = [
+    (18.5, "Zayıf", "info"),
+    (25.0, "Normal", "success"),
+    (30.0, "Fazla kilolu", "warning"),
+    (float("inf"), "Obez", "error"),
+]
+label, level = next((name, lvl) for limit, name, lvl in CATEGORIES if bmi < limit)
+
+st.metric("Vücut Kitle İndeksi", f"{bmi:.1f}")
+getattr(st, level)(f"Kategori: **{label}**")
+st.progress(min(bmi / 40, 1.0))
+
+with st.expander("ℹ️ VKİ aralıkları"):
+    st.table({"Aralık": ["< 18.5", "18.5 - 24.9", "25 - 29.9", "≥ 30"],
+              "Kategori": ["Zayıf", "Normal", "Fazla kilolu", "Obez"]})
+'''
+
+CURRENCY_SOURCE = r'''import streamlit as st
+import requests
+
+BASE = __BASE__
+TARGET = __TARGET__
+# Çevrimdışı yedek kurlar (1 USD karşılığı, yaklaşık)
+FALLBACK_RATES = {"USD": 1.0, "EUR": 0.92, "TRY": 34.0, "GBP": 0.79, "JPY": 150.0, "CHF": 0.88}
+
+st.set_page_config(page_title="Döviz Çevirici", page_icon="💱")
+st.title("💱 Döviz Çevirici")
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_rates():
+    response = requests.get("https://open.er-api.com/v6/latest/USD", timeout=5)
+    response.raise_for_status()
+    return response.json()["rates"]
+
+if "rates" not in st.session_state:
+    st.session_state.rates = FALLBACK_RATES
+    st.session_state.live = False
+
+if st.button("🔄 Canlı kurları getir"):
+    try:
+        st.session_state.rates = fetch_rates()
+        st.session_state.live = True
+    except Exception as e:
+        st.warning(f"Canlı kurlar alınamadı, yedek kurlar kullanılıyor ({e})")
+
+rates = st.session_state.rates
+currencies = sorted(rates)
+col1, col2, col3 = st.columns([2, 1, 1])
+amount = col1.number_input("Miktar", min_value=0.0, value=100.0, step=10.0)
+base = col2.selectbox("Kaynak", currencies, index=currencies.index(BASE) if BASE in currencies else 0)
+target = col3.selectbox("Hedef", currencies, index=currencies.index(TARGET) if TARGET in currencies else 0)
+
+result = amount / rates[base] * rates[target]
+st.metric(f"{amount:,.2f} {base}", f"{result:,.2f} {target}")
+st.caption("Canlı kur" if st.session_state.live else "Yedek kur (yaklaşık)")
+
+st.subheader("Diğer para birimleri")
+shown = [c for c in FALLBACK_RATES if c in rates]
+st.dataframe({"Para birimi": shown,
+              "Tutar": [round(amount / rates[base] * rates[c], 2) for c in shown]},
+             use_container_width=True)
+'''
+
+EXCEL_CHART_SOURCE = r'''import streamlit as st
+import pandas as pd
+
+CHART = __CHART__
+LABELS = {"line": "Çizgi", "bar": "Sütun", "area": "Alan", "scatter": "Dağılım"}
+
+st.set_page_config(page_title="Excel Grafik", page_icon="📊", layout="wide")
+st.title("📊 Excel / CSV Grafik")
+
+uploaded = st.file_uploader("Excel veya CSV dosyası yükleyin", type=["xlsx", "xls", "csv"])
+if uploaded is None:
+    st.info("Başlamak için bir dosya yükleyin. Şimdilik örnek veri gösteriliyor.")
+    df = pd.DataFrame({"Ay": ["Oca", "Şub", "Mar", "Nis", "May", "Haz"],
+                       "Satış": [120, 135, 150, 140, 170, 190],
+                       "Gider": [80, 90, 95, 100, 105, 110]})
+else:
+    try:
+        if uploaded.name.lower().endswith(".csv"):
+            df = pd.read_csv(uploaded)
+        else:
+            df = pd.read_excel(uploaded)
+    except ImportError:
+        st.error("Excel okumak için openpyxl gerekli: pip install openpyxl")
+        st.stop()
+    except Exception as e:
+        st.error(f"Dosya okunamadı: {e}")
+        st.stop()
+
+st.dataframe(df.head(100), use_container_width=True)
+
+numeric = df.select_dtypes("number").columns.tolist()
+if not numeric:
+    st.warning("Grafik için sayısal kolon bulunamadı")
+    st.stop()
+
+col1, col2, col3 = st.columns(3)
+x = col1.selectbox("X ekseni", df.columns.tolist())
+ys = col2.multiselect("Y ekseni", numeric, default=[c for c in numeric if c != x][:2] or numeric[:1])
+kind = col3.selectbox("Grafik türü", list(LABELS), index=list(LABELS).index(CHART), format_func=LABELS.get)
+
+ys = [y for y in ys if y != x]
+if not ys:
+    st.warning("X ekseninden farklı en az bir sayısal kolon seçin")
+    st.stop()
+
+if kind == "scatter":
+    st.scatter_chart(df, x=x, y=ys)
+else:
+    data = df[[x] + ys].set_index(x)
+    {"line": st.line_chart, "bar": st.bar_chart, "area": st.area_chart}[kind](data)
+
+st.subheader("📈 Özet")
+st.dataframe(df[ys].describe(), use_container_width=True)
+'''
+
+PHOTO_FILTER_SOURCE = r'''import io
+import streamlit as st
+from PIL import Image, ImageEnhance, ImageFilter, ImageOps
+
+FILTER = __FILTER__
+FILTERS = {
+    "grayscale": "Siyah-Beyaz",
+    "sepia": "Sepya",
+    "blur": "Bulanıklaştır",
+    "invert": "Negatif",
+    "contrast": "Kontrast",
+}
+
+def apply_filter(image, name, strength):
+    image = image.convert("RGB")
+    if name == "grayscale":
+        return ImageOps.grayscale(image)
+    if name == "sepia":
+        return ImageOps.colorize(ImageOps.grayscale(image), "#2e1f0f", "#f3e3c3")
+    if name == "blur":
+        return image.filter(ImageFilter.GaussianBlur(radius=strength))
+    if name == "invert":
+        return ImageOps.invert(image)
+    return ImageEnhance.Contrast(image).enhance(1 + strength / 5)
+
+st.set_page_config(page_title="Fotoğraf Filtresi", page_icon="🖼️", layout="wide")
+st.title("🖼️ Fotoğraf Filtresi")
+
+uploaded = st.file_uploader("Fotoğraf yükleyin", type=["png", "jpg", "jpeg", "webp"])
+col1, col2 = st.columns(2)
+name = col1.selectbox("Filtre", list(FILTERS), index=list(FILTERS).index(FILTER), format_func=FILTERS.get)
+strength = col2.slider("Yoğunluk", 1, 10, 3, disabled=name not in ("blur", "contrast"))
+
+if uploaded is None:
+    st.info("Başlamak için bir fotoğraf yükleyin")
+    st.stop()
+
+try:
+    original = Image.open(io.BytesIO(uploaded.getvalue()))
+except Exception as e:
+    st.error(f"Fotoğraf açılamadı: {e}")
+    st.stop()
+
+result = apply_filter(original, name, strength)
+col1, col2 = st.columns(2)
+col1.image(original, caption="Orijinal")
+col2.image(result, caption=FILTERS[name])
+
+buffer = io.BytesIO()
+result.save(buffer, format="PNG")
+st.download_button("💾 İndir", buffer.getvalue(), file_name="filtreli.png", mime="image/png")
+'''
+
+SUDOKU_SOURCE = r'''import random
+import streamlit as st
+
+DIFFICULTY = __DIFFICULTY__
+CLUES = {"easy": 40, "medium": 32, "hard": 26}
+LABELS = {"easy": "Kolay", "medium": "Orta", "hard": "Zor"}
+
+def generate(clues, seed):
+    """Geçerli bir çözüm üretip rastgele hücreleri boşalt"""
+    rng = random.Random(seed)
+    digits = list(range(1, 10))
+    rng.shuffle(digits)
+    bands = rng.sample(range(3), 3)
+    stacks = rng.sample(range(3), 3)
+    rows = [b * 3 + r for b in bands for r in rng.sample(range(3), 3)]
+    cols = [s * 3 + c for s in stacks for c in rng.sample(range(3), 3)]
+    solution = [[digits[(3 * (r % 3) + r // 3 + c) % 9] for c in cols] for r in rows]
+    puzzle = [row[:] for row in solution]
+    for cell in rng.sample(range(81), 81 - clues):
+        puzzle[cell // 9][cell % 9] = 0
+    return puzzle, solution
+
+def is_solved(grid):
+    """Satır, sütun ve 3x3 kutuların hepsi 1-9 içeriyor mu"""
+    groups = [row for row in grid]
+    groups += [[grid[r][c] for r in range(9)] for c in range(9)]
+    groups += [[grid[br + r][bc + c] for r in range(3) for c in range(3)]
+               for br in (0, 3, 6) for bc in (0, 3, 6)]
+    return all(sorted(group) == list(range(1, 10)) for group in groups)
+
+st.set_page_config(page_title="Sudoku", page_icon="🧩")
+st.title("🧩 Sudoku")
+
+col1, col2 = st.columns([2, 1])
+difficulty = col1.selectbox("Zorluk", list(CLUES), index=list(CLUES).index(DIFFICULTY), format_func=LABELS.get)
+if "sudoku" not in st.session_state or col2.button("🔄 Yeni oyun", use_container_width=True) \
+        or st.session_state.sudoku_difficulty != difficulty:
+    st.session_state.sudoku_seed = random.randrange(1 << 30)
+    st.session_state.sudoku = generate(CLUES[difficulty], st.session_state.sudoku_seed)
+    st.session_state.sudoku_difficulty = difficulty
+
+puzzle, solution = st.session_state.sudoku
+seed = st.session_state.sudoku_seed
+show_solution = st.toggle("Çözümü göster")
+
+grid = []
+for r in range(9):
+    cells = st.columns(9)
+    row = []
+    for c in range(9):
+        if puzzle[r][c]:
+            cells[c].markdown(f"### {puzzle[r][c]}")
+            row.append(puzzle[r][c])
+        elif show_solution:
+            cells[c].markdown(f"### :blue[{solution[r][c]}]")
+            row.append(solution[r][c])
+        else:
+            value = cells[c].text_input(f"{r}{c}", max_chars=1, key=f"cell_{seed}_{r}_{c}",
+                                        label_visibility="collapsed")
+            row.append(int(value) if value.isdigit() and value != "0" else 0)
+    grid.append(row)
+
+if st.button("✅ Kontrol et", type="primary"):
+    empty = sum(v == 0 for row in grid for v in row)
+    if empty:
+        st.info(f"{empty} boş hücre kaldı")
+    elif is_solved(grid):
+        st.balloons()
+        st.success("Tebrikler, bulmaca çözüldü!")
+    else:
+        st.error("Kurallara uymayan hücreler var")
+'''
+
+# =============================================================================
+# LIBRARY
+# =============================================================================
+
+CURRENCY_CODES = {"USD": r"dolar\w*|usd", "EUR": r"(euro|avro)\w*|eur", "TRY": r"(lira|tl)\w*|try",
+                  "GBP": r"sterlin\w*|gbp", "JPY": r"yen\w*|jpy", "CHF": r"frank\w*|chf"}
+
+TEMPLATES = [
+    Template(
+        "bmi", "VKİ Hesaplayıcı", BMI_SOURCE,
+        groups=[r"bmi|vki|(vucut|kitle|endeks|indeks)\w*"],
+        vocab=r"bmi|vki|(vucut|kitle|endeks|indeks|kilo|boy|hesap|calculat|olc|ideal|saglik|"
+              r"metri|pound|lb|inch|inc|kg|cm|body|mass|index|weight|height)\w*",
+        slots={"units": {"imperial": r"(pound|lb|inch|inc|imperial|feet|ft)\w*",
+                         "metric": r"(kg|cm|metri)\w*"}},
+        defaults={"units": "metric"}),
+    Template(
+        "currency", "Döviz Çevirici", CURRENCY_SOURCE,
+        groups=[r"(doviz|kur|kurlar|kuru|currenc|exchange|para|dolar|euro|avro|sterlin|lira|"
+                r"tl|usd|eur|try|gbp|jpy|yen|chf|frank)\w*"],
+        vocab=r"(doviz|kur|kurlar|kuru|currenc|exchange|para|birim|dolar|euro|avro|sterlin|lira|"
+              r"tl|usd|eur|try|gbp|jpy|yen|chf|frank|cevir|donustur|convert|hesap|tum|butun|"
+              r"birbir|guncel|canli|all|rate|money)\w*",
+        slots={"base": CURRENCY_CODES, "target": CURRENCY_CODES},
+        defaults={"base": "USD", "target": "TRY"}),
+    Template(
+        "excel_chart", "Excel Grafik", EXCEL_CHART_SOURCE,
+        groups=[r"(excel|xlsx|xls|csv|tablo|spreadsheet)\w*",
+                r"(grafik|chart|plot|ciz|gorsel|analiz|visual|dashboard|rapor)\w*"],
+        vocab=r"(excel|xlsx|xls|csv|tablo|spreadsheet|dosya|file|yukle|upload|grafik|chart|plot|"
+              r"ciz|gorsel|analiz|visual|dashboard|rapor|veri|data|satis|sutun|cizgi|bar|line|"
+              r"alan|area|dagilim|scatter|kolon|goster|sales)\w*",
+        slots={"chart": {"bar": r"(sutun|bar|column)\w*", "area": r"(alan|area)\w*",
+                         "scatter": r"(dagilim|scatter|nokta)\w*", "line": r"(cizgi|line|trend)\w*"}},
+        defaults={"chart": "line"}),
+    Template(
+        "photo_filter", "Fotoğraf Filtresi", PHOTO_FILTER_SOURCE,
+        groups=[r"(fotograf|foto|resim|gorsel|goruntu|image|photo|picture|img)\w*",
+                r"(filtre|filter|siyah|beyaz|gri|gray|grey|sepya|sepia|bulanik|blur|negatif|invert|"
+                r"kontrast|contrast|efekt|effect)\w*"],
+        vocab=r"(fotograf|foto|resim|gorsel|goruntu|image|photo|picture|img|filtre|filter|siyah|"
+              r"beyaz|gri|gray|grey|sepya|sepia|bulanik|blur|negatif|invert|kontrast|contrast|efekt|"
+              r"effect|yukle|upload|cevir|donustur|convert|uygula|black|white|indir)\w*",
+        slots={"filter": {"grayscale": r"(siyah|beyaz|gri|gray|grey|black|white)\w*",
+                          "sepia": r"(sepya|sepia|eski|vintage)\w*",
+                          "blur": r"(bulanik|blur)\w*",
+                          "invert": r"(negatif|invert)\w*",
+                          "contrast": r"(kontrast|contrast)\w*"}},
+        defaults={"filter": "grayscale"}),
+    Template(
+        "sudoku", "Sudoku", SUDOKU_SOURCE,
+        groups=[r"sudoku\w*"],
+        vocab=r"(sudoku|oyun|game|bulmaca|puzzle|oyna|play|kolay|orta|zor|easy|medium|hard)\w*",
+        slots={"difficulty": {"easy": r"(kolay|easy)\w*", "medium": r"(orta|medium)\w*",
+                              "hard": r"(zor|hard)\w*"}},
+        defaults={"difficulty": "medium"}),
+]
+
+def _extract_currency(template: Template, words: List[str]) -> Dict[str, str]:
+    """İki para birimi sırayla okunur: ilki kaynak, ikincisi hedef"""
+    found = []
+    for word in words:
+        value = next((v for v, rx in template.slots["base"].items() if rx.fullmatch(word)), None)
+        if value and value not in found:
+            found.append(value)
+    values = dict(template.defaults)
+    if len(found) >= 2:
+        values["base"], values["target"] = found[0], found[1]
+    elif found:
+        # Tek para birimi: TL ise dolardan TL'ye, değilse o birimden TL'ye
+        values["base"] = found[0] if found[0] != "TRY" else "USD"
+    return values
+
+def match_intent(prompt: str, min_coverage: float = 0.7,
+                 max_words: int = 30) -> Optional[Tuple[Template, Dict[str, str]]]:
+    """İsteği bir şablona eşle: tüm gruplar eşleşmeli ve kelimelerin çoğu açıklanmalı"""
+    words = [w for w in normalize_prompt(prompt).split() if len(w) > 1]
+    if not words or len(words) > max_words:
+        return None
+    best = None
+    for template in TEMPLATES:
+        if not all(any(group.fullmatch(w) for w in words) for group in template.groups):
+            continue
+        explained = sum(1 for w in words if template.vocab.fullmatch(w) or GENERIC_WORDS.fullmatch(w))
+        coverage = explained / len(words)
+        # Şablonun kapsamadığı istekler (ek özellik, farklı veri) modele gider
+        if coverage >= min_coverage and (best is None or coverage > best[0]):
+            best = (coverage, template)
+    if best is None:
+        return None
+    template = best[1]
+    if template.name == "currency":
+        return template, _extract_currency(template, words)
+    return template, template.extract(words)
+
+class TemplateLibrary:
+    """Başlangıçta tüm varyantları derler, varsayılanları smoke-test eder"""
+
+    def __init__(self, enabled: bool = True, min_coverage: float = 0.7, max_words: int = 30,
+                 smoke_test: bool = True, smoke_timeout: float = 10.0):
+        self.enabled = enabled
+        self.min_coverage = min_coverage
+        self.max_words = max_words
+        self.smoke_test = smoke_test
+        self.smoke_timeout = smoke_timeout
+        self._rendered: Dict[Tuple[str, Tuple], str] = {}
+        # Önizleme için derlenmiş kod (kaynak -> code object)
+        self._compiled: Dict[str, Any] = {}
+        self._verified: Dict[str, Optional[bool]] = {t.name: None for t in TEMPLATES}
+        self._errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._compile_all()
+
+    @staticmethod
+    def _key(template: Template, values: Dict[str, str]) -> Tuple[str, Tuple]:
+        return template.name, tuple(sorted((s, values[s]) for s in template.slots))
+
+    def _compile_all(self):
+        for template in TEMPLATES:
+            try:
+                for values in template.variants():
+                    if template.name == "currency" and values["base"] == values["target"]:
+                        continue
+                    source = template.render(values)
+                    code = compile(prepare_preview_code(source), GENERATED_FILENAME, "exec")
+                    self._rendered[self._key(template, values)] = source
+                    self._compiled[source] = code
+            except (SyntaxError, ValueError) as e:
+                self._verified[template.name] = False
+                self._errors[template.name] = str(e)
+        if not self.smoke_test:
+            for name, state in self._verified.items():
+                if state is None:
+                    self._verified[name] = True
+
+    def verify(self):
+        """Her şablonun varsayılan varyantını AppTest ile çalıştır"""
+        from autotest import run_app_test
+        for template in TEMPLATES:
+            if self._verified[template.name] is not None:
+                continue
+            result = run_app_test(template.render(template.defaults), self.smoke_timeout)
+            with self._lock:
+                self._verified[template.name] = result["passed"]
+                if not result["passed"]:
+                    self._errors[template.name] = result["error"]
+
+    def serve(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """Eşleşen şablonun kodu (sağlayıcı çağrısı yok) veya None"""
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        match = match_intent(prompt, self.min_coverage, self.max_words)
+        if match is None:
+            return None
+        template, values = match
+        with self._lock:
+            verified = self._verified[template.name]
+        source = self._rendered.get(self._key(template, values))
+        if not verified or source is None:
+            TEMPLATE_TOTAL.inc(template=template.name, result="unverified")
+            return None
+        elapsed = time.perf_counter() - started
+        MATCH_SECONDS.observe(elapsed)
+        TEMPLATE_TOTAL.inc(template=template.name, result="served")
+        return {"template": template.name, "title": template.title, "values": values,
+                "code": source, "ms": elapsed * 1000}
+
+    def compiled(self, source: str):
+        """Şablondan gelen kodun önceden derlenmiş hali (yoksa None)"""
+        return self._compiled.get(source)
+
+    def status(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: {"verified": state, "error": self._errors.get(name)}
+                    for name, state in self._verified.items()}
+
+_library: Optional[TemplateLibrary] = None
+_library_lock = threading.Lock()
+
+def get_library(config: Optional[Dict] = None) -> TemplateLibrary:
+    """Süreç genelindeki kütüphane; smoke-test arka planda çalışır (doğrulanana kadar servis yok)"""
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = TemplateLibrary(**(config or {}))
+            if _library.enabled and _library.smoke_test:
+                threading.Thread(target=_library.verify, name="appfab-templates", daemon=True).start()
+        return _library
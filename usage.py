@@ -0,0 +1,138 @@
+"""
+AppFab - Usage Accounting
+LLM çağrılarının token ve gecikme kayıtları
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import analytics
+import metrics
+
+TOKENS_TOTAL = metrics.REGISTRY.counter(
+    "appfab_llm_tokens_total", "Harcanan token sayısı", ("provider", "model", "kind"))
+
+_local = threading.local()
+
+def _active_scopes() -> List[List[Dict]]:
+    scopes = getattr(_local, "scopes", None)
+    if scopes is None:
+        scopes = _local.scopes = []
+    return scopes
+
+@contextmanager
+def usage_scope():
+    """Blok içindeki tüm LLM çağrılarını topla (kullanıcı/app'e yazmak için)"""
+    calls: List[Dict] = []
+    scopes = _active_scopes()
+    scopes.append(calls)
+    try:
+        yield calls
+    finally:
+        scopes.remove(calls)
+
+def add_to_scopes(records: List[Dict]):
+    """Başka thread'de toplanmış kayıtları bu thread'in açık kapsamlarına ekle"""
+    for calls in _active_scopes():
+        calls.extend(records)
+
+def parse_openai_usage(data: Dict) -> Dict[str, int]:
+    """OpenAI yanıtındaki usage alanını oku"""
+    usage = data.get("usage") or {}
+    return {
+        "prompt_tokens": int(usage.get("prompt_tokens", 0)),
+        "completion_tokens": int(usage.get("completion_tokens", 0)),
+    }
+
+def parse_gemini_usage(data: Dict) -> Dict[str, int]:
+    """Gemini yanıtındaki usageMetadata alanını oku"""
+    usage = data.get("usageMetadata") or {}
+    return {
+        "prompt_tokens": int(usage.get("promptTokenCount", 0)),
+        "completion_tokens": int(usage.get("candidatesTokenCount", 0)),
+    }
+
+def record_call(provider: str, model: str, purpose: str, latency: float, ok: bool,
+                prompt_tokens: int = 0, completion_tokens: int = 0,
+                error: Optional[str] = None) -> Dict[str, Any]:
+    """Tek bir sağlayıcı çağrısını kaydet"""
+    record = {
+        "provider": provider,
+        "model": model,
+        "purpose": purpose,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "latency_ms": int(latency * 1000),
+        "success": bool(ok),
+        "error": error,
+        "created_at": time.time(),
+    }
+    if prompt_tokens:
+        TOKENS_TOTAL.inc(prompt_tokens, provider=provider, model=model, kind="prompt")
+    if completion_tokens:
+        TOKENS_TOTAL.inc(completion_tokens, provider=provider, model=model, kind="completion")
+    for calls in _active_scopes():
+        calls.append(record)
+    # Sağlayıcı bazında gecikme/başarı oranı özetleri için
+    analytics.record("llm_call", provider=provider, model=model, ok=ok,
+                     latency_ms=record["latency_ms"], purpose=purpose)
+    return record
+
+def estimate_cost(record: Dict, models: Dict[str, Dict]) -> float:
+    """Çağrının yaklaşık maliyeti ($) - fiyatlar 1M token başına"""
+    model = models.get(record["model"], {})
+    return (record["prompt_tokens"] * model.get("input_cost", 0)
+            + record["completion_tokens"] * model.get("output_cost", 0)) / 1_000_000
+
+# Tablo şeması: app.py ve database.py aynı tanımı kullanır
+USAGE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS usage_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT,
+        app_id TEXT,
+        provider TEXT NOT NULL,
+        model TEXT NOT NULL,
+        purpose TEXT,
+        prompt_tokens INTEGER DEFAULT 0,
+        completion_tokens INTEGER DEFAULT 0,
+        total_tokens INTEGER DEFAULT 0,
+        latency_ms INTEGER DEFAULT 0,
+        success INTEGER DEFAULT 1,
+        cost REAL DEFAULT 0,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+USAGE_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_usage_user ON usage_log (user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_usage_app ON usage_log (app_id)",
+)
+
+def init_usage_table(cursor):
+    """usage_log tablosunu oluştur"""
+    cursor.execute(USAGE_TABLE_SQL)
+    for sql in USAGE_INDEX_SQL:
+        cursor.execute(sql)
+
+def insert_usage(cursor, user_id: Optional[str], app_id: Optional[str],
+                 calls: List[Dict], models: Dict[str, Dict]):
+    """Toplanan çağrıları tek seferde yaz"""
+    cursor.executemany('''
+        INSERT INTO usage_log (user_id, app_id, provider, model, purpose, prompt_tokens,
+                               completion_tokens, total_tokens, latency_ms, success, cost)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(user_id, app_id, c["provider"], c["model"], c["purpose"], c["prompt_tokens"],
+           c["completion_tokens"], c["total_tokens"], c["latency_ms"], int(c["success"]),
+           estimate_cost(c, models)) for c in calls])
+
+def usage_summary(cursor, user_id: str) -> Dict[str, Any]:
+    """Kullanıcının toplam token / maliyet / çağrı özeti"""
+    cursor.execute('''
+        SELECT COUNT(*), COALESCE(SUM(total_tokens), 0), COALESCE(SUM(cost), 0),
+               COALESCE(AVG(latency_ms), 0)
+        FROM usage_log WHERE user_id = ?
+    ''', (user_id,))
+    calls, tokens, cost, latency = cursor.fetchone()
+    return {"calls": calls, "total_tokens": tokens, "cost": cost, "avg_latency_ms": int(latency)}
@@ -82,3 +82,47 @@ def generate_unique_id(prefix: str = "id") -> str:
     """Benzersiz ID oluştur"""
     import uuid
     return f"{prefix}_{uuid.uuid4().hex[:8]}"
+
+def preview_app(code: str, unique_key: str):
+    """
+    App önizlemesi (kod gösterimi)
+    """
+    st.subheader("📝 Oluşturulan Kod")
+    
+    # Copy button
+    col1, col2 = st.columns([1, 4])
+    with col1:
+        if st.button("📋 Kopyala", key=f"copy_{unique_key}"):
+            st.code(code, language="python")
+            st.success("Kod panoya kopyalandı!")
+            
+    with col2:
+        if st.button("💾 İndir", key=f"download_{unique_key}"):
+            st.download_button(
+                label="📥 app.py İndir",
+                data=code,
+                file_name="app.py",
+                mime="text/x-python",
+                key=f"dl_{unique_key}"
+            )
+    
+    st.code(code, language="python")
+
+def run_app_preview(code: str):
+    """
+    App çalıştırma talimatları
+    """
+    st.markdown("""
+    ### 🚀 App'i Çalıştırma
+    
+    **1. Yöntem: Doğrudan Çalıştırma**
+    ```bash
+    # app.py dosyası oluşturun
+    streamlit run app.py
+    ```
+    
+    **2. Yöntem: Mevcut Projeye Ekleme**
+    ```python
+    # Oluşturulan kodu mevcut projenize yapıştırın
+    ```
+    """)